@@ -0,0 +1,442 @@
+"""
+Benchmark loading, node emission and edge emission of each adapter on the
+fixtures in data/, and on larger inputs generated from them by replicating
+their rows under new identifiers. Each adapter and scale runs in a fresh
+process, so that peak memory is measured in isolation.
+
+Usage:
+    python benchmarks/benchmark_adapters.py --scales 1 10 \
+        --output benchmark.json --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# run from anywhere, with the package and fixtures of this checkout
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ADAPTERS = [
+    "AllVariantsAdapter",
+    "CnGenesAdapter",
+    "ClinicalAdapter",
+    "OncoKBAdapter",
+    "PandasAdapter",
+]
+
+STAGES = ["_load_data", "get_nodes", "get_edges"]
+
+# differences below these are noise, whatever the ratio
+MIN_SECONDS = 0.01
+MIN_BYTES = 1024**2
+
+
+def _suffix(values: pd.Series, replica: int, sep: str = None) -> pd.Series:
+    """
+    Append the replica number to identifiers, to each item if they are
+    `sep`-separated lists; the first replica keeps the original values.
+    """
+    if replica == 0:
+        return values
+    if sep is None:
+        return values + f"_r{replica}"
+    return values.str.split(sep).apply(
+        lambda items: sep.join(f"{item}_r{replica}" for item in items)
+    )
+
+
+def _scale_variants(frame: pd.DataFrame, replica: int) -> pd.DataFrame:
+    # new patients and samples carrying the same variants, shifted by a few
+    # bases so that the variants are distinct as well
+    known = frame["ID"] != "."
+    return frame.assign(
+        patient=_suffix(frame["patient"], replica),
+        samples=_suffix(frame["samples"], replica, sep=";"),
+        ID=frame["ID"].where(~known, _suffix(frame["ID"], replica)),
+        POS=(frame["POS"].astype(int) + replica).astype(str),
+    )
+
+
+def _scale_copy_numbers(frame: pd.DataFrame, replica: int) -> pd.DataFrame:
+    # new patients with alterations of the same genes
+    return frame.assign(sample=_suffix(frame["sample"], replica))
+
+
+def _scale_clinical(frame: pd.DataFrame, replica: int) -> pd.DataFrame:
+    return frame.assign(Patient=_suffix(frame["Patient"], replica))
+
+
+def _scale_oncokb(frame: pd.DataFrame, replica: int) -> pd.DataFrame:
+    return frame.assign(Gene=_suffix(frame["Gene"], replica))
+
+
+def _scale_processes(frame: pd.DataFrame, replica: int) -> pd.DataFrame:
+    # new biological processes; the column holds 'name:biological_process'
+    frame = frame.copy()
+    for column in frame.columns:
+        values = frame[column]
+        process = values.str.contains(":biological_process", regex=False)
+        process &= ~values.str.lstrip("'").str.startswith("None:")
+        if replica and process.any():
+            frame[column] = values.where(
+                ~process,
+                values.str.replace(
+                    ":biological_process",
+                    f"_r{replica}:biological_process",
+                    regex=False,
+                ),
+            )
+    return frame
+
+
+# input file of each adapter: path, delimiter, whether it has a header, and
+# how to derive the rows of one replica
+INPUTS = {
+    "AllVariantsAdapter": [
+        ("data/synthetic_variants.csv", "\t", True, _scale_variants),
+    ],
+    "CnGenesAdapter": [
+        ("data/synthetic_cns.csv", "\t", True, _scale_copy_numbers),
+    ],
+    "ClinicalAdapter": [
+        ("data/synthetic_clinical.csv", ";", True, _scale_clinical),
+    ],
+    "OncoKBAdapter": [
+        (
+            "data/oncokb_biomarker_drug_associations.tsv",
+            "\t",
+            True,
+            _scale_oncokb,
+        ),
+    ],
+    "PandasAdapter": [
+        (
+            "data/oncodash files/BiologicalProcess-part000.csv",
+            ";",
+            False,
+            _scale_processes,
+        ),
+        (
+            "data/oncodash files/GeneToBiologicalProcess-part000.csv",
+            ";",
+            False,
+            _scale_processes,
+        ),
+    ],
+}
+
+
+def generate_inputs(scale: int, directory: str) -> dict:
+    """
+    Write the inputs of all adapters at the given scale, i.e. with the rows
+    of the fixtures repeated `scale` times under new identifiers.
+
+    Returns:
+        Dictionary of adapter names and lists of their input paths and row
+        counts.
+    """
+    inputs = {}
+    for adapter, files in INPUTS.items():
+        inputs[adapter] = []
+        for path, sep, header, scale_rows in files:
+            frame = pd.read_csv(
+                os.path.join(ROOT, path),
+                sep=sep,
+                header=0 if header else None,
+                dtype=str,
+                keep_default_na=False,
+            )
+            if scale > 1:
+                frame = pd.concat(
+                    [scale_rows(frame, replica) for replica in range(scale)],
+                    ignore_index=True,
+                )
+
+            target = os.path.join(directory, f"x{scale}", path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            frame.to_csv(target, sep=sep, header=header, index=False)
+            inputs[adapter].append((target, len(frame)))
+
+    return inputs
+
+
+def _make_adapter(name: str, inputs: list, copy_numbers: list):
+    """
+    Create the adapter with its inputs replaced by the generated ones, with
+    the arguments of the knowledge graph build, and without registry or cache.
+    """
+    from decider_genetics import cli
+
+    from decider_genetics.adapters import (
+        all_variants_adapter,
+        clinical_adapter,
+        cn_genes_adapter,
+        oncokb_adapter,
+        pandas_adapter,
+    )
+
+    classes = {
+        "AllVariantsAdapter": all_variants_adapter.AllVariantsAdapter,
+        "CnGenesAdapter": cn_genes_adapter.CnGenesAdapter,
+        "ClinicalAdapter": clinical_adapter.ClinicalAdapter,
+        "OncoKBAdapter": oncokb_adapter.OncoKBAdapter,
+        "PandasAdapter": pandas_adapter.PandasAdapter,
+    }
+    adapter_class = type(
+        name,
+        (classes[name],),
+        {"_inputs": tuple(path for path, _ in inputs)},
+    )
+
+    kwargs = {}
+    if name == "AllVariantsAdapter":
+        # including the positional overlaps with the copy number table
+        kwargs = cli.variant_adapter_args()
+        kwargs["copy_numbers"] = dict(
+            cli.cn_adapter_args(), path=copy_numbers[0][0]
+        )
+    elif name == "CnGenesAdapter":
+        kwargs = cli.cn_adapter_args()
+
+    return adapter_class, kwargs
+
+
+def _measure(name: str, inputs: list, copy_numbers: list, repeat: int) -> list:
+    """
+    Time each stage of one adapter `repeat` times, then run it once more with
+    tracemalloc to record the peak memory of each stage. Runs in a fresh
+    worker process.
+    """
+    adapter_class, kwargs = _make_adapter(name, inputs, copy_numbers)
+    input_rows = sum(rows for _, rows in inputs)
+
+    timings = {stage: [] for stage in STAGES}
+    peaks = {}
+    rows = {"_load_data": input_rows}
+
+    for run in range(repeat + 1):
+        traced = run == repeat
+        if traced:
+            tracemalloc.start()
+
+        for stage in STAGES:
+            if traced:
+                tracemalloc.reset_peak()
+            start = time.perf_counter()
+
+            if stage == "_load_data":
+                adapter = adapter_class(**kwargs)
+                adapter.load()
+            elif hasattr(adapter, stage):
+                rows[stage] = sum(1 for _ in getattr(adapter, stage)())
+            else:
+                continue
+
+            seconds = time.perf_counter() - start
+            if traced:
+                peaks[stage] = tracemalloc.get_traced_memory()[1]
+            else:
+                timings[stage].append(seconds)
+
+        del adapter
+        if traced:
+            tracemalloc.stop()
+
+    max_rss = None
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        max_rss *= 1 if sys.platform == "darwin" else 1024
+
+    return [
+        {
+            "adapter": name,
+            "stage": stage,
+            "seconds": min(timings[stage]),
+            "rows": rows[stage],
+            "rows_per_second": rows[stage] / max(min(timings[stage]), 1e-9),
+            "peak_traced_bytes": peaks[stage],
+            "max_rss_bytes": max_rss,
+        }
+        for stage in STAGES
+        if timings[stage]
+    ]
+
+
+def run(adapters: list, scales: list, repeat: int, directory: str) -> dict:
+    results = []
+    context = get_context("spawn")
+    for scale in scales:
+        inputs = generate_inputs(scale, directory)
+        for name in adapters:
+            with ProcessPoolExecutor(1, mp_context=context) as pool:
+                measured = pool.submit(
+                    _measure,
+                    name,
+                    inputs[name],
+                    inputs["CnGenesAdapter"],
+                    repeat,
+                ).result()
+            for result in measured:
+                result["scale"] = scale
+                results.append(result)
+                _print_result(result)
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compare a report to a baseline report and return the measurements that
+    got slower or use more memory than the baseline by more than the
+    tolerance, as a list of messages.
+    """
+    known = {
+        (result["adapter"], result["scale"], result["stage"]): result
+        for result in baseline["results"]
+    }
+
+    regressions = []
+    print(
+        f"\n{'adapter':<20} {'scale':>5} {'stage':<11} "
+        f"{'seconds':>9} {'baseline':>9} {'ratio':>6} {'memory':>6}"
+    )
+    for result in report["results"]:
+        key = (result["adapter"], result["scale"], result["stage"])
+        if key not in known:
+            continue
+        before = known[key]
+        time_ratio = result["seconds"] / max(before["seconds"], 1e-9)
+        memory_ratio = result["peak_traced_bytes"] / max(
+            before["peak_traced_bytes"], 1
+        )
+        print(
+            f"{key[0]:<20} {key[1]:>5} {key[2]:<11} "
+            f"{result['seconds']:>9.4f} {before['seconds']:>9.4f} "
+            f"{time_ratio:>6.2f} {memory_ratio:>6.2f}"
+        )
+        slower = result["seconds"] - before["seconds"] > MIN_SECONDS
+        larger = (
+            result["peak_traced_bytes"] - before["peak_traced_bytes"]
+            > MIN_BYTES
+        )
+        if slower and time_ratio > 1 + tolerance:
+            regressions.append(
+                f"{key[0]} {key[2]} at scale {key[1]} is {time_ratio:.2f}x "
+                f"slower than the baseline"
+            )
+        if larger and memory_ratio > 1 + tolerance:
+            regressions.append(
+                f"{key[0]} {key[2]} at scale {key[1]} uses "
+                f"{memory_ratio:.2f}x the memory of the baseline"
+            )
+
+    return regressions
+
+
+def _print_result(result: dict) -> None:
+    print(
+        f"{result['adapter']:<20} x{result['scale']:<4} "
+        f"{result['stage']:<11} {result['seconds']:>9.4f} s "
+        f"{result['rows_per_second']:>12,.0f} rows/s "
+        f"{result['peak_traced_bytes'] / 1024**2:>8.1f} MiB peak",
+        flush=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--adapters",
+        nargs="+",
+        choices=ADAPTERS,
+        default=ADAPTERS,
+        help="adapters to benchmark (default: all)",
+    )
+    parser.add_argument(
+        "--scales",
+        nargs="+",
+        type=int,
+        default=[1, 10, 50],
+        help="input sizes, as multiples of the fixtures (default: 1 10 50)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="timed runs per stage; the fastest counts (default: 3)",
+    )
+    parser.add_argument(
+        "--output",
+        help="write the results as JSON to this file",
+    )
+    parser.add_argument(
+        "--baseline",
+        help="JSON results of an earlier run to compare against",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="relative slowdown or memory growth reported as a regression "
+        "(default: 0.25)",
+    )
+    parser.add_argument(
+        "--data-dir",
+        help="directory for the generated inputs (default: a temporary one)",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        report = run(
+            args.adapters, args.scales, args.repeat, args.data_dir or directory
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
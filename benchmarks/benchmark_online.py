@@ -0,0 +1,256 @@
+"""
+Benchmark online ingestion of the variant and copy number adapters with
+several batch sizes and numbers of concurrent transactions, against a
+stand-in for a Neo4j server: a driver whose statements take a fixed round
+trip plus a time per row, with a connection pool of limited size and
+occasional transient errors. No database is needed; the results show how
+batching and concurrency hide the latency of the server.
+
+The adapters' tuples are created once and kept in memory, so that only the
+ingestion is timed.
+
+Usage:
+    python benchmarks/benchmark_online.py --batch-sizes 1000 10000 \
+        --concurrency 1 4 8 --output online.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from itertools import product
+
+# run from anywhere, with the package and fixtures of this checkout
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class StandInDriver:
+    """
+    Stand-in for a `neo4j.Driver` that sleeps instead of running statements.
+
+    Args:
+        latency: Seconds per statement, e.g. the network round trip.
+        row_seconds: Seconds per row of a statement's `rows` parameter.
+        pool_size: Maximum number of sessions open at the same time, as the
+            driver's connection pool; further sessions wait for one.
+        failure_rate: Probability of a statement failing with a transient
+            error, after taking its time.
+        seed: Seed of the failures.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.005,
+        row_seconds: float = 2e-5,
+        pool_size: int = 100,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.row_seconds = row_seconds
+        self.failure_rate = failure_rate
+        self.statements = 0
+        self.rows = 0
+        self._pool = threading.BoundedSemaphore(pool_size)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def session(self, database=None):
+        return _StandInSession(self)
+
+    def _run(self, parameters) -> None:
+        rows = len((parameters or {}).get("rows", ()))
+        time.sleep(self.latency + rows * self.row_seconds)
+
+        from neo4j.exceptions import TransientError
+
+        with self._lock:
+            if self._random.random() < self.failure_rate:
+                raise TransientError("Stand-in deadlock.")
+            self.statements += 1
+            self.rows += rows
+
+
+class _StandInSession:
+    def __init__(self, driver: StandInDriver):
+        self.driver = driver
+
+    def __enter__(self):
+        self.driver._pool.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.driver._pool.release()
+
+    def run(self, query, parameters=None):
+        self.driver._run(parameters)
+        return self
+
+    def consume(self):
+        return None
+
+
+def collect_tuples(paths: dict) -> tuple:
+    """
+    Load the variant and copy number adapters and return their node and edge
+    tuples, with the merged nodes of their shared registry.
+    """
+    from decider_genetics.cli import MERGE_LABELS, adapter_jobs
+    from decider_genetics.registry import NodeRegistry
+
+    registry = NodeRegistry(merge_labels=MERGE_LABELS)
+    adapters = [
+        job.adapter_class(registry=registry, **job.kwargs)
+        for job in adapter_jobs(["variants", "copy_numbers"], paths)
+    ]
+    nodes = [node for adapter in adapters for node in adapter.get_nodes()]
+    nodes.extend(registry.merged_nodes())
+    edges = [edge for adapter in adapters for edge in adapter.get_edges()]
+    return nodes, edges
+
+
+def run(
+    bc,
+    nodes: list,
+    edges: list,
+    batch_size: int,
+    concurrency: int,
+    driver_options: dict,
+) -> dict:
+    """
+    Ingest the tuples into a fresh stand-in server and return the summary of
+    the ingestion.
+    """
+    from decider_genetics.online import OnlineIngestor
+
+    driver = StandInDriver(**driver_options)
+    with OnlineIngestor(
+        driver,
+        bc,
+        batch_size=batch_size,
+        concurrency=concurrency,
+        retry_delay=0.01,
+    ) as ingestor:
+        ingestor.write_nodes(nodes)
+        ingestor.flush()
+        ingestor.write_edges(edges)
+
+    summary = ingestor.summary()
+    return {
+        "batch_size": batch_size,
+        "concurrency": concurrency,
+        "rows": driver.rows,
+        "batches": summary["batches"],
+        "retries": summary["retries"],
+        "seconds": summary["seconds"],
+        "rows_per_second": summary["rows_per_second"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        nargs="+",
+        type=int,
+        default=[1_000, 10_000],
+        help="rows per statement (default: 1000 10000)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        nargs="+",
+        type=int,
+        default=[1, 4, 8],
+        help="concurrent transactions (default: 1 4 8)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.005,
+        help="seconds per statement of the stand-in (default: 0.005)",
+    )
+    parser.add_argument(
+        "--row-seconds",
+        type=float,
+        default=2e-5,
+        help="seconds per row of the stand-in (default: 2e-5)",
+    )
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=100,
+        help="connection pool size of the stand-in (default: 100)",
+    )
+    parser.add_argument(
+        "--failure-rate",
+        type=float,
+        default=0.01,
+        help="share of statements failing with a transient error "
+        "(default: 0.01)",
+    )
+    parser.add_argument(
+        "--variants",
+        help="variant table (default: the one in data/)",
+    )
+    parser.add_argument(
+        "--copy-numbers",
+        help="copy number table (default: the one in data/)",
+    )
+    parser.add_argument(
+        "--config",
+        default=os.path.join(ROOT, "config", "biocypher_config.yaml"),
+        help="BioCypher configuration (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--output",
+        help="write the results as JSON to this file",
+    )
+    args = parser.parse_args()
+
+    from biocypher import BioCypher
+
+    bc = BioCypher(biocypher_config_path=args.config)
+    start = time.perf_counter()
+    nodes, edges = collect_tuples(
+        {"variants": args.variants, "copy_numbers": args.copy_numbers}
+    )
+    print(
+        f"{len(nodes):,} nodes and {len(edges):,} edges created in "
+        f"{time.perf_counter() - start:.2f} s",
+        flush=True,
+    )
+
+    driver_options = dict(
+        latency=args.latency,
+        row_seconds=args.row_seconds,
+        pool_size=args.pool_size,
+        failure_rate=args.failure_rate,
+    )
+    results = []
+    for batch_size, concurrency in product(args.batch_sizes, args.concurrency):
+        result = run(bc, nodes, edges, batch_size, concurrency, driver_options)
+        results.append(result)
+        print(
+            f"batch size {batch_size:>7,} concurrency {concurrency:>3} "
+            f"{result['seconds']:>9.3f} s "
+            f"{result['rows_per_second']:>12,} rows/s "
+            f"{result['batches']:>6} batches {result['retries']:>4} retries",
+            flush=True,
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"stand_in": driver_options, "results": results}, f, indent=2
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,33 @@
-import hashlib
 import pandas as pd
 from enum import Enum, auto
 from itertools import chain
 from typing import Optional
 from biocypher._logger import logger
+from decider_genetics.adapters.base_adapter import BaseAdapter
+from decider_genetics.aggregates import (
+    count_by,
+    is_exonic,
+    is_pathogenic,
+    is_protein_altering,
+)
+from decider_genetics.adapters.cn_genes_adapter import (
+    CnGenesAdapter,
+    CnGenesAdapterGeneField,
+    CnGenesAdapterSampleField,
+)
+from decider_genetics.cache import FrameCache
+from decider_genetics.profiling import BuildProfiler
+from decider_genetics.registry import NodeRegistry
+from decider_genetics.ids import hash_columns, hash_pairs
+from decider_genetics.intervals import IntervalIndex
+from decider_genetics.schema import DEFAULT_SCHEMA_CONFIG_PATH, get_properties
+from decider_genetics.tables import (
+    concat_tables,
+    expand_paths,
+    iter_table,
+    map_tables,
+    read_table,
+)
 
 logger.debug(f"Loading module {__name__}.")
 
@@ -97,9 +121,54 @@ class AllVariantsAdapterEdgeType(Enum):
     PATIENT_SAMPLE_ASSOCIATION = auto()
     SAMPLE_VARIANT_ASSOCIATION = auto()
     VARIANT_GENE_ASSOCIATION = auto()
-
-
-class AllVariantsAdapter:
+    # by genomic position, from the gene coordinates of the copy number table
+    VARIANT_GENE_OVERLAP = auto()
+    VARIANT_COPY_NUMBER_OVERLAP = auto()
+
+
+# fields needed to build nodes and edges, read whenever they are selected even
+# though the schema does not declare them as variant properties
+KEY_FIELDS = [
+    AllVariantsAdapterPatientField.ID,
+    AllVariantsAdapterPatientField.SAMPLES,
+    AllVariantsAdapterSampleField.READ_COUNTS,
+    AllVariantsAdapterVariantField.ID,
+    AllVariantsAdapterVariantField.GENE,
+]
+
+# fields the per-patient variant counts of `get_aggregates` are computed
+# from, read whenever they are selected; the ones the schema does not declare
+# as variant properties are neither hashed nor emitted
+AGGREGATE_FIELDS = {
+    "exonic_variant_count": (
+        AllVariantsAdapterVariantField.FUNCTION,
+        is_exonic,
+    ),
+    "protein_altering_variant_count": (
+        AllVariantsAdapterVariantField.EXONIC_FUNCTION,
+        is_protein_altering,
+    ),
+    "pathogenic_variant_count": (
+        AllVariantsAdapterVariantField.CLNSIG,
+        is_pathogenic,
+    ),
+}
+
+# low-cardinality fields, loaded as categoricals
+CATEGORICAL_FIELDS = [
+    AllVariantsAdapterVariantField.CHROMOSOME,
+    AllVariantsAdapterVariantField.FILTER,
+    AllVariantsAdapterVariantField.FUNCTION,
+    AllVariantsAdapterVariantField.EXONIC_FUNCTION,
+    AllVariantsAdapterVariantField.FUNCTION_REF,
+    AllVariantsAdapterVariantField.EXONIC_FUNCTION_REF,
+    AllVariantsAdapterVariantField.CLNSIG,
+    AllVariantsAdapterVariantField.CLNREVSTAT,
+    AllVariantsAdapterVariantField.TRUNCAL,
+]
+
+
+class AllVariantsAdapter(BaseAdapter):
     """
     Generates patient and variant nodes and edges between them.
 
@@ -108,96 +177,420 @@ class AllVariantsAdapter:
         node_fields: List of node fields to include in the result.
         edge_types: List of edge types to include in the result.
         edge_fields: List of edge fields to include in the result.
+        registry: Node registry shared by all adapters of a build.
+        cache: Cache of processed frames; not used in streaming mode, which
+            does not keep any frames.
+        profiler: Profiler measuring the stages of the build.
+        schema_config_path: Schema configuration of the build, which
+            declares the variant properties to read and their types; also
+            used for the copy number adapter of the overlap edges.
+        streaming: If True, do not hold the variant table in memory; instead,
+            read, explode and hash it in chunks each time nodes or edges are
+            requested, and release every chunk once it has been emitted.
+            Several tables are streamed one table at a time.
+        memory_budget: Approximate number of bytes a single processed chunk
+            may occupy in streaming mode; determines the chunk size of a
+            single table.
+        path: Variant table to read instead of the synthetic data: a
+            tab-separated file, a Parquet or Arrow IPC file, or a directory
+            holding a (hive-partitioned) dataset of either; or a glob pattern
+            or list of them, e.g. one table per batch or patient.
+        filters: Only read variants matching all of these (column, operator,
+            value) tuples, e.g. `[("patient", "in", ["patient1"])]`; pushed
+            down to partitions and row groups of columnar inputs.
+        copy_numbers: Keyword arguments of the `CnGenesAdapter` whose genes
+            and copy number alterations the overlap edge types refer to;
+            without them, overlap edges are not emitted. They require the
+            chromosome and position variant fields, and the chromosome, start
+            and end gene fields of the copy number adapter.
+        read_workers: Number of tables read at the same time if there are
+            several; defaults to the number of CPUs.
     """
 
+    _cached_frames = (
+        "variants",
+        "sample_variants",
+        "variant_genes",
+        "patients",
+    )
+    _inputs = ("data/synthetic_variants.csv",)
+
     def __init__(
         self,
         node_types: Optional[list] = None,
         node_fields: Optional[list] = None,
         edge_types: Optional[list] = None,
         edge_fields: Optional[list] = None,
+        registry: Optional[NodeRegistry] = None,
+        cache: Optional[FrameCache] = None,
+        profiler: Optional[BuildProfiler] = None,
+        schema_config_path: str = DEFAULT_SCHEMA_CONFIG_PATH,
+        streaming: bool = False,
+        memory_budget: int = 256 * 1024**2,
+        path: Optional[str] = None,
+        filters: Optional[list] = None,
+        copy_numbers: Optional[dict] = None,
+        read_workers: Optional[int] = None,
     ):
+        super().__init__(
+            registry, None if streaming else cache, profiler, schema_config_path
+        )
+        if path is not None:
+            self._inputs = tuple(expand_paths(path))
+        self.filters = filters
+        self.read_workers = read_workers
         self._set_types_and_fields(
             node_types, node_fields, edge_types, edge_fields
         )
-        self._load_data()
+        self.copy_numbers = copy_numbers
+        self._check_overlaps()
+        self.streaming = streaming
+        self.memory_budget = memory_budget
+        self._set_columns()
+
+    def _selection(self):
+        return (
+            self.node_types,
+            self.node_fields,
+            self.edge_types,
+            self.edge_fields,
+            self._columns,
+            self.filters,
+        )
 
-    def _load_data(self):
+    def _input_paths(self) -> list:
+        paths = list(self._inputs)
+        if self._overlap_types():
+            # the copy number table the overlaps are computed with
+            paths.extend(self._copy_number_adapter()._input_paths())
+        return paths
+
+    def _copy_number_adapter(self) -> CnGenesAdapter:
         """
-        Read CSV and create dataframes for variants and patients according to
-        the selected fields.
+        Create the copy number adapter of the overlap edges, which loads
+        nothing until it is asked to.
         """
-        logger.info("Loading data.")
+        return CnGenesAdapter(
+            **self.copy_numbers,
+            cache=self.cache,
+            profiler=self.profiler,
+            schema_config_path=self.schema_config_path,
+        )
 
-        # read from csv
-        data = pd.read_csv("data/synthetic_variants.csv", sep="\t", header=0)
+    def _overlap_types(self) -> list:
+        """
+        Return the selected overlap edge types, if they can be computed.
+        """
+        if self.copy_numbers is None:
+            return []
+        return [
+            edge_type
+            for edge_type in self.edge_types
+            if edge_type
+            in [
+                AllVariantsAdapterEdgeType.VARIANT_GENE_OVERLAP,
+                AllVariantsAdapterEdgeType.VARIANT_COPY_NUMBER_OVERLAP,
+            ]
+        ]
 
-        # one row is one variant node, first select the columns given by the
-        # node_fields parameter
-        self.variants = data[
-            [
-                field.value
-                for field in self.node_fields
-                if field.value in data.columns
+    def _check_overlaps(self):
+        if self._overlap_types() and not all(
+            field in self.node_fields
+            for field in [
+                AllVariantsAdapterVariantField.CHROMOSOME,
+                AllVariantsAdapterVariantField.POSITION,
             ]
+        ):
+            raise ValueError(
+                "Overlap edges require the CHROMOSOME and POSITION variant "
+                "fields."
+            )
+
+    def _set_columns(self):
+        """
+        Determine which columns to read: the selected node fields that are
+        needed as keys, declared as variant properties in the schema, or
+        counted by `get_aggregates`. Everything else would be dropped by
+        BioCypher anyway.
+        """
+        declared = get_properties("variant", self.schema_config_path)
+        aggregated = [field for field, _ in AGGREGATE_FIELDS.values()]
+        self._columns = [
+            field.value
+            for field in self.node_fields
+            if field in KEY_FIELDS
+            or field.value in declared
+            or field in aggregated
         ]
+        # read for the aggregates only, so that variant IDs and properties
+        # stay the same
+        self._aggregate_columns = [
+            field.value
+            for field in self.node_fields
+            if field in aggregated
+            and field not in KEY_FIELDS
+            and field.value not in declared
+        ]
+        self._dtypes = {
+            field.value: ("category" if field in CATEGORICAL_FIELDS else str)
+            for field in self.node_fields
+        }
 
-        # break up the 'samples' column into one row per sample, rename the
-        # column to 'sample'; at the same time, the readCounts and Gene.MANE
-        # columns need to be split into one row per sample as well
-        self.variants = self.variants.assign(
-            samples=self.variants["samples"].str.split(";")
-        ).explode("samples")
-        self.variants = self.variants.rename(
-            columns={"samples": "sample"}
-        ).reset_index(drop=True)
-        self.variants = self.variants.assign(
-            readCounts=self.variants["readCounts"].str.split(";")
-        ).explode("readCounts")
-        self.variants = self.variants.assign(
-            Gene=self.variants["Gene.MANE"].str.split(";")
-        ).explode("Gene")
-
-        # remove duplicate rows
-        self.variants = self.variants.drop_duplicates()
-
-        # define dropped columns that should not contribute to hash
+        # define columns that should not contribute to hash
         self._drop_columns = [
             AllVariantsAdapterPatientField.ID.value,
-            AllVariantsAdapterSampleField.ID.value,
+            AllVariantsAdapterPatientField.SAMPLES.value,
             AllVariantsAdapterSampleField.READ_COUNTS.value,
-            "Gene",
         ]
 
-        # if ID is '.', generate md5 hash from other columns
-        self.variants["ID"] = self.variants.apply(
-            lambda row: (
-                hashlib.md5(
-                    "".join(
-                        [
-                            str(row[column])
-                            for column in self.variants.columns
-                            if column not in self._drop_columns
-                        ]
-                    ).encode("utf-8")
-                ).hexdigest()
-                if row["ID"] == "."
-                else row["ID"]
-            ),
-            axis=1,
-        )
+    def _load_data(self):
+        """
+        Read the input tables and create dataframes for variants and patients
+        according to the selected fields; variants recurring in several
+        tables are kept once. In streaming mode, only determine the chunk
+        size; the data are processed chunk by chunk in `_iter_frames`.
+        """
+        logger.info("Loading data.")
+
+        if self.streaming:
+            self.variants = None
+            self.sample_variants = None
+            self.variant_genes = None
+            self.patients = None
+            self._chunk_size = self._estimate_chunk_size()
+            logger.info(
+                f"Streaming variants in chunks of {self._chunk_size} rows."
+            )
+            return
+
+        frames = self._combine(self._iter_tables())
+        self.variants = frames["variants"]
+        self.sample_variants = frames["sample_variants"]
+        self.variant_genes = frames["variant_genes"]
 
         # PATIENTS and SAMPLES: select the PATIENT.ID and SAMPLE.ID column and
         # drop duplicates
+        self.patients = None
         if AllVariantsAdapterNodeType.PATIENT in self.node_types:
-            self.patients = self.variants[
+            self.patients = self._select_patients(self.sample_variants)
+
+        # GENES: should already be created by the copy number adapter
+
+    def _read_variants(self, path: Optional[str] = None, **kwargs):
+        """
+        Read the selected columns of a variant table, by default the first,
+        or iterate over it in chunks if a `chunk_size` is given. Columns are
+        read as text or categories so that identifiers and de-duplication do
+        not depend on type inference, which may differ between chunks and
+        input formats.
+        """
+        read = iter_table if "chunk_size" in kwargs else read_table
+        return read(
+            path or self._inputs[0],
+            self._columns,
+            dtypes=self._dtypes,
+            filters=self.filters,
+            **kwargs,
+        )
+
+    def _estimate_chunk_size(self) -> int:
+        """
+        Estimate how many input rows fit into the memory budget after
+        processing, from a sample of the first rows of the table.
+        """
+        sample = self._read_variants(nrows=1000)
+        if sample.empty:
+            return 1
+
+        bytes_per_row = sample.memory_usage(deep=True).sum() / len(sample)
+        rows_per_row = len(
+            self._process_variants(sample)["sample_variants"]
+        ) / len(sample)
+
+        # the processed frames coexist with about two intermediate copies
+        chunk_size = self.memory_budget / (
+            3 * bytes_per_row * max(1, rows_per_row)
+        )
+        return max(1, int(chunk_size))
+
+    def _process_variants(self, data: pd.DataFrame) -> dict:
+        """
+        Assign identifiers to variants without one and split the table into
+        three frames that each grow linearly with the input:
+
+        - `variants`: one row per variant with its node properties
+        - `sample_variants`: one row per sample carrying a variant, with the
+          read counts of that sample
+        - `variant_genes`: one row per variant and gene
+        """
+
+        # one row is one variant node; the columns were already restricted to
+        # the selected fields when reading
+        data = data.reset_index(drop=True)
+
+        # if ID is '.', generate hash from other columns
+        missing_id = data["ID"] == "."
+        with self._stage("hash", rows_in=int(missing_id.sum())):
+            data.loc[missing_id, "ID"] = hash_columns(
+                data[missing_id],
                 [
-                    AllVariantsAdapterPatientField.ID.value,
-                    AllVariantsAdapterSampleField.ID.value,
-                ]
+                    column
+                    for column in data.columns
+                    if column not in self._drop_columns
+                    and column not in self._aggregate_columns
+                ],
+            ).values
+
+        with self._stage("dedupe", rows_in=len(data)) as stage:
+            variants = data.drop(
+                [column for column in self._drop_columns if column in data],
+                axis=1,
+            ).drop_duplicates(subset="ID")
+            stage.rows_out = len(variants)
+            stage.dropped = len(data) - len(variants)
+
+        variants = self._coerce(variants, "variant")
+
+        with self._stage("explode", rows_in=len(data)) as stage:
+            sample_variants, variant_genes = self._explode_variants(data)
+            stage.rows_out = len(sample_variants) + len(variant_genes)
+
+        return {
+            "variants": variants,
+            "sample_variants": sample_variants,
+            "variant_genes": variant_genes,
+        }
+
+    def _explode_variants(self, data: pd.DataFrame) -> tuple:
+        """
+        Return one row per sample carrying each variant, and one row per gene
+        each variant is annotated with.
+        """
+
+        # break up the 'samples' column into one row per sample and pair the
+        # i-th sample with the i-th entry of 'readCounts', instead of forming
+        # all combinations of the two
+        sample_variants = _explode_paired(
+            data,
+            [
+                AllVariantsAdapterPatientField.SAMPLES.value,
+                AllVariantsAdapterSampleField.READ_COUNTS.value,
+            ],
+            keep=[
+                AllVariantsAdapterPatientField.ID.value,
+                AllVariantsAdapterVariantField.ID.value,
+            ],
+        ).rename(
+            columns={
+                AllVariantsAdapterPatientField.SAMPLES.value: (
+                    AllVariantsAdapterSampleField.ID.value
+                )
+            }
+        )
+
+        # break up 'Gene.MANE' into one row per gene, independently of samples
+        variant_genes = (
+            data[[AllVariantsAdapterVariantField.ID.value]]
+            .assign(Gene=data[AllVariantsAdapterVariantField.GENE.value])
+            .assign(Gene=lambda df: df["Gene"].str.split(";"))
+            .explode("Gene")
+            .drop_duplicates()
+        )
+
+        return sample_variants, variant_genes
+
+    def _iter_tables(self):
+        """
+        Yield the processed frames of each input table. Tables are read in a
+        pool of threads, a few ahead of the one being processed, and dropped
+        once the consumer advances.
+        """
+        tables = self._iter_stage(
+            "read",
+            map_tables(
+                self._read_variants, list(self._inputs), self.read_workers
+            ),
+            size=len,
+        )
+        for data in tables:
+            frames = self._process_variants(data)
+            del data
+            yield frames
+            del frames
+
+    def _combine(self, tables) -> dict:
+        """
+        Concatenate the processed frames of several tables, keeping only the
+        first occurrence of each variant across tables.
+        """
+        variants, sample_variants, variant_genes = [], [], []
+        # IDs of the variants of earlier tables
+        seen = set()
+        for frames in tables:
+            with self._stage(
+                "dedupe", rows_in=len(frames["variants"])
+            ) as stage:
+                unique_variants = frames["variants"]
+                if seen:
+                    unique_variants = unique_variants[
+                        ~unique_variants["ID"].isin(seen)
+                    ]
+                seen.update(unique_variants["ID"])
+                stage.rows_out = len(unique_variants)
+                stage.dropped = stage.rows_in - stage.rows_out
+
+            variants.append(unique_variants)
+            sample_variants.append(frames["sample_variants"])
+            variant_genes.append(frames["variant_genes"])
+
+        combined = {
+            "variants": concat_tables(variants),
+            "sample_variants": concat_tables(sample_variants),
+            "variant_genes": concat_tables(variant_genes),
+        }
+        if len(variant_genes) > 1:
+            combined["variant_genes"] = combined[
+                "variant_genes"
             ].drop_duplicates()
+        return combined
 
-        # GENES: should already be created by the copy number adapter
+    def _select_patients(self, sample_variants: pd.DataFrame) -> pd.DataFrame:
+        return sample_variants[
+            [
+                AllVariantsAdapterPatientField.ID.value,
+                AllVariantsAdapterSampleField.ID.value,
+            ]
+        ].drop_duplicates()
+
+    def _iter_frames(self):
+        """
+        Yield processed variant frames: the whole table, or one set of frames
+        per chunk in streaming mode, or per table if there are several.
+        Chunks are dropped as soon as the consumer advances, so only one of
+        them is held in memory at a time.
+        """
+        if not self.streaming:
+            yield {
+                "variants": self.variants,
+                "sample_variants": self.sample_variants,
+                "variant_genes": self.variant_genes,
+            }
+            return
+
+        if len(self._inputs) > 1:
+            # one table at a time, with the IDs of the emitted nodes and edges
+            # as the only state kept between tables
+            yield from self._iter_tables()
+            return
+
+        chunks = self._iter_stage(
+            "read", self._read_variants(chunk_size=self._chunk_size), size=len
+        )
+        for chunk in chunks:
+            frames = self._process_variants(chunk)
+            del chunk
+            yield frames
+            del frames
 
     def get_nodes(self):
         """
@@ -205,6 +598,8 @@ class AllVariantsAdapter:
         adapter constructor.
         """
 
+        self.load()
+
         logger.info("Generating nodes.")
 
         # # get unique patients as list
@@ -216,7 +611,7 @@ class AllVariantsAdapter:
 
         # # get unique samples
         # samples = (
-        #     self.variants[[AllVariantsAdapterSampleField.ID.value]]
+        #     self.sample_variants[[AllVariantsAdapterSampleField.ID.value]]
         #     .drop_duplicates()[AllVariantsAdapterSampleField.ID.value]
         #     .tolist()
         # )
@@ -241,107 +636,312 @@ class AllVariantsAdapter:
         # column), node label (hardcode to 'variant' for now), and node
         # properties (dict of column names and values, except the 'ID')
 
-        # first remove columns in _drop_columns and drop duplicates
-        unique_variants = self.variants.drop(
-            self._drop_columns, axis=1
-        ).drop_duplicates()
+        # variants recur across chunks (and across patients); the set of
+        # emitted IDs is the only state kept between chunks
+        seen = set()
+
+        for frames in self._iter_frames():
+            with self._stage(
+                "dedupe", rows_in=len(frames["variants"])
+            ) as stage:
+                unique_variants = frames["variants"]
+                unique_variants = unique_variants[
+                    ~unique_variants["ID"].isin(seen)
+                ]
+                seen.update(unique_variants["ID"])
+                stage.rows_out = len(unique_variants)
+                stage.dropped = stage.rows_in - stage.rows_out
 
-        for _, node in unique_variants.iterrows():
-            yield (
-                node["ID"],
+            yield from self._emit_nodes(
+                unique_variants,
+                "ID",
                 "variant",
-                node.drop("ID").to_dict(),
+                properties=[
+                    column
+                    for column in unique_variants.columns
+                    if column != "ID" and column not in self._aggregate_columns
+                ],
             )
 
+    def get_aggregates(self):
+        """
+        Yield the numbers of variants of each patient: in total, and in
+        exons, altering proteins or pathogenic, if the fields they are
+        counted from are selected; and the number of patients carrying a
+        variant in each gene.
+        """
+
+        self.load()
+
+        patient = AllVariantsAdapterPatientField.ID.value
+        variant = AllVariantsAdapterVariantField.ID.value
+        counts = {"variant_count": None}
+        counts.update(
+            (name, name)
+            for name, (field, _) in AGGREGATE_FIELDS.items()
+            if field.value in self._columns
+        )
+
+        carriers, mutations = [], []
+        for frames in self._iter_frames():
+            variants = frames["variants"]
+            flags = pd.DataFrame(
+                {
+                    variant: variants[variant].to_numpy(),
+                    **{
+                        name: flag(variants[field.value])
+                        for name, (field, flag) in AGGREGATE_FIELDS.items()
+                        if name in counts
+                    },
+                }
+            )
+            patients = frames["sample_variants"][
+                [patient, variant]
+            ].drop_duplicates()
+            carriers.append(patients.merge(flags, on=variant, how="left"))
+
+            variant_genes = frames["variant_genes"]
+            variant_genes = self._resolve_genes(
+                variant_genes[variant_genes["Gene"] != "NONE"], "Gene", None
+            )
+            mutations.append(
+                variant_genes.merge(patients, on=variant)[["Gene", patient]]
+            )
+
+        if not carriers:
+            return
+
+        # variants recur across chunks and tables
+        carriers = concat_tables(carriers).drop_duplicates([patient, variant])
+        yield "patient", count_by(
+            carriers.fillna({flag: False for flag in counts.values() if flag}),
+            patient,
+            counts,
+        )
+        yield "gene", count_by(
+            concat_tables(mutations),
+            "Gene",
+            {"mutated_patient_count": None},
+            distinct=patient,
+        )
+
     def get_edges(self, variant_via_sample: bool = False):
         """
         Returns a generator of edge tuples for edge types specified in the
-        adapter constructor.
+        adapter constructor. Every edge is emitted once, even if the same
+        pair of nodes occurs in several rows or chunks.
         """
 
+        self.load()
+
         logger.info("Generating edges.")
 
-        if variant_via_sample:
-            # PATIENT - SAMPLE
-            # yield 5-tuple of edge id (hash of patient and sample ids), source
-            # node id, target node id, edge label (hardcode to 'patient_has_sample'
-            # for now), and edge properties (empty dict for now)
-            for _, row in self.patients.iterrows():
-                p_id = row[AllVariantsAdapterPatientField.ID.value]
-                s_id = row[AllVariantsAdapterSampleField.ID.value]
-                _id = hashlib.md5((p_id + s_id).encode("utf-8")).hexdigest()
-                yield (
-                    _id,
-                    p_id,
-                    s_id,
+        # edge IDs already emitted, to de-duplicate across chunks
+        seen = set()
+
+        overlaps = self._load_overlaps()
+
+        for frames in self._iter_frames():
+            sample_variants = frames["sample_variants"]
+
+            if variant_via_sample:
+                # PATIENT - SAMPLE
+                # yield 5-tuple of edge id (hash of patient and sample ids),
+                # source node id, target node id, edge label (hardcode to
+                # 'patient_has_sample' for now), and edge properties (empty
+                # dict for now)
+                yield from self._unique_edges(
+                    self._select_patients(sample_variants),
+                    AllVariantsAdapterPatientField.ID.value,
+                    AllVariantsAdapterSampleField.ID.value,
                     "patient_has_sample",
-                    {},
+                    seen,
                 )
 
-            # SAMPLE - VARIANT
-            # yield 5-tuple of edge id (hash of sample and variant ids), source node
-            # id, target node id, edge label (hardcode to 'sample_has_variant' for
-            # now), and edge properties (empty dict for now)
-            for _, row in self.variants.iterrows():
-                s_id = row[AllVariantsAdapterSampleField.ID.value]
-                v_id = row[AllVariantsAdapterVariantField.ID.value]
-                _id = hashlib.md5((s_id + v_id).encode("utf-8")).hexdigest()
-                yield (
-                    _id,
-                    s_id,
-                    v_id,
+                # SAMPLE - VARIANT
+                # yield 5-tuple of edge id (hash of sample and variant ids),
+                # source node id, target node id, edge label (hardcode to
+                # 'sample_has_variant' for now), and edge properties (empty
+                # dict for now)
+                yield from self._unique_edges(
+                    sample_variants,
+                    AllVariantsAdapterSampleField.ID.value,
+                    AllVariantsAdapterVariantField.ID.value,
                     "sample_has_variant",
-                    {},
+                    seen,
                 )
 
-        else:
-            # PATIENT - VARIANT
-            # yield 5-tuple of edge id (hash of patient and variant ids), source node
-            # id, target node id, edge label (hardcode to 'patient_has_variant' for
-            # now), and edge properties (empty dict for now)
-            for _, row in self.variants.iterrows():
-                p_id = row[AllVariantsAdapterPatientField.ID.value]
-                v_id = row[AllVariantsAdapterVariantField.ID.value]
-                _id = hashlib.md5((p_id + v_id).encode("utf-8")).hexdigest()
-                yield (
-                    _id,
-                    p_id,
-                    v_id,
+            else:
+                # PATIENT - VARIANT
+                # yield 5-tuple of edge id (hash of patient and variant ids),
+                # source node id, target node id, edge label (hardcode to
+                # 'patient_has_variant' for now), and edge properties (empty
+                # dict for now)
+                yield from self._unique_edges(
+                    sample_variants,
+                    AllVariantsAdapterPatientField.ID.value,
+                    AllVariantsAdapterVariantField.ID.value,
                     "patient_has_variant",
-                    {},
+                    seen,
                 )
 
-        # VARIANT - GENE
-        # yield 5-tuple of edge id, source node id, target node id, edge label
-        # (hardcode to 'variant_in_gene' for now), and edge properties (empty
-        # dict for now)
+            # VARIANT - GENE
+            # yield 5-tuple of edge id, source node id, target node id, edge
+            # label (hardcode to 'variant_in_gene' for now), and edge
+            # properties (empty dict for now)
 
-        # first remove all columns except the variant id and gene and
-        # deduplicate
-        unique_variant_gene = self.variants[
-            [
+            # remove all 'NONE' genes
+            variant_genes = frames["variant_genes"]
+            variant_genes = self._resolve_genes(
+                variant_genes[variant_genes["Gene"] != "NONE"],
+                "Gene",
+                "variant_in_gene",
+            )
+
+            yield from self._unique_edges(
+                variant_genes,
                 AllVariantsAdapterVariantField.ID.value,
                 "Gene",  # expanded above
-            ]
-        ].drop_duplicates()
+                "variant_in_gene",
+                seen,
+            )
+
+            if overlaps is not None:
+                yield from self._overlap_edges(frames, overlaps, seen)
+
+    def _load_overlaps(self) -> Optional[tuple]:
+        """
+        Load the genes and copy number alterations of the copy number table
+        and index the genes by their coordinates, if overlap edges are
+        selected.
+
+        Returns:
+            The interval index of the genes, the gene names in index order,
+            and a frame of the copy number alterations by patient and gene.
+        """
+        if not self._overlap_types():
+            return None
+
+        adapter = self._copy_number_adapter()
+        adapter.load()
+        coordinates = [
+            CnGenesAdapterGeneField.CHR.value,
+            CnGenesAdapterGeneField.START.value,
+            CnGenesAdapterGeneField.END.value,
+        ]
+        if not all(column in adapter.genes for column in coordinates):
+            raise ValueError(
+                "Overlap edges require the CHR, START and END gene fields of "
+                "the copy number adapter."
+            )
 
-        # remove all 'NONE' genes
-        unique_variant_gene = unique_variant_gene[
-            unique_variant_gene["Gene"] != "NONE"
+        genes = adapter.genes.reset_index(drop=True)
+        index = IntervalIndex(*(genes[column] for column in coordinates))
+        alterations = adapter.variants[
+            [
+                CnGenesAdapterSampleField.ID.value,
+                CnGenesAdapterGeneField.NAME.value,
+                "VARIANT_ID",
+            ]
         ]
 
-        for _, row in unique_variant_gene.iterrows():
-            v_id = row[AllVariantsAdapterVariantField.ID.value]
-            g_id = f"{row['Gene']}"
-            _id = hashlib.md5((v_id + g_id).encode("utf-8")).hexdigest()
-            yield (
-                _id,
-                v_id,
-                g_id,
+        return (
+            index,
+            genes[CnGenesAdapterGeneField.NAME.value].to_numpy(),
+            alterations,
+        )
+
+    def _overlap_edges(self, frames: dict, overlaps: tuple, seen: set):
+        """
+        Yield edges from variants to the genes whose coordinates contain
+        them, and to the copy number alterations of those genes in the
+        patients carrying the variants.
+        """
+        index, gene_names, alterations = overlaps
+        variants = frames["variants"]
+
+        with self._stage("overlap", rows_in=len(variants)) as stage:
+            rows, genes = index.overlaps(
+                variants[AllVariantsAdapterVariantField.CHROMOSOME.value],
+                variants[AllVariantsAdapterVariantField.POSITION.value],
+            )
+            stage.rows_out = len(rows)
+        hits = pd.DataFrame(
+            {
+                AllVariantsAdapterVariantField.ID.value: variants[
+                    AllVariantsAdapterVariantField.ID.value
+                ].to_numpy()[rows],
+                "Gene": gene_names[genes],
+            }
+        )
+
+        # VARIANT - GENE, by position; pairs that are also annotated in
+        # 'Gene.MANE' have the same ID and are not emitted twice
+        if AllVariantsAdapterEdgeType.VARIANT_GENE_OVERLAP in self.edge_types:
+            yield from self._unique_edges(
+                hits,
+                AllVariantsAdapterVariantField.ID.value,
+                "Gene",
                 "variant_in_gene",
-                {},
+                seen,
+            )
+
+        # VARIANT - COPY NUMBER ALTERATION: the alterations of the containing
+        # genes in the patients that carry the variant
+        if (
+            AllVariantsAdapterEdgeType.VARIANT_COPY_NUMBER_OVERLAP
+            in self.edge_types
+        ):
+            carriers = frames["sample_variants"][
+                [
+                    AllVariantsAdapterPatientField.ID.value,
+                    AllVariantsAdapterVariantField.ID.value,
+                ]
+            ].drop_duplicates()
+            pairs = carriers.merge(
+                hits, on=AllVariantsAdapterVariantField.ID.value
+            ).merge(
+                alterations,
+                left_on=[AllVariantsAdapterPatientField.ID.value, "Gene"],
+                right_on=[
+                    CnGenesAdapterSampleField.ID.value,
+                    CnGenesAdapterGeneField.NAME.value,
+                ],
+            )
+            yield from self._unique_edges(
+                pairs,
+                AllVariantsAdapterVariantField.ID.value,
+                "VARIANT_ID",
+                "variant_in_copy_number_variant",
+                seen,
             )
 
+    def _unique_edges(
+        self,
+        frame: pd.DataFrame,
+        source: str,
+        target: str,
+        label: str,
+        seen: set,
+    ):
+        """
+        Yield one edge per distinct pair of source and target, skipping edges
+        whose ID is in `seen` and adding the emitted ones to it.
+        """
+        with self._stage("dedupe", rows_in=len(frame)) as stage:
+            pairs = frame[[source, target]].drop_duplicates()
+            with self._stage("hash", rows_in=len(pairs)):
+                pairs = pairs.assign(
+                    **{target: pairs[target].astype(str)},
+                    _id=lambda df: hash_pairs(df[source], df[target]),
+                )
+            pairs = pairs[~pairs["_id"].isin(seen)]
+            seen.update(pairs["_id"])
+            stage.rows_out = len(pairs)
+            stage.dropped = stage.rows_in - stage.rows_out
+
+        yield from self._emit_edges(pairs, source, target, label, "_id")
+
     def _set_types_and_fields(
         self, node_types, node_fields, edge_types, edge_fields
     ):
@@ -370,3 +970,45 @@ class AllVariantsAdapter:
             self.edge_fields = edge_fields
         else:
             self.edge_fields = [field for field in chain()]
+
+
+def _explode_paired(
+    frame: pd.DataFrame, columns: list, keep: list, sep: str = ";"
+) -> pd.DataFrame:
+    """
+    Split several delimited columns and explode them side by side, so that the
+    i-th entries of all columns end up in the same row. The first column
+    determines the number of rows; missing entries in the other columns
+    become NaN and surplus entries are dropped. Rows whose columns have
+    different numbers of entries are counted and reported in a warning.
+
+    Args:
+        frame: Data frame with a unique index.
+        columns: Delimited columns to split and pair, in order of precedence.
+        keep: Columns of `frame` to carry over into every exploded row.
+        sep: Delimiter of the entries within a cell.
+
+    Returns:
+        Data frame with the `keep` and `columns` columns, one row per entry of
+        the first column.
+    """
+    exploded, counts = [], []
+    for column in columns:
+        values = frame[column].str.split(sep).explode()
+        position = values.groupby(level=0).cumcount()
+        exploded.append(values.to_frame().set_index(position, append=True))
+        counts.append(values.groupby(level=0).size())
+
+    mismatched = sum(count.ne(counts[0]) for count in counts[1:])
+    if len(counts) > 1 and mismatched.any():
+        logger.warning(
+            f"{int((mismatched > 0).sum())} of {len(frame)} row(s) have a "
+            f"different number of {', '.join(columns[1:])} entries than of "
+            f"{columns[0]} entries; surplus entries were dropped and missing "
+            "ones left empty."
+        )
+
+    paired = exploded[0].join(exploded[1:], how="left")
+    paired = paired.reset_index(level=1, drop=True)
+
+    return frame[keep].join(paired, how="inner").reset_index(drop=True)
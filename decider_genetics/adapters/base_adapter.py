@@ -0,0 +1,313 @@
+import numpy as np
+import pandas as pd
+from itertools import repeat
+from typing import Callable, Iterable, Optional
+from biocypher._logger import logger
+from decider_genetics.cache import FrameCache
+from decider_genetics.coercion import coerce_properties, emitted_values
+from decider_genetics.profiling import BuildProfiler, measure, measure_iter
+from decider_genetics.registry import NodeRegistry
+from decider_genetics.schema import DEFAULT_SCHEMA_CONFIG_PATH
+
+logger.debug(f"Loading module {__name__}.")
+
+
+class BaseAdapter:
+    """
+    Common base of the adapters. Emits BioCypher node 3-tuples and edge
+    5-tuples straight from the columns of a data frame, instead of building a
+    Series and a dict per row with `iterrows`.
+
+    Adapters load their data lazily: `get_nodes` and `get_edges` call `load`
+    when they are first iterated, so that creating an adapter is cheap.
+
+    If `writer` is set, e.g. to a `ColumnarWriter`, the frames are passed to
+    its `write_nodes` and `write_edges` methods instead of being emitted as
+    tuples, and `get_nodes` and `get_edges` only yield the nodes the registry
+    has to merge.
+
+    If `gene_index` is set to a `GeneIndex`, edges to genes name their genes
+    by the IDs of the gene nodes, see `_resolve_genes`.
+
+    Adapters may also define `get_aggregates`, yielding (label, frame) tuples
+    of counts per node of a merged label, computed from their frames with
+    `aggregates.count_by`; the build sets them as properties of the nodes.
+
+    Args:
+        registry: Node registry shared by all adapters of a build; if given,
+            emitted nodes are de-duplicated and edges checked against it.
+        cache: Cache of processed frames; if given, `load` restores the
+            frames listed in `_cached_frames` from it instead of calling
+            `_load_data`.
+        profiler: Profiler of the build; if given, the read, explode, hash
+            and dedupe stages of the adapter are measured with it.
+        schema_config_path: Schema configuration of the build, which
+            determines the columns adapters read and the types they convert
+            them to; part of the cache key.
+    """
+
+    # names of the frame attributes `_load_data` sets, which can be cached
+    _cached_frames = ()
+
+    # paths of the files the adapter reads
+    _inputs = ()
+
+    def __init__(
+        self,
+        registry: Optional[NodeRegistry] = None,
+        cache: Optional[FrameCache] = None,
+        profiler: Optional[BuildProfiler] = None,
+        schema_config_path: str = DEFAULT_SCHEMA_CONFIG_PATH,
+    ):
+        self.registry = registry
+        self.cache = cache
+        self.profiler = profiler
+        self.schema_config_path = schema_config_path
+        self.writer = None
+        self.gene_index = None
+        self._loaded = False
+
+    def load(self):
+        """
+        Set the adapter's frames, unless they are already set: from the cache
+        if possible, and otherwise with `_load_data`, storing them in the
+        cache.
+        """
+        if self._loaded:
+            return
+        self._loaded = True
+
+        if self.cache is None or not self._cached_frames:
+            self._load_data()
+            return
+
+        key = self.cache.key(
+            self,
+            self._input_paths(),
+            self._selection(),
+            self.schema_config_path,
+        )
+        frames = self.cache.load(key)
+        if frames is not None:
+            for name, frame in frames.items():
+                setattr(self, name, frame)
+            return
+
+        self._load_data()
+        self.cache.store(
+            key, {name: getattr(self, name) for name in self._cached_frames}
+        )
+
+    def _input_paths(self) -> list:
+        """
+        Paths of the files the adapter reads; part of the cache key.
+        """
+        return list(self._inputs)
+
+    def _selection(self):
+        """
+        Configuration that determines the adapter's frames besides its
+        inputs and code, e.g. selected types and fields; part of the cache key.
+        """
+        return None
+
+    def _stage(self, name: str, rows_in: Optional[int] = None):
+        """
+        Return a context measuring a stage of the adapter, which yields the
+        `Stage` to set row counts on; nothing is measured without profiler.
+        """
+        return measure(self.profiler, name, rows_in=rows_in)
+
+    def _coerce(
+        self,
+        frame: pd.DataFrame,
+        input_label: str,
+        columns: Optional[dict] = None,
+        values: Optional[dict] = None,
+        defaults: Optional[dict] = None,
+    ) -> pd.DataFrame:
+        """
+        Convert the property columns of a frame to their schema types, as a
+        stage of the adapter, see `coercion.coerce_properties`.
+        """
+        with self._stage("coerce", rows_in=len(frame)) as stage:
+            frame = coerce_properties(
+                frame,
+                input_label,
+                self.schema_config_path,
+                columns,
+                values,
+                defaults,
+            )
+            stage.rows_out = len(frame)
+        return frame
+
+    def _resolve_genes(
+        self, frame: pd.DataFrame, column: str, label: Optional[str]
+    ) -> pd.DataFrame:
+        """
+        Replace the gene names in a column of edges by the IDs of their gene
+        nodes, as a stage of the adapter, see `GeneIndex.resolve_frame`;
+        without gene index, the frame is returned as it is.
+        """
+        if self.gene_index is None:
+            return frame
+
+        with self._stage("resolve", rows_in=len(frame)) as stage:
+            frame = self.gene_index.resolve_frame(frame, column, label)
+            stage.rows_out = len(frame)
+            stage.dropped = stage.rows_in - stage.rows_out
+        return frame
+
+    def _iter_stage(
+        self, name: str, items: Iterable, size: Optional[Callable] = None
+    ) -> Iterable:
+        """
+        Measure the production of items as a stage of the adapter, see
+        `BuildProfiler.iter_stage`.
+        """
+        return measure_iter(self.profiler, name, items, size)
+
+    def _emit_nodes(
+        self,
+        frame: pd.DataFrame,
+        id_column: str,
+        label: str,
+        properties: Optional[list] = None,
+        rename: Optional[dict] = None,
+    ):
+        """
+        Yield one node tuple per row of the frame.
+
+        Args:
+            frame: Data frame with one row per node.
+            id_column: Column holding the node IDs.
+            label: Node label, the same for all rows.
+            properties: Columns to emit as properties; defaults to all columns
+                except the ID column.
+            rename: Mapping of column names to property keys, for columns
+                whose name differs from the property key.
+        """
+        if properties is None:
+            properties = [
+                column for column in frame.columns if column != id_column
+            ]
+
+        if self.writer is not None and (
+            self.registry is None or label not in self.registry.merge_labels
+        ):
+            if self.registry is not None:
+                # as an array, since an empty list would select no columns
+                frame = frame[
+                    np.array(
+                        self.registry.register_ids(
+                            frame[id_column].tolist(), label
+                        ),
+                        dtype=bool,
+                    )
+                ]
+            self.writer.write_nodes(frame, id_column, label, properties, rename)
+            return
+
+        keys = self._property_keys(properties, rename)
+        rows = self._property_rows(frame, properties)
+
+        nodes = (
+            (
+                _id,
+                label,
+                dict(zip(keys, values)),
+            )
+            for _id, values in zip(frame[id_column].tolist(), rows)
+        )
+
+        if self.registry is not None:
+            nodes = self.registry.register_nodes(nodes)
+
+        yield from nodes
+
+    def _emit_edges(
+        self,
+        frame: pd.DataFrame,
+        source_column: str,
+        target_column: str,
+        label: str,
+        id_column: Optional[str] = None,
+        properties: Optional[list] = None,
+        rename: Optional[dict] = None,
+    ):
+        """
+        Yield one edge tuple per row of the frame.
+
+        Args:
+            frame: Data frame with one row per edge.
+            source_column: Column holding the source node IDs.
+            target_column: Column holding the target node IDs.
+            label: Edge label, the same for all rows.
+            id_column: Column holding the edge IDs; if None, edges are emitted
+                without ID.
+            properties: Columns to emit as properties; defaults to none.
+            rename: Mapping of column names to property keys, for columns
+                whose name differs from the property key.
+        """
+        properties = properties or []
+
+        if self.writer is not None:
+            if self.registry is not None:
+                frame = frame[
+                    self.registry.check_frame(
+                        frame, source_column, target_column, label
+                    )
+                ]
+            self.writer.write_edges(
+                frame,
+                source_column,
+                target_column,
+                label,
+                id_column,
+                properties,
+                rename,
+            )
+            return
+
+        keys = self._property_keys(properties, rename)
+        rows = self._property_rows(frame, properties)
+        ids = frame[id_column].tolist() if id_column else repeat(None)
+
+        edges = (
+            (
+                _id,
+                source,
+                target,
+                label,
+                dict(zip(keys, values)),
+            )
+            for _id, source, target, values in zip(
+                ids,
+                frame[source_column].tolist(),
+                frame[target_column].tolist(),
+                rows,
+            )
+        )
+
+        if self.registry is not None:
+            edges = self.registry.check_edges(edges)
+
+        yield from edges
+
+    @staticmethod
+    def _property_keys(properties: list, rename: Optional[dict]) -> list:
+        rename = rename or {}
+        return [rename.get(column, column) for column in properties]
+
+    @staticmethod
+    def _property_rows(frame: pd.DataFrame, properties: list):
+        """
+        Iterate over the property values of each row as tuples, converting
+        each column to Python objects once, with missing values as in
+        `coercion.emitted_values`.
+        """
+        if not properties:
+            return repeat(())
+
+        return zip(*(emitted_values(frame[column]) for column in properties))
@@ -1,10 +1,24 @@
-import hashlib
 import random
 import pandas as pd
+from typing import Optional
 from biocypher._logger import logger
+from decider_genetics.adapters.base_adapter import BaseAdapter
+from decider_genetics.cache import FrameCache
+from decider_genetics.profiling import BuildProfiler
+from decider_genetics.registry import NodeRegistry
+from decider_genetics.schema import DEFAULT_SCHEMA_CONFIG_PATH
+from decider_genetics.tables import filter_rows
 
 logger.debug(f"Loading module {__name__}.")
 
+# yes/no columns whose blank, unknown or inconclusive values mean "no", as
+# they always have, instead of being missing
+FLAG_DEFAULTS = {
+    "parpi": False,
+    "brca_mutation": False,
+    "hr_deficient": False,
+}
+
 # columns:
 # Attention
 # Age at Diagnosis
@@ -60,67 +74,116 @@ logger.debug(f"Loading module {__name__}.")
 # Excluded from PFI calculations_ reason
 
 
-class ClinicalAdapter:
+class ClinicalAdapter(BaseAdapter):
     """
     Load clinical patient data.
+
+    Args:
+        registry: Node registry shared by all adapters of a build.
+        cache: Cache of processed frames.
+        profiler: Profiler measuring the stages of the build.
+        schema_config_path: Schema configuration of the build, whose
+            property types the columns are converted to.
+        path: Clinical table to read instead of the synthetic data, with ';'
+            as delimiter.
+        filters: Only load patients matching all of these (column, operator,
+            value) tuples, e.g. `[("Patient", "in", ["patient1"])]`.
+        seed: Seed of the synthetic adverse reactions; each patient's is drawn
+            from the seed and the patient ID, so it does not depend on the
+            other patients loaded. None draws them at random.
     """
 
-    def __init__(self) -> None:
-        self._load_data()
+    _cached_frames = ("nodes",)
+    _inputs = ("data/synthetic_clinical.csv",)
+
+    def __init__(
+        self,
+        registry: Optional[NodeRegistry] = None,
+        cache: Optional[FrameCache] = None,
+        profiler: Optional[BuildProfiler] = None,
+        schema_config_path: str = DEFAULT_SCHEMA_CONFIG_PATH,
+        path: Optional[str] = None,
+        filters: Optional[list] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        super().__init__(registry, cache, profiler, schema_config_path)
+        if path is not None:
+            self._inputs = (path,)
+        self.filters = filters
+        self.seed = seed
+
+    def _selection(self):
+        return self.filters
 
     def _load_data(self) -> None:
         logger.info("Loading data.")
 
         # read from csv
-        self.nodes = pd.read_csv(
-            "data/synthetic_clinical.csv",
-            sep=";",
-            header=0,
+        with self._stage("read") as stage:
+            self.nodes = pd.read_csv(
+                self._inputs[0],
+                sep=";",
+                header=0,
+            )
+            self.nodes = filter_rows(self.nodes, self.filters)
+            stage.rows_out = len(self.nodes)
+
+        # lowercase the keys, replace space with underscore
+        self.nodes = self.nodes.rename(
+            columns=lambda column: column.lower().replace(" ", "_")
+        )
+        self.nodes["name"] = self.nodes["patient"]
+
+        # convert age, bmi (with decimal commas), chemotherapy cycles, and
+        # the yes/no columns to their schema types; only a positive HRD test
+        # is HR deficiency, and flags without value are false
+        self.nodes = self._coerce(
+            self.nodes,
+            "patient",
+            values={
+                "hr_deficient": {
+                    "hrd positive": True,
+                    "hrd negative": False,
+                    "insuff material": False,
+                }
+            },
+            defaults=FLAG_DEFAULTS,
         )
 
     def get_nodes(self):
         """
-        Iterate through the rows and create a node for each patient, yielding a
-        tuple of name, "patient", and dictionary of properties (other columns).
+        Create a node for each patient, yielding a tuple of name, "patient",
+        and dictionary of properties (other columns). The properties are
+        converted column-wise when loading.
         """
 
-        for _, row in self.nodes.iterrows():
-            # create a unique identifier for the patient
-            patient_id = row["Patient"]
-            _props = row.drop("Patient").to_dict()
-            # lowercase the keys, replace space with underscore
-            _props = {k.lower().replace(" ", "_"): v for k, v in _props.items()}
-            _props["name"] = row["Patient"]
-            _props["bmi"] = float(_props["bmi"].replace(",", "."))
-            _props["chemotherapy_cycles"] = int(_props["chemotherapy_cycles"])
-
-            # convert parpi, brca_mutation, and hr_deficient to boolean
-            _props["parpi"] = str(_props["parpi"]).lower() == "yes"
-            _props["brca_mutation"] = (
-                str(_props["brca_mutation"]).lower() == "yes"
-            )
-            _props["hr_deficient"] = (
-                str(_props["hr_deficient"]).lower() == "hrd positive"
-            )
-            # convert bool to lowercase string
-            _props["parpi"] = str(_props["parpi"]).lower()
-            _props["brca_mutation"] = str(_props["brca_mutation"]).lower()
-            _props["hr_deficient"] = str(_props["hr_deficient"]).lower()
-
-            # add fake severe_adverse_reaction randomly
-            drugs = [
-                "cisplatin",
-                "bevacizumab",
-                "abeciclib",
-                "olaparib",
-                "paclitaxel",
-            ]
-            # with 20% probability, sample one of the drugs
-            if random.random() < 0.2:
-                _props["severe_adverse_reaction_to"] = random.choice(drugs)
-
-            yield (
-                patient_id,
-                "patient",
-                _props,
-            )
+        self.load()
+
+        nodes = self.nodes.copy()
+
+        # add fake severe_adverse_reaction randomly
+        drugs = [
+            "cisplatin",
+            "bevacizumab",
+            "abeciclib",
+            "olaparib",
+            "paclitaxel",
+        ]
+        # with 20% probability, sample one of the drugs
+        nodes["severe_adverse_reaction_to"] = [
+            self._adverse_reaction(patient, drugs)
+            for patient in nodes["patient"].tolist()
+        ]
+
+        yield from self._emit_nodes(nodes, "patient", "patient")
+
+    def _adverse_reaction(self, patient: str, drugs: list) -> Optional[str]:
+        """
+        Draw the fake adverse reaction of a patient: one of the drugs with 20%
+        probability, otherwise None.
+        """
+        if self.seed is None:
+            rng = random
+        else:
+            rng = random.Random(f"{self.seed}:{patient}")
+        return rng.choice(drugs) if rng.random() < 0.2 else None
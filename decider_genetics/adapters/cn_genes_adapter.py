@@ -1,5 +1,3 @@
-import hashlib
-import math
 import random
 import string
 import pandas as pd
@@ -7,6 +5,19 @@ from enum import Enum, auto
 from itertools import chain
 from typing import Optional
 from biocypher._logger import logger
+from decider_genetics.adapters.base_adapter import BaseAdapter
+from decider_genetics.aggregates import count_by, is_amplified, is_deleted
+from decider_genetics.cache import FrameCache
+from decider_genetics.profiling import BuildProfiler
+from decider_genetics.registry import NodeRegistry
+from decider_genetics.ids import hash_columns
+from decider_genetics.schema import DEFAULT_SCHEMA_CONFIG_PATH, get_properties
+from decider_genetics.tables import (
+    concat_tables,
+    expand_paths,
+    map_tables,
+    read_table,
+)
 
 logger.debug(f"Loading module {__name__}.")
 
@@ -74,7 +85,31 @@ class CnGenesAdapterEdgeField(Enum):
     BREAKS_IN_GENE = "breaksInGene"
 
 
-class CnGenesAdapter:
+# fields needed to build nodes and edges, read whenever they are selected even
+# though the schema does not declare them as properties
+KEY_FIELDS = [
+    CnGenesAdapterSampleField.ID,
+    CnGenesAdapterGeneField.NAME,
+]
+
+# fields the copy number counts of `get_aggregates` are computed from, read
+# whenever they are selected; the ones the schema does not declare as copy
+# number alteration properties are neither hashed nor emitted
+AGGREGATE_FIELDS = [
+    CnGenesAdapterEdgeField.CN_STATUS,
+]
+
+# low-cardinality fields, loaded as categoricals
+CATEGORICAL_FIELDS = [
+    CnGenesAdapterGeneField.CHR,
+    CnGenesAdapterGeneField.BAND,
+    CnGenesAdapterGeneField.TYPE,
+    CnGenesAdapterEdgeField.CN_STATUS,
+    CnGenesAdapterEdgeField.LOH_STATUS,
+]
+
+
+class CnGenesAdapter(BaseAdapter):
     """
     Generates sample and gene nodes and edges between them.
 
@@ -83,79 +118,210 @@ class CnGenesAdapter:
         node_fields: List of node fields to include in the result.
         edge_types: List of edge types to include in the result.
         edge_fields: List of edge fields to include in the result.
+        registry: Node registry shared by all adapters of a build.
+        cache: Cache of processed frames.
+        profiler: Profiler measuring the stages of the build.
+        schema_config_path: Schema configuration of the build, which
+            declares the gene and copy number properties to read and their
+            types.
+        path: Copy number table to read instead of the synthetic data: a
+            tab-separated file, a Parquet or Arrow IPC file, or a directory
+            holding a (hive-partitioned) dataset of either; or a glob pattern
+            or list of them, e.g. one table per batch of samples.
+        filters: Only read rows matching all of these (column, operator,
+            value) tuples, e.g. `[("chr", "==", "chr17")]`; pushed down to
+            partitions and row groups of columnar inputs.
+        read_workers: Number of tables read at the same time if there are
+            several; defaults to the number of CPUs.
     """
 
+    _cached_frames = ("genes", "variants")
+    _inputs = ("data/synthetic_cns.csv",)
+
     def __init__(
         self,
         node_types: Optional[list] = None,
         node_fields: Optional[list] = None,
         edge_types: Optional[list] = None,
         edge_fields: Optional[list] = None,
+        registry: Optional[NodeRegistry] = None,
+        cache: Optional[FrameCache] = None,
+        profiler: Optional[BuildProfiler] = None,
+        schema_config_path: str = DEFAULT_SCHEMA_CONFIG_PATH,
+        path: Optional[str] = None,
+        filters: Optional[list] = None,
+        read_workers: Optional[int] = None,
     ):
+        super().__init__(registry, cache, profiler, schema_config_path)
+        if path is not None:
+            self._inputs = tuple(expand_paths(path))
+        self.filters = filters
+        self.read_workers = read_workers
         self._set_types_and_fields(
             node_types, node_fields, edge_types, edge_fields
         )
-        self._load_data()
+        self._set_columns()
+
+    def _selection(self):
+        return (
+            self.node_types,
+            self.node_fields,
+            self.edge_types,
+            self.edge_fields,
+            self._columns,
+            self.filters,
+        )
+
+    def _set_columns(self):
+        """
+        Determine which columns to read: the selected gene fields declared for
+        genes in the schema, the selected edge fields declared for copy number
+        alterations or counted by `get_aggregates`, and the fields needed as
+        keys.
+        """
+        declared_genes = get_properties("gene", self.schema_config_path)
+        declared_variants = get_properties(
+            "copy_number_variant", self.schema_config_path
+        )
+        self._columns = [
+            field.value
+            for field in chain(self.node_fields, self.edge_fields)
+            if field in KEY_FIELDS
+            or field in AGGREGATE_FIELDS
+            or (
+                isinstance(field, CnGenesAdapterGeneField)
+                and field.value in declared_genes
+            )
+            or (
+                isinstance(field, CnGenesAdapterEdgeField)
+                and field.value in declared_variants
+            )
+        ]
+        self._dtypes = {
+            field.value: "category"
+            for field in chain(self.node_fields, self.edge_fields)
+            if field in CATEGORICAL_FIELDS
+        }
+        # read for the aggregates only, so that the IDs and properties of the
+        # copy number alterations stay the same
+        self._aggregate_columns = [
+            field.value
+            for field in self.edge_fields
+            if field in AGGREGATE_FIELDS
+            and field.value not in declared_variants
+        ]
 
     def _load_data(self):
         """
-        Read CSV and create dataframes for variants and patients according to
-        the selected fields.
+        Read the input tables and create dataframes for genes and copy number
+        alterations according to the selected fields. Several tables are read
+        in parallel and processed one at a time, so that only the genes and
+        alterations, de-duplicated across tables, are kept, not the tables.
         """
         logger.info("Loading data.")
 
-        # read from csv
-        self.data = pd.read_csv("data/synthetic_cns.csv", sep="\t", header=0)
+        # each sample is connected to each gene by copy number, so only the
+        # specified node fields and edge fields are read
+        tables = self._iter_stage(
+            "read",
+            map_tables(self._read_table, list(self._inputs), self.read_workers),
+            size=len,
+        )
 
-        # each sample is connected to each gene by copy number; first, filter
-        # to keep only the specified node fields and edge fields
-        self.data = self.data[
-            [
-                field.value
-                for field in chain(
-                    self.node_fields,
-                    self.edge_fields,
-                )
-                if field.value in self.data.columns
-            ]
-        ]
+        genes, variants = [], []
+        # IDs of the copy number alterations of earlier tables
+        seen = set()
+        for data in tables:
+            table_genes, table_variants = self._process_table(data)
+            del data
+
+            with self._stage("dedupe", rows_in=len(table_variants)) as stage:
+                table_variants = table_variants[
+                    ~table_variants["VARIANT_ID"].isin(seen)
+                ]
+                seen.update(table_variants["VARIANT_ID"])
+                stage.rows_out = len(table_variants)
+                stage.dropped = stage.rows_in - stage.rows_out
+
+            genes.append(table_genes)
+            variants.append(table_variants)
+        del seen
+
+        # genes recur in every table; the ones of all tables fit in memory
+        with self._stage("dedupe", rows_in=sum(map(len, genes))) as stage:
+            self.genes = concat_tables(genes)
+            if len(genes) > 1:
+                self.genes = self.genes.drop_duplicates()
+            stage.rows_out = len(self.genes)
+            stage.dropped = stage.rows_in - stage.rows_out
+        self.variants = concat_tables(variants)
+
+        # convert the properties to their schema types, after hashing, so
+        # that the IDs depend on the input values only
+        self.genes = self._coerce(self.genes, "gene")
+        self.variants = self._coerce(self.variants, "copy_number_variant")
+
+    def _read_table(self, path: str) -> pd.DataFrame:
+        """
+        Read the selected columns of one input table.
+        """
+        return read_table(
+            path,
+            self._columns,
+            dtypes=self._dtypes,
+            filters=self.filters,
+        )
 
+    def _process_table(self, data: pd.DataFrame) -> tuple:
+        """
+        Return the distinct genes and copy number alterations of an input
+        table, the latter with their IDs.
+        """
         # GENES: remove all columns except the ones in CnGenesAdapterGeneField
         # and deduplicate
-        self.genes = self.data[
-            [
-                field.value
-                for field in CnGenesAdapterGeneField
-                if field.value in self.data.columns
-            ]
-        ].drop_duplicates()
+        with self._stage("dedupe", rows_in=len(data)) as stage:
+            genes = data[
+                [
+                    field.value
+                    for field in CnGenesAdapterGeneField
+                    if field.value in data.columns
+                ]
+            ].drop_duplicates()
+            stage.rows_out = len(genes)
+            stage.dropped = stage.rows_in - stage.rows_out
 
         # SAMPLES: should already be created by the all_variants adapter
 
         # VARIANTS: remove all columns except the ones in
         # CnGenesAdapterEdgeField, plus the sample id and gene NAME columns, and
         # deduplicate
-        self.variants = self.data[
-            [
-                field.value
-                for field in CnGenesAdapterEdgeField
-                if field.value in self.data.columns
-            ]
-            + [
-                CnGenesAdapterSampleField.ID.value,
-                CnGenesAdapterGeneField.NAME.value,
-            ]
-        ].drop_duplicates()
-
-        # generate an id for each variant using the md5 hash of all columns
-        self.variants["VARIANT_ID"] = self.variants.apply(
-            lambda row: hashlib.md5(
-                "".join(
-                    [str(row[column]) for column in self.variants.columns]
-                ).encode("utf-8")
-            ).hexdigest(),
-            axis=1,
-        )
+        with self._stage("dedupe", rows_in=len(data)) as stage:
+            variants = data[
+                [
+                    field.value
+                    for field in CnGenesAdapterEdgeField
+                    if field.value in data.columns
+                ]
+                + [
+                    CnGenesAdapterSampleField.ID.value,
+                    CnGenesAdapterGeneField.NAME.value,
+                ]
+            ].drop_duplicates()
+            stage.rows_out = len(variants)
+            stage.dropped = stage.rows_in - stage.rows_out
+
+        # generate an id for each variant by hashing all columns
+        with self._stage("hash", rows_in=len(variants)):
+            variants["VARIANT_ID"] = hash_columns(
+                variants,
+                [
+                    column
+                    for column in variants.columns
+                    if column not in self._aggregate_columns
+                ],
+            )
+
+        return genes, variants
 
     def get_nodes(self):
         """
@@ -163,6 +329,8 @@ class CnGenesAdapter:
         adapter constructor.
         """
 
+        self.load()
+
         logger.info("Generating nodes.")
 
         # GENES: for each node (row), yield a 3-tuple of node id (the 'NAME'
@@ -170,39 +338,75 @@ class CnGenesAdapter:
         # and node properties (dict of column names and values, except the
         # 'NAME')
 
-        for _, node in self.genes.iterrows():
-            node["name"] = node[CnGenesAdapterGeneField.NAME.value]
-            yield (
-                f"{node[CnGenesAdapterGeneField.NAME.value]}",
-                "gene",
-                node.drop(CnGenesAdapterGeneField.NAME.value).to_dict(),
-            )
+        yield from self._emit_nodes(
+            self.genes.assign(
+                name=self.genes[CnGenesAdapterGeneField.NAME.value]
+            ),
+            CnGenesAdapterGeneField.NAME.value,
+            "gene",
+        )
 
         # VARIANTS: for each node (row), yield a 3-tuple of node id (the 'VARIANT_ID'
         # column), node label (hardcode to 'copy_number_variant' for now), and
-        # node properties
-
-        for _, row in self.variants.iterrows():
-            _props = row.drop(
-                [
+        # node properties; missing floats, e.g. in N_MAJOR and N_MINOR, are
+        # written as 'NaN', since Neo4j can't deal with 'nan'
+
+        yield from self._emit_nodes(
+            self.variants,
+            "VARIANT_ID",
+            "copy_number_variant",
+            properties=[
+                column
+                for column in self.variants.columns
+                if column
+                not in [
                     "VARIANT_ID",
                     CnGenesAdapterSampleField.ID.value,
                     CnGenesAdapterGeneField.NAME.value,
+                    *self._aggregate_columns,
                 ]
-            ).to_dict()
-
-            # replace 'nan' with 'NaN' in N_MAJOR and N_MINOR; otherwise, Neo4j
-            # will throw an error (can't deal with 'nan')
-            if math.isnan(_props[CnGenesAdapterEdgeField.N_MAJOR.value]):
-                _props[CnGenesAdapterEdgeField.N_MAJOR.value] = "NaN"
-            if math.isnan(_props[CnGenesAdapterEdgeField.N_MINOR.value]):
-                _props[CnGenesAdapterEdgeField.N_MINOR.value] = "NaN"
-
-            yield (
-                row["VARIANT_ID"],
-                "copy_number_variant",
-                _props,
-            )
+            ],
+        )
+
+    def get_aggregates(self):
+        """
+        Yield the numbers of amplified and deleted genes of each patient and
+        of amplified and deleted patients of each gene, if the copy number
+        status is selected.
+        """
+
+        self.load()
+
+        status = CnGenesAdapterEdgeField.CN_STATUS.value
+        if status not in self.variants:
+            return
+
+        sample = CnGenesAdapterSampleField.ID.value
+        gene = CnGenesAdapterGeneField.NAME.value
+        alterations = self.variants[[sample, gene]].assign(
+            amplified=is_amplified(self.variants[status]),
+            deleted=is_deleted(self.variants[status]),
+        )
+
+        # the samples of the copy number table are named by patient
+        yield "patient", count_by(
+            alterations,
+            sample,
+            {
+                "amplified_gene_count": "amplified",
+                "deleted_gene_count": "deleted",
+            },
+            distinct=gene,
+        )
+        yield "gene", count_by(
+            alterations,
+            gene,
+            {
+                "amplified_patient_count": "amplified",
+                "deleted_patient_count": "deleted",
+            },
+            distinct=sample,
+        )
 
     def get_edges(self):
         """
@@ -210,31 +414,40 @@ class CnGenesAdapter:
         adapter constructor.
         """
 
+        self.load()
+
         logger.info("Generating edges.")
 
         # yield 5-tuple of edge id, source node id, target node id, edge label
         # (hardcode to 'copy_number_alteration' for now), and edge properties
         # (all columns except the source and target node ids)
 
-        for _, row in self.variants.iterrows():
-
-            # patient to variant
-            yield (
-                None,
-                row[CnGenesAdapterSampleField.ID.value],
-                row["VARIANT_ID"],
-                "patient_has_copy_number_variant",
-                {},
-            )
+        # patient to variant
+        yield from self._emit_edges(
+            self.variants,
+            CnGenesAdapterSampleField.ID.value,
+            "VARIANT_ID",
+            "patient_has_copy_number_variant",
+        )
 
-            # variant to gene
-            yield (
-                None,
-                row["VARIANT_ID"],
-                f"{row[CnGenesAdapterGeneField.NAME.value]}",
+        # variant to gene
+        variants = self.variants.assign(
+            **{
+                CnGenesAdapterGeneField.NAME.value: self.variants[
+                    CnGenesAdapterGeneField.NAME.value
+                ].astype(str)
+            }
+        )
+        yield from self._emit_edges(
+            self._resolve_genes(
+                variants,
+                CnGenesAdapterGeneField.NAME.value,
                 "copy_number_variant_in_gene",
-                {},
-            )
+            ),
+            "VARIANT_ID",
+            CnGenesAdapterGeneField.NAME.value,
+            "copy_number_variant_in_gene",
+        )
 
     def _set_types_and_fields(
         self, node_types, node_fields, edge_types, edge_fields
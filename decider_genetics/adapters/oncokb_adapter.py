@@ -1,27 +1,71 @@
-import hashlib
 import pandas as pd
+from typing import Optional
 from biocypher._logger import logger
+from decider_genetics.adapters.base_adapter import BaseAdapter
+from decider_genetics.aggregates import count_by
+from decider_genetics.cache import FrameCache
+from decider_genetics.profiling import BuildProfiler
+from decider_genetics.registry import NodeRegistry
+from decider_genetics.schema import DEFAULT_SCHEMA_CONFIG_PATH
+from decider_genetics.ids import hash_columns
 
 logger.debug(f"Loading module {__name__}.")
 
 
-class OncoKBAdapter:
+class OncoKBAdapter(BaseAdapter):
     """
     Load OncoKB druggability data.
+
+    Args:
+        registry: Node registry shared by all adapters of a build.
+        cache: Cache of processed frames.
+        profiler: Profiler measuring the stages of the build.
+        schema_config_path: Schema configuration of the build.
+        path: OncoKB biomarker-drug association table to read instead of the
+            one in data/, tab-separated.
     """
 
-    def __init__(self) -> None:
-        self._load_data()
+    _cached_frames = ("_data",)
+    _inputs = ("data/oncokb_biomarker_drug_associations.tsv",)
+
+    def __init__(
+        self,
+        registry: Optional[NodeRegistry] = None,
+        cache: Optional[FrameCache] = None,
+        profiler: Optional[BuildProfiler] = None,
+        schema_config_path: str = DEFAULT_SCHEMA_CONFIG_PATH,
+        path: Optional[str] = None,
+    ) -> None:
+        super().__init__(registry, cache, profiler, schema_config_path)
+        if path is not None:
+            self._inputs = (path,)
 
     def _load_data(self) -> None:
         logger.info("Loading data.")
 
         # read from csv
-        raw_df = pd.read_csv(
-            "data/oncokb_biomarker_drug_associations.tsv",
-            sep="\t",
-            header=0,
-        )
+        with self._stage("read") as stage:
+            raw_df = pd.read_csv(
+                self._inputs[0],
+                sep="\t",
+                header=0,
+            )
+            stage.rows_out = len(raw_df)
+
+        with self._stage("explode", rows_in=len(raw_df)) as stage:
+            raw_df = self._explode(raw_df)
+            stage.rows_out = len(raw_df)
+
+        self._data = raw_df
+
+        logger.info("Data loaded.")
+
+    @staticmethod
+    def _explode(raw_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Return one row per drug, alteration and cancer type of each biomarker,
+        dropping rows without drug.
+        """
 
         # explode the "Drugs (for therapeutic implications only)" column
         raw_df = raw_df.assign(
@@ -49,36 +93,62 @@ class OncoKBAdapter:
             )
         ]
 
-        self._data = raw_df
-
-        logger.info("Data loaded.")
+        return raw_df
 
     def get_nodes(self):
+        self.load()
+
         # drugs
-        drugs = (
-            self._data["Drugs (for therapeutic implications only)"]
-            .drop_duplicates()
-            .tolist()
+        with self._stage("dedupe", rows_in=len(self._data)) as stage:
+            drugs = self._data[
+                ["Drugs (for therapeutic implications only)"]
+            ].drop_duplicates()
+            stage.rows_out = len(drugs)
+            stage.dropped = stage.rows_in - stage.rows_out
+        drugs = drugs.assign(
+            id=drugs["Drugs (for therapeutic implications only)"],
+            name=drugs["Drugs (for therapeutic implications only)"],
+        )
+        yield from self._emit_nodes(
+            drugs,
+            "Drugs (for therapeutic implications only)",
+            "drug",
+            properties=["id", "name"],
         )
-        for drug in drugs:
-            yield (
-                drug,
-                "drug",
-                {"id": drug, "name": drug},
-            )
 
     def get_edges(self):
+        self.load()
+
         # gene druggability
-        for _, row in self._data.iterrows():
-            row_id = hashlib.sha256(str(row).encode("utf-8")).hexdigest()
-            yield (
-                row_id,
-                row["Gene"],
-                row["Drugs (for therapeutic implications only)"],
-                "potentially_druggable",
-                {
-                    "level": row["Level"],
-                    "alteration": row["Alterations"],
-                    "cancer_type": row["Cancer Types"],
-                },
-            )
+        data = self._resolve_genes(self._data, "Gene", "potentially_druggable")
+
+        with self._stage("hash", rows_in=len(data)):
+            ids = hash_columns(data)
+
+        yield from self._emit_edges(
+            data.assign(_id=ids),
+            "Gene",
+            "Drugs (for therapeutic implications only)",
+            "potentially_druggable",
+            id_column="_id",
+            properties=["Level", "Alterations", "Cancer Types"],
+            rename={
+                "Level": "level",
+                "Alterations": "alteration",
+                "Cancer Types": "cancer_type",
+            },
+        )
+
+    def get_aggregates(self):
+        """
+        Yield the number of genes each drug potentially targets, by their
+        OncoKB symbols, whether or not the graph has a node for them.
+        """
+        self.load()
+
+        yield "drug", count_by(
+            self._data,
+            "Drugs (for therapeutic implications only)",
+            {"targetable_gene_count": None},
+            distinct="Gene",
+        )
@@ -1,70 +1,127 @@
-import hashlib
+import numpy as np
 import pandas as pd
+from typing import Optional
 from biocypher._logger import logger
+from decider_genetics.adapters.base_adapter import BaseAdapter
+from decider_genetics.cache import FrameCache
+from decider_genetics.profiling import BuildProfiler
+from decider_genetics.registry import NodeRegistry
+from decider_genetics.schema import DEFAULT_SCHEMA_CONFIG_PATH
+from decider_genetics.ids import hash_pairs
+from decider_genetics.parts import part_files
+from decider_genetics.tables import concat_tables, map_tables
 
 logger.debug(f"Loading module {__name__}.")
 
+# labels of the part files of an oncodashkb export the adapter reads
+_PROCESS_FILES = "BiologicalProcess"
+_GENE_TO_PROCESS_FILES = "GeneToBiologicalProcess"
 
-class PandasAdapter:
+# suffixes oncodashkb appends to IDs to mark their type
+_PROCESS_SUFFIX = ":biological_process"
+_GENE_SUFFIX = ":gene_hugo"
+
+
+class PandasAdapter(BaseAdapter):
     """
     Transforms custom (demo) data from oncodashkb.
+
+    All part files of the biological processes and of the gene to process
+    associations are read, in parallel, with the IDs as categoricals, so
+    that suffixes are stripped once per distinct ID and duplicate pairs are
+    found by comparing integer codes.
+
+    Args:
+        registry: Node registry shared by all adapters of a build.
+        cache: Cache of processed frames.
+        profiler: Profiler measuring the stages of the build.
+        schema_config_path: Schema configuration of the build.
+        path: Directory of an oncodashkb export to read instead of the one in
+            data/, holding the BiologicalProcess and GeneToBiologicalProcess
+            part files, plain or gzipped.
+        read_workers: Number of part files read at the same time; defaults to
+            the number of CPUs.
     """
 
+    _cached_frames = ("nodes", "edges")
+    _inputs = (
+        "data/oncodash files/BiologicalProcess-part000.csv",
+        "data/oncodash files/GeneToBiologicalProcess-part000.csv",
+    )
+
     def __init__(
         self,
+        registry: Optional[NodeRegistry] = None,
+        cache: Optional[FrameCache] = None,
+        profiler: Optional[BuildProfiler] = None,
+        schema_config_path: str = DEFAULT_SCHEMA_CONFIG_PATH,
+        path: Optional[str] = None,
+        read_workers: Optional[int] = None,
     ):
-        self._load_data()
+        super().__init__(registry, cache, profiler, schema_config_path)
+        directory = path or "data/oncodash files"
+        # the first part of each, if the export has none, to fail on reading
+        self._process_files = part_files(directory, _PROCESS_FILES) or [
+            f"{directory}/{_PROCESS_FILES}-part000.csv"
+        ]
+        self._gene_to_process_files = part_files(
+            directory, _GENE_TO_PROCESS_FILES
+        ) or [f"{directory}/{_GENE_TO_PROCESS_FILES}-part000.csv"]
+        self._inputs = (*self._process_files, *self._gene_to_process_files)
+        self.read_workers = read_workers
 
     def _load_data(self):
         logger.info("Loading data.")
 
-        self.nodes = pd.DataFrame()
-        self.edges = pd.DataFrame()
-
-        # read from csv
-        bio_process = pd.read_csv(
-            "data/oncodash files/BiologicalProcess-part000.csv",
-            sep=";",
-            names=[
-                "id",
-                "name",
-                "preferred_id",
-                "label",
-            ],
+        # BIOLOGICAL PROCESSES: only the ID is read; the name is the ID
+        # without suffix, and the preferred ID and labels are the same for
+        # all processes
+        parts = self._iter_stage(
+            "read",
+            map_tables(
+                lambda path: _read_part(path, ["id"], 4),
+                self._process_files,
+                self.read_workers,
+            ),
+            size=len,
         )
-
-        bio_process.loc[:, "id"] = bio_process["id"].str.replace(
-            ":biological_process", ""
+        ids = _strip(concat_tables(list(parts))["id"], _PROCESS_SUFFIX)
+
+        with self._stage("dedupe", rows_in=len(ids)) as stage:
+            ids = ids[(ids != "None").to_numpy() & ~ids.duplicated().to_numpy()]
+            stage.rows_out = len(ids)
+            stage.dropped = stage.rows_in - stage.rows_out
+
+        self.nodes = pd.DataFrame({"id": ids, "name": ids})
+
+        # GENE TO PROCESS associations
+        parts = self._iter_stage(
+            "read",
+            map_tables(
+                lambda path: _read_part(path, ["Gene", "BiologicalProcess"], 3),
+                self._gene_to_process_files,
+                self.read_workers,
+            ),
+            size=len,
         )
-        bio_process["name"] = bio_process.loc[:, "id"]
-        bio_process.loc[:, "label"] = "biological_process"
-        bio_process = bio_process.drop(["preferred_id"], axis=1)
-        bio_process = bio_process[bio_process["id"] != "None"]
-
-        self.nodes = pd.concat([self.nodes, bio_process])
-
-        # read from csv
-        gene_to_process = pd.read_csv(
-            "data/oncodash files/GeneToBiologicalProcess-part000.csv",
-            sep=";",
-            names=[
-                "Gene",
-                "BiologicalProcess",
-                "Label",
-            ],
+        edges = concat_tables(list(parts))
+        edges = edges.assign(
+            Gene=_strip(edges["Gene"], _GENE_SUFFIX),
+            BiologicalProcess=_strip(
+                edges["BiologicalProcess"], _PROCESS_SUFFIX
+            ),
         )
-        gene_to_process.loc[:, "Gene"] = gene_to_process["Gene"].str.replace(
-            ":gene_hugo", ""
-        )
-        gene_to_process.loc[:, "BiologicalProcess"] = gene_to_process[
-            "BiologicalProcess"
-        ].str.replace(":biological_process", "")
-        gene_to_process.loc[:, "Label"] = "gene_to_process"
-        gene_to_process = gene_to_process[
-            gene_to_process["BiologicalProcess"] != "None"
-        ]
 
-        self.edges = pd.concat([self.edges, gene_to_process])
+        # pairs are compared by their category codes
+        with self._stage("dedupe", rows_in=len(edges)) as stage:
+            edges = edges[
+                (edges["BiologicalProcess"] != "None").to_numpy()
+                & ~edges.duplicated().to_numpy()
+            ]
+            stage.rows_out = len(edges)
+            stage.dropped = stage.rows_in - stage.rows_out
+
+        self.edges = edges
 
     def get_nodes(self):
         """
@@ -72,15 +129,13 @@ class PandasAdapter:
         adapter constructor.
         """
 
+        self.load()
+
         logger.info("Generating nodes.")
 
-        for _, row in self.nodes.iterrows():
-            properties = row.drop(["id", "label"]).to_dict()
-            yield (
-                row["id"],
-                row["label"],
-                properties,
-            )
+        yield from self._emit_nodes(
+            self.nodes, "id", "biological_process", properties=["name"]
+        )
 
     def get_edges(self):
         """
@@ -88,16 +143,61 @@ class PandasAdapter:
         adapter constructor.
         """
 
+        self.load()
+
         logger.info("Generating edges.")
 
-        for _, row in self.edges.iterrows():
-            p_id = row["Gene"]
-            s_id = row["BiologicalProcess"]
-            _id = hashlib.md5((p_id + s_id).encode("utf-8")).hexdigest()
-            yield (
-                _id,
-                p_id,
-                s_id,
-                "gene_to_process",
-                {},
-            )
+        edges = self._resolve_genes(self.edges, "Gene", "gene_to_process")
+
+        with self._stage("hash", rows_in=len(edges)):
+            ids = hash_pairs(edges["Gene"], edges["BiologicalProcess"])
+
+        yield from self._emit_edges(
+            edges.assign(_id=ids),
+            "Gene",
+            "BiologicalProcess",
+            "gene_to_process",
+            id_column="_id",
+        )
+
+
+def _read_part(path: str, columns: list, width: int) -> pd.DataFrame:
+    """
+    Read the leading columns of an oncodashkb part file, which has no header
+    and `width` columns, as categoricals. The columns are factorized after
+    reading, which is several times faster than parsing them as categoricals,
+    as the process IDs are nearly all distinct.
+    """
+    data = pd.read_csv(
+        path,
+        sep=";",
+        header=None,
+        names=columns + [f"_{i}" for i in range(len(columns), width)],
+        usecols=columns,
+    )
+    return pd.DataFrame(
+        {
+            column: pd.Categorical.from_codes(*pd.factorize(data[column]))
+            for column in columns
+        }
+    )
+
+
+def _strip(values: pd.Series, suffix: str) -> pd.Series:
+    """
+    Remove a suffix from the values of a categorical column, replacing it in
+    the categories only. Categories that become equal are merged.
+    """
+    categories = np.array(
+        [category.replace(suffix, "") for category in values.cat.categories],
+        dtype=object,
+    )
+    codes, uniques = pd.factorize(categories)
+    old = values.cat.codes.to_numpy()
+    return pd.Series(
+        pd.Categorical.from_codes(
+            np.where(old >= 0, codes[old], -1), categories=uniques
+        ),
+        index=values.index,
+        name=values.name,
+    )
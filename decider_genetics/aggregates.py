@@ -0,0 +1,213 @@
+import os
+import numpy as np
+import pandas as pd
+from typing import Callable, Iterable, Optional
+from biocypher._logger import logger
+
+logger.debug(f"Loading module {__name__}.")
+
+# column of the aggregate frames holding the node IDs
+ID_COLUMN = "id"
+
+# file of the output directory of a shard holding the aggregates of all nodes
+# the shard counted, whether it emitted them or not, for the merge to add up
+AGGREGATES_FILE = "aggregates.tsv"
+
+# values of Func.MANE, separated by ";", of variants in exons
+EXONIC_FUNCTIONS = {"exonic", "splicing"}
+
+# values of ExonicFunc.MANE of exonic variants that leave the protein as it is
+SILENT_EXONIC_FUNCTIONS = {".", "synonymous_SNV", "unknown"}
+
+# ClinVar significances, separated by "/", "|" or ",", counted as pathogenic,
+# compared in lower case
+PATHOGENIC_SIGNIFICANCES = {"pathogenic", "likely_pathogenic"}
+
+# values of CNstatus of amplified and deleted genes, compared in upper case
+AMPLIFIED_STATUSES = {"AMP", "GAIN"}
+DELETED_STATUSES = {"DEL", "HOMDEL", "LOSS"}
+
+
+def is_exonic(values: pd.Series) -> np.ndarray:
+    """
+    Return whether each variant, by its Func.MANE, lies in an exon or splice
+    site; "ncRNA_exonic" does not count.
+    """
+    return _flag(
+        values,
+        lambda value: bool(EXONIC_FUNCTIONS.intersection(value.split(";"))),
+    )
+
+
+def is_protein_altering(values: pd.Series) -> np.ndarray:
+    """
+    Return whether each variant, by its ExonicFunc.MANE, changes the protein:
+    missense, nonsense, frameshift and the like, not synonymous variants.
+    """
+    return _flag(
+        values,
+        lambda value: value.strip() not in SILENT_EXONIC_FUNCTIONS,
+    )
+
+
+def is_pathogenic(values: pd.Series) -> np.ndarray:
+    """
+    Return whether each variant, by its CLNSIG, is pathogenic or likely
+    pathogenic; conflicting interpretations do not count.
+    """
+    return _flag(
+        values,
+        lambda value: bool(
+            PATHOGENIC_SIGNIFICANCES.intersection(
+                value.lower().replace("|", "/").replace(",", "/").split("/")
+            )
+        ),
+    )
+
+
+def is_amplified(values: pd.Series) -> np.ndarray:
+    """
+    Return whether each copy number status is an amplification.
+    """
+    return _flag(
+        values, lambda value: value.strip().upper() in AMPLIFIED_STATUSES
+    )
+
+
+def is_deleted(values: pd.Series) -> np.ndarray:
+    """
+    Return whether each copy number status is a deletion.
+    """
+    return _flag(
+        values, lambda value: value.strip().upper() in DELETED_STATUSES
+    )
+
+
+def count_by(
+    frame: pd.DataFrame, key: str, counts: dict, distinct: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Count the rows of a frame per node, in total and where a flag is set.
+
+    Args:
+        frame: Data frame with a column of node IDs and boolean flag columns.
+        key: Column holding the node IDs.
+        counts: Mapping of the property keys of the counts to the flag
+            columns they count, or to None to count all rows.
+        distinct: Column whose distinct values are counted instead of rows,
+            e.g. the patients carrying a variant in a gene.
+
+    Returns:
+        Aggregate frame with one row per node, its ID in `ID_COLUMN` and one
+        integer column per count.
+    """
+    columns = {
+        name: frame[flag] if flag is not None else True
+        for name, flag in counts.items()
+    }
+    flags = pd.DataFrame(columns, index=frame.index).astype(bool)
+    if distinct is not None:
+        flags = flags.assign(**{key: frame[key], "_distinct": frame[distinct]})
+        flags = (
+            flags.groupby([key, "_distinct"], observed=True, sort=False)
+            .any()
+            .reset_index(level="_distinct", drop=True)
+        )
+    else:
+        flags = flags.set_axis(frame[key], axis=0)
+
+    aggregates = flags.groupby(level=0, observed=True, sort=False).sum()
+    aggregates.index = aggregates.index.astype(object)
+    return (
+        aggregates.rename_axis(ID_COLUMN)
+        .reset_index()
+        .astype({name: "int64" for name in counts})
+    )
+
+
+def combine_aggregates(items: Iterable) -> dict:
+    """
+    Combine the aggregate frames of several adapters per node label; counts
+    that several adapters provide for the same node are added up.
+
+    Args:
+        items: Iterable of (label, frame) tuples, as from `get_aggregates`.
+
+    Returns:
+        Mapping of node labels to frames indexed by node ID, with one column
+        per property; nodes missing from some frames count 0 there.
+    """
+    frames = {}
+    for label, frame in items:
+        frames.setdefault(label, []).append(frame)
+
+    return {
+        label: pd.concat(frames, ignore_index=True)
+        .groupby(ID_COLUMN, sort=False)
+        .sum(min_count=1)
+        .fillna(0)
+        .astype("int64")
+        for label, frames in frames.items()
+    }
+
+
+def write_aggregates(directory: str, aggregates: dict) -> str:
+    """
+    Write combined aggregates into an output directory, one row per node
+    label, node and property, leaving out counts of 0.
+
+    Args:
+        directory: The output directory.
+        aggregates: Mapping of node labels to frames indexed by node ID, as
+            from `combine_aggregates`.
+
+    Returns:
+        The path of the file.
+    """
+    frames = [
+        frame.rename_axis(ID_COLUMN)
+        .reset_index()
+        .melt(id_vars=ID_COLUMN, var_name="key")
+        .assign(label=label)
+        for label, frame in aggregates.items()
+    ]
+    rows = pd.concat(
+        frames or [pd.DataFrame(columns=[ID_COLUMN, "key", "value", "label"])],
+        ignore_index=True,
+    )
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, AGGREGATES_FILE)
+    rows[rows["value"] != 0][["label", ID_COLUMN, "key", "value"]].to_csv(
+        path, sep="\t", index=False
+    )
+    return path
+
+
+def read_aggregates(directory: str) -> Optional[pd.DataFrame]:
+    """
+    Read the aggregates of an output directory, see `write_aggregates`, or
+    return None if it has none.
+    """
+    path = os.path.join(directory, AGGREGATES_FILE)
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(
+        path,
+        sep="\t",
+        dtype={"label": str, ID_COLUMN: str, "key": str, "value": "int64"},
+        keep_default_na=False,
+    )
+
+
+def _flag(values: pd.Series, predicate: Callable) -> np.ndarray:
+    """
+    Evaluate a predicate on the distinct non-missing values of a column,
+    instead of every row; missing values are False.
+    """
+    codes, uniques = pd.factorize(values)
+    flags = np.fromiter(
+        (predicate(str(value)) for value in uniques),
+        dtype=bool,
+        count=len(uniques),
+    )
+    return np.append(flags, False)[codes]
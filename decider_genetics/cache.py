@@ -0,0 +1,241 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+import pyarrow
+from typing import Optional
+from biocypher._logger import logger
+from decider_genetics import coercion, ids, schema, tables
+
+logger.debug(f"Loading module {__name__}.")
+
+# read input files in blocks of this size when computing content hashes
+_BLOCK_SIZE = 1024**2
+
+
+class FrameCache:
+    """
+    Directory of processed adapter frames, stored as Parquet and keyed by the
+    content hash of the adapter's input files and of the schema configuration
+    its columns are converted with, the adapter's field selection and a hash
+    of the adapter's code. On a hit, the adapter restores its frames instead
+    of parsing, exploding and hashing its inputs again.
+
+    Entries are evicted least recently used first once the cache grows beyond
+    `max_bytes`.
+
+    Args:
+        directory: Directory holding the cache entries.
+        max_bytes: Upper bound of the total size of all entries.
+    """
+
+    def __init__(
+        self,
+        directory: str = "cache/frames",
+        max_bytes: int = 4 * 1024**3,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._digests_path = os.path.join(self.directory, "digests.json")
+        self._digests = self._read_digests()
+
+    def key(
+        self, adapter, inputs: list, selection, schema_config_path: str
+    ) -> str:
+        """
+        Compute the cache key of an adapter's processed frames.
+
+        Args:
+            adapter: The adapter instance; the source code of the modules of
+                its class and base classes and of the modules it reads,
+                converts and derives IDs with is part of the key, so that code
+                changes invalidate its entries.
+            inputs: Paths of the input files or dataset directories the
+                frames are derived from.
+            selection: Any repr-stable description of the adapter's
+                configuration, e.g. its node and edge types and fields.
+            schema_config_path: Path to the schema configuration the adapter
+                converts its columns with.
+        """
+        key = hashlib.sha256()
+        key.update(type(adapter).__qualname__.encode("utf-8"))
+        key.update(_code_version(adapter).encode("utf-8"))
+        key.update(repr(selection).encode("utf-8"))
+        # the property types the columns are converted to
+        key.update(self._content_hash(schema_config_path).encode("utf-8"))
+        for path in inputs:
+            if os.path.isdir(path):
+                # a partitioned dataset; partition values are part of the paths
+                for file in _dataset_files(path):
+                    key.update(os.path.relpath(file, path).encode("utf-8"))
+                    key.update(self._content_hash(file).encode("utf-8"))
+            else:
+                key.update(self._content_hash(path).encode("utf-8"))
+        return key.hexdigest()
+
+    def load(self, key: str) -> Optional[dict]:
+        """
+        Return the frames stored under the key, or None on a miss.
+        """
+        entry = os.path.join(self.directory, key)
+        manifest_path = os.path.join(entry, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return None
+
+        with open(manifest_path, encoding="utf-8") as f:
+            names = json.load(f)
+
+        frames = {
+            name: (
+                _read_frame(os.path.join(entry, f"{name}.parquet"))
+                if stored
+                else None
+            )
+            for name, stored in names.items()
+        }
+
+        # mark the entry as recently used
+        os.utime(entry)
+        logger.info(f"Loaded {len(frames)} frame(s) from cache entry {key}.")
+
+        return frames
+
+    def store(self, key: str, frames: dict) -> None:
+        """
+        Store frames under the key, then evict old entries if the cache has
+        grown beyond its size limit. Frames that are None are recorded as
+        such. If a frame cannot be written, the entry is discarded.
+        """
+        entry = os.path.join(self.directory, key)
+        partial = f"{entry}.partial"
+        shutil.rmtree(partial, ignore_errors=True)
+        os.makedirs(partial)
+
+        try:
+            for name, frame in frames.items():
+                if frame is not None:
+                    frame.to_parquet(os.path.join(partial, f"{name}.parquet"))
+        except (ValueError, TypeError, pyarrow.ArrowException) as e:
+            logger.warning(f"Could not cache frames under {key}: {e}")
+            shutil.rmtree(partial, ignore_errors=True)
+            return
+
+        with open(
+            os.path.join(partial, "manifest.json"), "w", encoding="utf-8"
+        ) as f:
+            json.dump(
+                {name: frame is not None for name, frame in frames.items()}, f
+            )
+
+        # publish the entry in one step, so readers never see half of it
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(partial, entry)
+
+        self._evict()
+
+    def _evict(self) -> None:
+        """
+        Remove the least recently used entries until the total size of the
+        cache is within `max_bytes`.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not os.path.isdir(path) or path.endswith(".partial"):
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(path, file))
+                for file in os.listdir(path)
+            )
+            entries.append((os.path.getmtime(path), size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            logger.info(f"Evicting cache entry {os.path.basename(path)}.")
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def _content_hash(self, path: str) -> str:
+        """
+        Return the SHA-256 of a file's content. Digests are remembered by path,
+        size and modification time, so unchanged inputs are not re-read.
+        """
+        stat = os.stat(path)
+        abspath = os.path.abspath(path)
+        known = self._digests.get(abspath)
+        if known and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return known[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_BLOCK_SIZE), b""):
+                digest.update(block)
+
+        self._digests[abspath] = [
+            stat.st_size,
+            stat.st_mtime_ns,
+            digest.hexdigest(),
+        ]
+        self._write_digests()
+
+        return digest.hexdigest()
+
+    def _read_digests(self) -> dict:
+        try:
+            with open(self._digests_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_digests(self) -> None:
+        partial = f"{self._digests_path}.{os.getpid()}.{time.time_ns()}"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(self._digests, f)
+        os.replace(partial, self._digests_path)
+
+
+def _read_frame(path: str) -> pd.DataFrame:
+    """
+    Read a cached frame. Parquet stores missing values in text columns as
+    None; they are restored to NaN, as pandas produces them when parsing.
+    """
+    frame = pd.read_parquet(path)
+    for column in frame.columns[frame.dtypes == object]:
+        frame[column] = frame[column].where(frame[column].notna(), np.nan)
+    return frame
+
+
+def _dataset_files(directory: str) -> list:
+    """
+    Return the files of a dataset directory in a stable order.
+    """
+    return sorted(
+        os.path.join(root, name)
+        for root, _, files in os.walk(directory)
+        for name in files
+    )
+
+
+def _code_version(adapter) -> str:
+    """
+    Hash the source of the modules that determine an adapter's frames: the
+    modules of the adapter class and its base classes, and the modules
+    reading the tables, converting the property types and deriving the IDs.
+    """
+    modules = [
+        inspect.getmodule(cls)
+        for cls in type(adapter).__mro__
+        if cls is not object
+    ]
+    digest = hashlib.sha256()
+    for module in modules + [tables, coercion, schema, ids]:
+        digest.update(inspect.getsource(module).encode("utf-8"))
+    return digest.hexdigest()
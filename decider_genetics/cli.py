@@ -0,0 +1,928 @@
+"""
+Command line interface of the knowledge graph build. Only the standard
+library is imported at module level, so that `--help` and argument errors
+return immediately; pandas, BioCypher and the adapters are imported once the
+arguments are parsed, and only the selected adapters load any data.
+"""
+
+import argparse
+import os
+import shutil
+from typing import Optional
+
+# adapter jobs in the order their nodes are written
+ADAPTERS = ["variants", "copy_numbers", "gene_ontology", "oncokb", "clinical"]
+
+# node labels several adapters contribute to, merged instead of dropped
+MERGE_LABELS = ["gene", "patient", "drug"]
+
+# patient column and delimiter of the inputs of the adapters that are
+# partitioned by patient in sharded builds; the others are built by shard 0
+PATIENT_COLUMNS = {
+    "variants": ("patient", "\t"),
+    "copy_numbers": ("sample", "\t"),
+    "clinical": ("Patient", ";"),
+}
+
+# aggregates of shared nodes that count patients, e.g. the patients with a
+# variant in a gene; each shard counts its own patients, and since shards
+# hold disjoint patients, merging them adds up their counts
+COHORT_COUNTS = [
+    "mutated_patient_count",
+    "amplified_patient_count",
+    "deleted_patient_count",
+]
+
+
+def variant_adapter_args() -> dict:
+    """
+    Return the node and edge types and fields of the variant adapter.
+    """
+    from decider_genetics.adapters.all_variants_adapter import (
+        AllVariantsAdapterNodeType,
+        AllVariantsAdapterEdgeType,
+        AllVariantsAdapterPatientField,
+        AllVariantsAdapterSampleField,
+        AllVariantsAdapterVariantField,
+    )
+
+    # VARIANTS from all_variants.csv
+    variant_node_types = [
+        AllVariantsAdapterNodeType.PATIENT,
+        AllVariantsAdapterNodeType.SAMPLE,
+        AllVariantsAdapterNodeType.VARIANT,
+    ]
+
+    variant_node_fields = [
+        # Patients
+        AllVariantsAdapterPatientField.ID,
+        AllVariantsAdapterPatientField.SAMPLES,
+        # Samples
+        AllVariantsAdapterSampleField.ID,
+        AllVariantsAdapterSampleField.READ_COUNTS,
+        # Variants
+        AllVariantsAdapterVariantField.ID,
+        AllVariantsAdapterVariantField.CHROMOSOME,
+        AllVariantsAdapterVariantField.POSITION,
+        AllVariantsAdapterVariantField.REF,
+        AllVariantsAdapterVariantField.ALT,
+        AllVariantsAdapterVariantField.GENE,
+        AllVariantsAdapterVariantField.CADD_PHRED,
+        AllVariantsAdapterVariantField.FUNCTION,
+        AllVariantsAdapterVariantField.EXONIC_FUNCTION,
+        AllVariantsAdapterVariantField.AA_CHANGE,
+        AllVariantsAdapterVariantField.COSMIC_TOTAL_OCCURENCE,
+        AllVariantsAdapterVariantField.CLNSIG,
+        AllVariantsAdapterVariantField.CLNREVSTAT,
+        AllVariantsAdapterVariantField.GNOMAD_GENOME_MAX,
+    ]
+
+    variant_edge_types = [
+        AllVariantsAdapterEdgeType.PATIENT_SAMPLE_ASSOCIATION,
+        AllVariantsAdapterEdgeType.SAMPLE_VARIANT_ASSOCIATION,
+        AllVariantsAdapterEdgeType.VARIANT_GENE_ASSOCIATION,
+        AllVariantsAdapterEdgeType.VARIANT_GENE_OVERLAP,
+        AllVariantsAdapterEdgeType.VARIANT_COPY_NUMBER_OVERLAP,
+    ]
+
+    return dict(
+        node_types=variant_node_types,
+        node_fields=variant_node_fields,
+        edge_types=variant_edge_types,
+        # variants are linked to the genes and copy number alterations of the
+        # copy number table by genomic position
+        copy_numbers=cn_adapter_args(),
+    )
+
+
+def cn_adapter_args() -> dict:
+    """
+    Return the node and edge types and fields of the copy number adapter.
+    """
+    from decider_genetics.adapters.cn_genes_adapter import (
+        CnGenesAdapterNodeType,
+        CnGenesAdapterEdgeType,
+        CnGenesAdapterSampleField,
+        CnGenesAdapterGeneField,
+        CnGenesAdapterEdgeField,
+    )
+
+    # COPY NUMBERS from CnCombinedGenes.csv
+    cn_node_types = [
+        CnGenesAdapterNodeType.SAMPLE,
+        CnGenesAdapterNodeType.GENE,
+    ]
+
+    cn_node_fields = [
+        # Samples
+        CnGenesAdapterSampleField.ID,
+        # Genes
+        CnGenesAdapterGeneField.ENSEMBL_ID,
+        CnGenesAdapterGeneField.NAME,
+        CnGenesAdapterGeneField.CHR,
+        CnGenesAdapterGeneField.START,
+        CnGenesAdapterGeneField.END,
+        CnGenesAdapterGeneField.STRAND,
+        CnGenesAdapterGeneField.BAND,
+        CnGenesAdapterGeneField.TYPE,
+    ]
+
+    cn_edge_types = [
+        CnGenesAdapterEdgeType.SAMPLE_GENE_ASSOCIATION,
+    ]
+
+    cn_edge_fields = [
+        CnGenesAdapterEdgeField.BREAKS_IN_GENE,
+        CnGenesAdapterEdgeField.N_MAJOR,
+        CnGenesAdapterEdgeField.N_MINOR,
+        CnGenesAdapterEdgeField.PURIFIED_LOG_R,
+        CnGenesAdapterEdgeField.MIN_PURIFIED_LOG_R,
+        CnGenesAdapterEdgeField.MAX_PURIFIED_LOG_R,
+        CnGenesAdapterEdgeField.PURIFIED_BAF,
+        CnGenesAdapterEdgeField.PURIFIED_LOH,
+        # only counted, see `CnGenesAdapter.get_aggregates`
+        CnGenesAdapterEdgeField.CN_STATUS,
+    ]
+
+    return dict(
+        node_types=cn_node_types,
+        node_fields=cn_node_fields,
+        edge_types=cn_edge_types,
+        edge_fields=cn_edge_fields,
+    )
+
+
+def adapter_jobs(
+    names: list,
+    paths: dict,
+    shard: Optional[tuple] = None,
+    seed: Optional[int] = None,
+    streaming: bool = False,
+    memory_budget: Optional[int] = None,
+    schema_config_path: Optional[str] = None,
+) -> list:
+    """
+    Create the jobs of the selected adapters, importing only their modules.
+
+    Args:
+        names: Names of the adapters to build, see `ADAPTERS`.
+        paths: Input paths of adapters that should not read the files in
+            data/, by adapter name; the variant and copy number inputs may be
+            lists or glob patterns. The copy number paths also apply to the
+            positional overlaps of the variants.
+        shard: Index and number of shards, to build only the patients of one
+            shard with the adapters in `PATIENT_COLUMNS`, and the other
+            adapters only in shard 0.
+        seed: Seed of the synthetic clinical data; None for random data.
+        streaming: Stream the variant tables in chunks, see
+            `AllVariantsAdapter`.
+        memory_budget: Approximate size in bytes of a chunk of the variant
+            tables when streaming; None for the adapter's default.
+        schema_config_path: Schema configuration of the build, which
+            declares the properties the adapters read and their types; None
+            for the adapters' default.
+    """
+    from decider_genetics.pipeline import AdapterJob
+
+    jobs = []
+    for name in ADAPTERS:
+        if name not in names:
+            continue
+        if shard is not None and shard[0] > 0 and name not in PATIENT_COLUMNS:
+            continue
+
+        kwargs = {}
+        if name == "variants":
+            from decider_genetics.adapters.all_variants_adapter import (
+                AllVariantsAdapter as adapter_class,
+            )
+
+            kwargs = variant_adapter_args()
+            if streaming:
+                kwargs["streaming"] = True
+                if memory_budget is not None:
+                    kwargs["memory_budget"] = memory_budget
+            if paths.get("copy_numbers"):
+                kwargs["copy_numbers"]["path"] = paths["copy_numbers"]
+            if shard is not None:
+                # only the copy number alterations of the shard's patients
+                # can overlap its variants
+                from decider_genetics.adapters.cn_genes_adapter import (
+                    CnGenesAdapter,
+                )
+
+                kwargs["copy_numbers"]["filters"] = _shard_filters(
+                    "copy_numbers",
+                    paths.get("copy_numbers") or CnGenesAdapter._inputs,
+                    shard,
+                )
+        elif name == "copy_numbers":
+            from decider_genetics.adapters.cn_genes_adapter import (
+                CnGenesAdapter as adapter_class,
+            )
+
+            kwargs = cn_adapter_args()
+        elif name == "gene_ontology":
+            from decider_genetics.adapters.pandas_adapter import (
+                PandasAdapter as adapter_class,
+            )
+        elif name == "oncokb":
+            from decider_genetics.adapters.oncokb_adapter import (
+                OncoKBAdapter as adapter_class,
+            )
+        else:
+            from decider_genetics.adapters.clinical_adapter import (
+                ClinicalAdapter as adapter_class,
+            )
+
+            if seed is not None:
+                kwargs["seed"] = seed
+
+        if paths.get(name):
+            kwargs["path"] = paths[name]
+        if schema_config_path is not None:
+            kwargs["schema_config_path"] = schema_config_path
+        if shard is not None and name in PATIENT_COLUMNS:
+            kwargs["filters"] = _shard_filters(
+                name, paths.get(name) or adapter_class._inputs, shard
+            )
+        jobs.append(AdapterJob(name, adapter_class, kwargs))
+
+    return jobs
+
+
+def _shard_filters(name: str, paths, shard: tuple) -> list:
+    """
+    Return the row filter selecting the patients of a shard from the inputs
+    of an adapter, given as for `tables.expand_paths`.
+    """
+    from decider_genetics.shards import shard_patients
+    from decider_genetics.tables import expand_paths
+
+    column, sep = PATIENT_COLUMNS[name]
+    patients = shard_patients(
+        [(path, column, sep) for path in expand_paths(paths)],
+        shard[1],
+        shard[0],
+    )
+    return [(column, "in", patients)]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="decider-genetics",
+        description="Build the DECIDER genetics knowledge graph.",
+    )
+    parser.add_argument(
+        "--adapters",
+        nargs="+",
+        choices=ADAPTERS,
+        default=ADAPTERS,
+        metavar="ADAPTER",
+        help="adapters to build, of: %(choices)s (default: all)",
+    )
+
+    inputs = parser.add_argument_group(
+        "inputs", "input paths replacing the files in data/"
+    )
+    inputs.add_argument(
+        "--variants",
+        nargs="+",
+        metavar="PATH",
+        help="variant tables: tab-separated, Parquet or Arrow files, or "
+        "dataset directories, or quoted glob patterns of them; several are "
+        "read in parallel and their variants de-duplicated",
+    )
+    inputs.add_argument(
+        "--copy-numbers",
+        nargs="+",
+        metavar="PATH",
+        help="copy number tables: tab-separated, Parquet or Arrow files, or "
+        "dataset directories, or quoted glob patterns of them",
+    )
+    inputs.add_argument(
+        "--gene-ontology",
+        metavar="DIR",
+        help="directory of the oncodashkb biological process files",
+    )
+    inputs.add_argument(
+        "--oncokb",
+        metavar="PATH",
+        help="OncoKB biomarker-drug association table",
+    )
+    inputs.add_argument(
+        "--clinical",
+        metavar="PATH",
+        help="clinical table",
+    )
+    inputs.add_argument(
+        "--gene-aliases",
+        metavar="PATH",
+        help="HGNC complete set table (hgnc_complete_set.txt), to resolve "
+        "alias and previous symbols of the genes the variant, gene ontology "
+        "and OncoKB edges point to, in addition to the symbols and Ensembl "
+        "IDs of the copy number genes",
+    )
+
+    output = parser.add_argument_group("output")
+    output.add_argument(
+        "--config",
+        default="config/biocypher_config.yaml",
+        help="BioCypher configuration (default: %(default)s)",
+    )
+    output.add_argument(
+        "--output-dir",
+        help="output directory (default: as configured, or a time-stamped "
+        "directory in biocypher-out)",
+    )
+    output.add_argument(
+        "--keep-dangling",
+        action="store_true",
+        help="keep edges to nodes no selected adapter emits, e.g. to genes "
+        "when building the variants without the copy numbers",
+    )
+    output.add_argument(
+        "--gene-report",
+        metavar="PATH",
+        help="write the number of edges of every adapter whose genes are not "
+        "among the copy number genes, with examples, to this JSON file",
+    )
+    output.add_argument(
+        "--compress",
+        nargs="?",
+        type=int,
+        const=6,
+        choices=range(1, 10),
+        metavar="LEVEL",
+        help="gzip the part files, at this level from 1 (fastest) to 9 "
+        "(smallest), 6 if not given; neo4j-admin reads them as they are",
+    )
+    output.add_argument(
+        "--seed",
+        type=int,
+        help="seed of the synthetic clinical data (default: random, 0 with "
+        "--reproducible)",
+    )
+    output.add_argument(
+        "--reproducible",
+        action="store_true",
+        help="seed the synthetic data, record the hashes of the output files "
+        "in manifest.json, and skip the build if the manifest of the output "
+        "directory shows it was built from the same inputs, options and code",
+    )
+    output.add_argument(
+        "--no-columnar",
+        action="store_true",
+        help="write every node and edge through BioCypher instead of writing "
+        "the adapter frames column by column; the output is the same",
+    )
+
+    delta = parser.add_argument_group(
+        "delta import",
+        "update a graph imported from an earlier build instead of importing "
+        "the whole graph anew",
+    )
+    delta.add_argument(
+        "--delta",
+        metavar="PREVIOUS",
+        help="compare the build with an earlier one, given as its output "
+        "directory or its entities.tsv.gz, and write the added, changed and "
+        "removed nodes and edges as Cypher statements to --delta-dir",
+    )
+    delta.add_argument(
+        "--delta-dir",
+        default="biocypher-out/delta",
+        help="directory of the delta script and summary (default: "
+        "%(default)s)",
+    )
+    delta.add_argument(
+        "--delta-batch-size",
+        type=int,
+        default=10_000,
+        metavar="ROWS",
+        help="rows per UNWIND statement (default: %(default)s)",
+    )
+
+    online = parser.add_argument_group(
+        "online ingestion",
+        "write the selected adapters into a running Neo4j database instead "
+        "of writing import files; the connection is read from the neo4j "
+        "section of --config, the password also from NEO4J_PASSWORD",
+    )
+    online.add_argument(
+        "--online",
+        action="store_true",
+        help="merge the nodes and edges of the selected adapters into the "
+        "database, e.g. --adapters variants copy_numbers with new inputs",
+    )
+    online.add_argument(
+        "--online-uri",
+        metavar="URI",
+        help="URI of the database (default: as configured)",
+    )
+    online.add_argument(
+        "--online-batch-size",
+        type=int,
+        default=10_000,
+        metavar="ROWS",
+        help="rows per UNWIND statement (default: %(default)s)",
+    )
+    online.add_argument(
+        "--online-concurrency",
+        type=int,
+        default=4,
+        metavar="N",
+        help="write transactions running at the same time (default: "
+        "%(default)s)",
+    )
+    online.add_argument(
+        "--online-retries",
+        type=int,
+        default=5,
+        metavar="N",
+        help="retries of a batch after transient errors, such as deadlocks "
+        "or lost connections (default: %(default)s)",
+    )
+
+    resources = parser.add_argument_group("resources")
+    resources.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="number of adapters to build in parallel (default: number of "
+        "CPUs)",
+    )
+    resources.add_argument(
+        "--max-memory",
+        type=float,
+        default=None,
+        help="memory budget of the adapters running at once, in GiB",
+    )
+    resources.add_argument(
+        "--streaming",
+        action="store_true",
+        help="read, explode and hash the variant tables in chunks each time "
+        "their nodes or edges are written, instead of holding them in memory; "
+        "the frame cache is not used for them, and the output is the same",
+    )
+    resources.add_argument(
+        "--memory-budget",
+        type=int,
+        default=None,
+        metavar="MiB",
+        help="approximate size of a chunk of the variant tables with "
+        "--streaming, in MiB (default: 256)",
+    )
+    resources.add_argument(
+        "--cache-dir",
+        default="cache/frames",
+        help="directory of the processed frame cache (default: %(default)s)",
+    )
+    resources.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="do not read or write the frame cache",
+    )
+
+    sharding = parser.add_argument_group(
+        "sharding",
+        "partition the variants, copy numbers and clinical data by patient, "
+        "and build each shard separately",
+    )
+    sharding.add_argument(
+        "--shards",
+        type=int,
+        metavar="N",
+        help="number of shards; without --shard, build all shards one after "
+        "another and merge them into --output-dir",
+    )
+    sharding.add_argument(
+        "--shard",
+        type=int,
+        metavar="I",
+        help="build only shard I (from 0), e.g. on a machine of its own, for "
+        "a later --merge; shard 0 also builds the other adapters",
+    )
+    sharding.add_argument(
+        "--merge",
+        nargs="+",
+        metavar="DIR",
+        help="merge the outputs of shard builds into --output-dir instead of "
+        "building",
+    )
+
+    profiling = parser.add_argument_group("profiling")
+    profiling.add_argument(
+        "--report",
+        help="write the timings, row counts and memory peaks of every adapter "
+        "stage to this JSON file",
+    )
+    profiling.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="record the peak traced memory of every stage (slower)",
+    )
+    profiling.add_argument(
+        "--profile-dir",
+        help="dump a cProfile file per adapter and stage into this directory",
+    )
+
+    return parser
+
+
+def main(argv: list = None) -> None:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.shard is not None and args.shards is None:
+        parser.error("--shard requires --shards")
+    if args.shards is not None and args.shards < 1:
+        parser.error("--shards must be at least 1")
+    if args.shard is not None and not 0 <= args.shard < args.shards:
+        parser.error(f"--shard must be between 0 and {args.shards - 1}")
+    if args.memory_budget is not None and not args.streaming:
+        parser.error("--memory-budget requires --streaming")
+    if args.memory_budget is not None and args.memory_budget < 1:
+        parser.error("--memory-budget must be at least 1")
+    if args.merge and args.shards is not None:
+        parser.error("--merge cannot be combined with --shards")
+    if (args.merge or args.shards and args.shard is None) and not (
+        args.output_dir
+    ):
+        parser.error("merging shards requires --output-dir")
+
+    if args.online and (
+        args.merge or args.shards or args.delta or args.reproducible
+    ):
+        parser.error(
+            "--online cannot be combined with --merge, --shards, --delta or "
+            "--reproducible"
+        )
+    if args.online_batch_size < 1 or args.online_concurrency < 1:
+        parser.error(
+            "--online-batch-size and --online-concurrency must be at least 1"
+        )
+
+    if args.online:
+        _online(args)
+        return
+
+    if (args.reproducible or args.delta) and not args.output_dir:
+        from decider_genetics.pipeline import configured_output_directory
+
+        args.output_dir = configured_output_directory(args.config)
+
+    current = False
+    if args.reproducible:
+        if args.seed is None:
+            args.seed = 0
+        key = _build_key(args)
+
+        from decider_genetics.manifest import is_current
+
+        current = is_current(args.output_dir, key)
+
+    previous = None
+    if args.delta:
+        from decider_genetics.delta import read_entity_index
+
+        # read before building, which may replace the earlier build
+        previous = read_entity_index(args.delta, args.config)
+
+    from decider_genetics.profiling import BuildProfiler
+
+    profiler = None
+    if args.report or args.trace_memory or args.profile_dir:
+        profiler = BuildProfiler(
+            trace_memory=args.trace_memory,
+            profile_directory=args.profile_dir,
+        )
+
+    gene_index = None
+    if current:
+        from biocypher._logger import logger
+
+        logger.info(
+            f"{args.output_dir} holds the output of the same build; "
+            "skipping it."
+        )
+    elif args.merge:
+        _merge(args, args.merge)
+    elif args.shards is None:
+        gene_index = _gene_index(args, not args.keep_dangling)
+        _build(args, args.output_dir, profiler, gene_index)
+    elif args.shard is not None:
+        gene_index = _gene_index(args, False)
+        _build(
+            args,
+            args.output_dir,
+            profiler,
+            gene_index,
+            (args.shard, args.shards),
+        )
+    else:
+        gene_index = _gene_index(args, False)
+        # shards are built one after another, so that only one shard's
+        # patients are held in memory at a time
+        directories = [
+            os.path.join(args.output_dir, "shards", str(shard))
+            for shard in range(args.shards)
+        ]
+        for shard, directory in enumerate(directories):
+            shutil.rmtree(directory, ignore_errors=True)
+            # shards are compressed when they are merged
+            _build(
+                args,
+                directory,
+                profiler,
+                gene_index,
+                (shard, args.shards),
+                False,
+            )
+        _merge(args, directories)
+        shutil.rmtree(
+            os.path.join(args.output_dir, "shards"), ignore_errors=True
+        )
+
+    index = None
+    if args.delta:
+        index = _delta(args, previous).index
+
+    if (args.reproducible or args.delta) and not current:
+        from decider_genetics.delta import entity_index, write_entity_index
+
+        # the next build's delta is computed against this one
+        if index is None:
+            index = entity_index(args.output_dir, args.config)
+        write_entity_index(args.output_dir, index)
+
+    if args.reproducible and not current:
+        from decider_genetics.manifest import write_manifest
+
+        write_manifest(args.output_dir, key)
+
+    if gene_index is not None:
+        _gene_report(args, gene_index)
+
+    if args.report:
+        profiler.write_report(args.report)
+
+
+def _build(
+    args, output_directory, profiler, gene_index, shard=None, compress=True
+) -> None:
+    """
+    Build the selected adapters, or the given shard of them, compressing the
+    part files as requested unless `compress` is false.
+    """
+    from decider_genetics.pipeline import BuildPipeline
+    from decider_genetics.schema import schema_config_path
+
+    # Create a knowledge graph from the selected adapters; nodes are
+    # de-duplicated across adapters, duplicate gene, patient and drug nodes
+    # are merged, and edges to nodes that are never emitted are dropped,
+    # before anything is written; shards keep them for the merge. Edges to
+    # genes are resolved to the gene nodes through the gene index. Adapters
+    # load their data only once they are built, and processed adapter frames
+    # are cached. Their aggregates are set as properties of the merged nodes;
+    # shards also write them all, for the merge to add up the patient counts.
+    pipeline = BuildPipeline(
+        jobs=adapter_jobs(
+            args.adapters,
+            _input_paths(args),
+            shard,
+            args.seed,
+            args.streaming,
+            _memory_budget(args),
+            schema_config_path(args.config),
+        ),
+        biocypher_config_path=args.config,
+        output_directory=output_directory,
+        merge_labels=MERGE_LABELS,
+        drop_dangling=shard is None and not args.keep_dangling,
+        cache_directory=None if args.no_cache else args.cache_dir,
+        workers=args.workers,
+        max_memory=int(args.max_memory * 1024**3) if args.max_memory else None,
+        profiler=profiler,
+        columnar=not args.no_columnar,
+        compression_level=args.compress if compress else None,
+        gene_index=gene_index,
+        write_aggregates=shard is not None,
+    )
+    bc = pipeline.run()
+
+    # Print summary
+    pipeline.registry.log_summary()
+    bc.summary()
+
+
+def _gene_index(args, drop_unresolved: bool):
+    """
+    Create the index of the names of the genes of the copy number tables,
+    and of their aliases, see `genes.GeneIndex`.
+    """
+    from decider_genetics.genes import GeneIndex
+
+    return GeneIndex.from_tables(
+        _gene_tables(args), args.gene_aliases, drop_unresolved
+    )
+
+
+def _gene_tables(args) -> list:
+    """
+    Return the copy number tables the gene index is created from.
+    """
+    from decider_genetics.adapters.cn_genes_adapter import CnGenesAdapter
+    from decider_genetics.tables import expand_paths
+
+    return expand_paths(args.copy_numbers or list(CnGenesAdapter._inputs))
+
+
+def _gene_report(args, gene_index) -> None:
+    """
+    Log the edges whose genes were not resolved, and write the summary of the
+    gene index if requested.
+    """
+    gene_index.log_summary()
+    if args.gene_report:
+        import json
+
+        directory = os.path.dirname(args.gene_report)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.gene_report, "w", encoding="utf-8") as f:
+            json.dump(gene_index.summary(), f, indent=2)
+
+
+def _online(args) -> None:
+    """
+    Write the selected adapters into the configured Neo4j database.
+    """
+    import neo4j
+    from biocypher import BioCypher
+    from biocypher._config import config
+    from decider_genetics.cache import FrameCache
+    from decider_genetics.online import OnlineIngestor
+    from decider_genetics.registry import NodeRegistry
+    from decider_genetics.schema import schema_config_path
+
+    bc = BioCypher(biocypher_config_path=args.config)
+    settings = config("neo4j")
+    password = os.environ.get("NEO4J_PASSWORD", settings.get("password"))
+
+    # nodes several adapters emit are merged before they are written, edges
+    # are kept, since their nodes may already be in the database; edges to
+    # genes point to the gene nodes' IDs, or keep their names
+    registry = NodeRegistry(merge_labels=MERGE_LABELS)
+    cache = None if args.no_cache else FrameCache(args.cache_dir)
+    gene_index = _gene_index(args, False)
+    jobs = adapter_jobs(
+        args.adapters,
+        _input_paths(args),
+        seed=args.seed,
+        streaming=args.streaming,
+        memory_budget=_memory_budget(args),
+        schema_config_path=schema_config_path(args.config),
+    )
+    adapters = []
+    for job in jobs:
+        adapter = job.adapter_class(
+            registry=registry, cache=cache, **job.kwargs
+        )
+        adapter.gene_index = gene_index.resolver()
+        adapters.append(adapter)
+
+    driver = neo4j.GraphDatabase.driver(
+        args.online_uri or settings["uri"],
+        auth=(settings.get("user"), password),
+        max_connection_pool_size=max(100, args.online_concurrency),
+    )
+    try:
+        with OnlineIngestor(
+            driver,
+            bc,
+            database=settings.get("database_name"),
+            batch_size=args.online_batch_size,
+            concurrency=args.online_concurrency,
+            max_retries=args.online_retries,
+        ) as ingestor:
+            ingestor.ingest(adapters, registry)
+    finally:
+        driver.close()
+
+    for job, adapter in zip(jobs, adapters):
+        gene_index.absorb(job.name, adapter.gene_index)
+
+    registry.log_summary()
+    ingestor.log_summary()
+    _gene_report(args, gene_index)
+
+
+def _merge(args, directories: list) -> None:
+    """
+    Merge the outputs of shard builds into one import set.
+    """
+    from decider_genetics.shards import ShardMerger
+
+    merger = ShardMerger(
+        directories,
+        biocypher_config_path=args.config,
+        output_directory=args.output_dir,
+        drop_dangling=not args.keep_dangling,
+        compression_level=args.compress,
+        summed_properties=COHORT_COUNTS,
+    )
+    merger.run()
+    merger.log_summary()
+
+
+def _input_paths(args) -> dict:
+    """
+    Return the input paths given on the command line, by adapter name.
+    """
+    return {
+        "variants": args.variants,
+        "copy_numbers": args.copy_numbers,
+        "gene_ontology": args.gene_ontology,
+        "oncokb": args.oncokb,
+        "clinical": args.clinical,
+    }
+
+
+def _memory_budget(args) -> Optional[int]:
+    """
+    Return the chunk size of streamed variant tables in bytes, if given.
+    """
+    if args.memory_budget is None:
+        return None
+    return args.memory_budget * 1024**2
+
+
+def _build_key(args) -> str:
+    """
+    Compute the key of the build or merge the arguments ask for, see
+    `manifest.build_key`; options that do not change the output, such as the
+    number of workers, are not part of it.
+    """
+    from decider_genetics.manifest import build_key, config_files
+    from decider_genetics.schema import schema_config_path
+
+    if args.merge:
+        inputs = list(args.merge)
+    else:
+        inputs = [
+            path
+            for job in adapter_jobs(
+                args.adapters,
+                _input_paths(args),
+                seed=args.seed,
+                schema_config_path=schema_config_path(args.config),
+            )
+            for path in job.inputs()
+        ]
+        # the gene index decides which edges to genes are written
+        inputs += _gene_tables(args)
+        if args.gene_aliases:
+            inputs.append(args.gene_aliases)
+
+    options = {
+        name: getattr(args, name)
+        for name in [
+            "adapters",
+            "keep_dangling",
+            "compress",
+            "seed",
+            "shards",
+            "shard",
+        ]
+    }
+    # the import call refers to the files by their absolute paths
+    options["output_dir"] = os.path.abspath(args.output_dir)
+
+    return build_key(inputs, options, config_files(args.config))
+
+
+def _delta(args, previous):
+    """
+    Compare the output with an earlier build and write the Cypher statements
+    that update a graph imported from it, and a summary of the changes.
+    """
+    import json
+    from decider_genetics.delta import DeltaImport
+
+    delta = DeltaImport(
+        args.output_dir,
+        previous,
+        biocypher_config_path=args.config,
+        batch_size=args.delta_batch_size,
+    ).run()
+
+    os.makedirs(args.delta_dir, exist_ok=True)
+    delta.write_script(os.path.join(args.delta_dir, "delta.cypher"))
+    with open(
+        os.path.join(args.delta_dir, "delta.json"), "w", encoding="utf-8"
+    ) as f:
+        json.dump(delta.summary(), f, indent=2)
+    delta.log_summary()
+
+    return delta
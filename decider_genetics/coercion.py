@@ -0,0 +1,226 @@
+import numpy as np
+import pandas as pd
+from typing import Optional
+from biocypher._logger import logger
+from decider_genetics.schema import get_properties
+
+logger.debug(f"Loading module {__name__}.")
+
+# written for missing floats: neo4j-admin parses "NaN" as a double, but not
+# the "nan" Python prints; missing values of other types are left out
+FLOAT_SENTINEL = "NaN"
+
+# schema types and the pandas dtypes their columns are converted to; the
+# nullable dtypes keep missing values apart and survive the frame cache
+_DTYPES = {
+    "int": "Int64",
+    "integer": "Int64",
+    "long": "Int64",
+    "float": "float64",
+    "double": "float64",
+    "dbl": "float64",
+    "bool": "boolean",
+    "boolean": "boolean",
+}
+
+# spellings of booleans, compared in lower case
+TRUE_VALUES = {"true", "t", "yes", "y", "1"}
+FALSE_VALUES = {"false", "f", "no", "n", "0"}
+
+# spellings of missing values, compared in lower case; only numbers and
+# booleans are read with them, text properties keep them as they are
+MISSING_VALUES = {"", "na", "n/a", "nan", "nd", "none", "null", "-"}
+
+# spellings booleans are written with, as neo4j-admin reads them
+BOOLEAN_SPELLINGS = {True: "true", False: "false"}
+
+# invalid values shown when reporting a column
+_EXAMPLES = 3
+
+
+def coerce_properties(
+    frame: pd.DataFrame,
+    input_label: str,
+    path: str,
+    columns: Optional[dict] = None,
+    values: Optional[dict] = None,
+    defaults: Optional[dict] = None,
+) -> pd.DataFrame:
+    """
+    Convert the columns of a frame holding integer, float or boolean
+    properties to the type the schema declares for them, one column at a
+    time; columns of text properties are left as they are. Text is parsed with decimal commas as well as points, and booleans
+    from yes/no and true/false spellings; missing values become NA, NaN for
+    floats, unless a default is given. Values that cannot be converted are
+    reported once per column and treated as missing, instead of failing the
+    import.
+
+    Args:
+        frame: Data frame with one row per node or edge.
+        input_label: Label used by the adapter for the node or edge type.
+        path: Path to the schema configuration YAML file.
+        columns: Mapping of property keys to the columns holding them, for
+            columns whose name differs from the property key; other
+            properties are looked up by their key.
+        values: Mappings of values, in lower case, to the values to use
+            instead, by property key, for spellings particular to an input,
+            e.g. `{"hr_deficient": {"hrd positive": True}}`.
+        defaults: Values of missing and invalid values, by property key,
+            e.g. `{"parpi": False}` for flags whose blank means "no".
+
+    Returns:
+        A copy of the frame with converted columns; columns of other types
+        are left as they are.
+    """
+    columns = columns or {}
+    values = values or {}
+    defaults = defaults or {}
+
+    converted = {}
+    for key, kind in get_properties(input_label, path).items():
+        column = columns.get(key, key)
+        if column not in frame.columns or kind not in _DTYPES:
+            continue
+
+        series, invalid = coerce_column(frame[column], kind, values.get(key))
+        if invalid.any():
+            examples = frame[column][invalid].drop_duplicates()[:_EXAMPLES]
+            logger.warning(
+                f"{int(invalid.sum())} value(s) of property {key} of "
+                f"{input_label} are not of type {kind}, e.g. "
+                f"{examples.tolist()}; they are treated as "
+                f"{'missing' if key not in defaults else defaults[key]}."
+            )
+        if key in defaults:
+            series = series.fillna(defaults[key])
+        converted[column] = series
+
+    if not converted:
+        return frame
+    return frame.assign(**converted)
+
+
+def coerce_column(
+    series: pd.Series, kind: str, values: Optional[dict] = None
+) -> tuple:
+    """
+    Convert a column to a schema type, see `coerce_properties`.
+
+    Args:
+        series: The column.
+        kind: The schema type: int, float or bool, or one of their synonyms.
+        values: Mapping of values, in lower case, to the values to use
+            instead; None marks a value as missing.
+
+    Returns:
+        The converted column, and a boolean array marking the values that
+        could not be converted.
+    """
+    dtype = _DTYPES[kind]
+    none = np.zeros(len(series), dtype=bool)
+    if str(series.dtype) == dtype:
+        return series, none
+    if dtype != "boolean" and pd.api.types.is_integer_dtype(series.dtype):
+        return series.astype(dtype), none
+
+    lookup = {}
+    if dtype == "boolean":
+        lookup.update({value: True for value in TRUE_VALUES})
+        lookup.update({value: False for value in FALSE_VALUES})
+    lookup.update(values or {})
+
+    if pd.api.types.is_numeric_dtype(
+        series.dtype
+    ) or pd.api.types.is_bool_dtype(series.dtype):
+        numbers = series.to_numpy(dtype="float64", na_value=np.nan)
+        missing = np.isnan(numbers)
+        if dtype == "boolean":
+            invalid = ~missing & (numbers != 1) & (numbers != 0)
+            result = pd.arrays.BooleanArray(numbers == 1, missing | invalid)
+        elif dtype == "Int64":
+            invalid = ~missing & ~(
+                np.isfinite(numbers) & (np.floor(numbers) == numbers)
+            )
+            mask = missing | invalid
+            result = pd.arrays.IntegerArray(
+                np.where(mask, 0, numbers).astype("int64"), mask
+            )
+        else:
+            invalid = np.zeros(len(numbers), dtype=bool)
+            result = numbers
+        return pd.Series(result, index=series.index), invalid
+
+    # text is converted once per distinct value, in Python, which is faster
+    # than a chain of string operations on every row for the few distinct
+    # values most columns have; missing values get code -1, i.e. the last
+    # entry of the converted values
+    codes, uniques = pd.factorize(series)
+    converted = [_convert(value, dtype, lookup) for value in uniques]
+    converted.append((None, False))
+    results, invalid = zip(*converted)
+    if dtype == "float64":
+        results = [np.nan if value is None else value for value in results]
+    result = pd.Series(
+        pd.array(np.array(results, dtype=object)[codes], dtype=dtype),
+        index=series.index,
+    )
+    return result, np.array(invalid, dtype=bool)[codes]
+
+
+def _convert(value, dtype: str, lookup: dict) -> tuple:
+    """
+    Convert one text value to a pandas dtype, see `coerce_column`.
+
+    Returns:
+        The converted value, None if it is missing or invalid, and whether
+        it is invalid.
+    """
+    text = str(value).strip().lower()
+    if text in lookup:
+        number = lookup[text]
+        if number is None or dtype == "boolean":
+            return number, False
+    elif text in MISSING_VALUES:
+        return None, False
+    elif dtype == "boolean":
+        return None, True
+    else:
+        try:
+            # decimal commas, but no digit separators, which float() accepts
+            if "_" in text:
+                raise ValueError(text)
+            number = float(text.replace(",", "."))
+        except ValueError:
+            return None, True
+
+    number = float(number)
+    if np.isnan(number):
+        return None, False
+    if dtype == "Int64":
+        if number % 1 != 0:
+            return None, True
+        return int(number), False
+    return number, False
+
+
+def emitted_values(series: pd.Series) -> list:
+    """
+    Return the values of a column as the Python objects that are emitted as
+    properties: missing values as None, missing floats as `FLOAT_SENTINEL`,
+    and booleans in the spelling of `BOOLEAN_SPELLINGS`, since BioCypher
+    would write Python's True and False.
+    """
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return (
+            series.astype(object)
+            .map(BOOLEAN_SPELLINGS)
+            .where(series.notna(), None)
+            .tolist()
+        )
+    if not series.hasnans:
+        return series.tolist()
+    if series.dtype.kind == "f":
+        return (
+            series.astype(object).where(series.notna(), FLOAT_SENTINEL).tolist()
+        )
+    return series.astype(object).where(series.notna(), None).tolist()
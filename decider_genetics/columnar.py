@@ -0,0 +1,469 @@
+import os
+import numpy as np
+import pandas as pd
+from typing import Optional
+from biocypher import BioCypher
+from biocypher._logger import logger
+from biocypher.write._batch_writer import parse_label
+from decider_genetics.coercion import BOOLEAN_SPELLINGS, FLOAT_SENTINEL
+from decider_genetics.parts import open_part, part_files, part_name, part_number
+
+logger.debug(f"Loading module {__name__}.")
+
+# rows per part file, as BioCypher's default batch size
+_PART_ROWS = 1_000_000
+
+# property types BioCypher writes without quotes
+_UNQUOTED_TYPES = {
+    "int",
+    "integer",
+    "long",
+    "float",
+    "double",
+    "dbl",
+    "bool",
+    "boolean",
+}
+
+# header suffixes of the property types, as BioCypher's neo4j writer
+_HEADER_TYPES = {
+    "int": ":long",
+    "long": ":long",
+    "integer": ":long",
+    "int[]": ":long[]",
+    "long[]": ":long[]",
+    "integer[]": ":long[]",
+    "float": ":double",
+    "double": ":double",
+    "dbl": ":double",
+    "float[]": ":double[]",
+    "double[]": ":double[]",
+    "bool": ":boolean",
+    "boolean": ":boolean",
+    "bool[]": ":boolean[]",
+    "boolean[]": ":boolean[]",
+    "str[]": ":string[]",
+    "string[]": ":string[]",
+}
+
+
+class ColumnarWriter:
+    """
+    Write nodes and edges straight from data frames to the neo4j-admin import
+    files of a BioCypher instance, column by column, instead of creating a
+    tuple, a dict and a BioCypher object per row.
+
+    The files are the ones BioCypher writes for the same nodes and edges:
+    labels are translated with the schema configuration, properties are
+    filtered and typed by it, values are quoted and arrays joined with the
+    configured quote and array delimiter, and edges are de-duplicated by ID,
+    or by source and target, per edge type. The headers and part files are
+    added to the writer's import call and the types to its schema info, so
+    `write_import_call` covers them, also next to files BioCypher wrote
+    itself for other labels.
+
+    The writer uses the internals of BioCypher's writer, translator and
+    deduplicator, as they are in the BioCypher version `pyproject.toml` pins.
+
+    Args:
+        bc: The BioCypher instance whose writer, translator and deduplicator
+            to use; it must write for Neo4j.
+        compression_level: gzip level from 1 (fastest) to 9 (smallest) to
+            compress the part files with as they are written; None to write
+            them uncompressed.
+    """
+
+    def __init__(self, bc: BioCypher, compression_level: Optional[int] = None):
+        if bc._writer is None:
+            bc._get_writer()
+
+        self.writer = bc._writer
+        self.translator = bc._get_translator()
+        self.deduplicator = bc._get_deduplicator()
+        self.schema = self.translator.ontology.mapping.extended_schema
+        if self.writer.strict_mode:
+            raise ValueError(
+                "The columnar writer does not support strict mode."
+            )
+
+        self.compression_level = compression_level
+        self._labels = {}  # ontology class -> :LABEL value
+
+    def write_nodes(
+        self,
+        frame: pd.DataFrame,
+        id_column: str,
+        label: str,
+        properties: Optional[list] = None,
+        rename: Optional[dict] = None,
+    ) -> int:
+        """
+        Write one node per row of the frame, as `BaseAdapter._emit_nodes`
+        would emit them.
+
+        Args:
+            frame: Data frame with one row per node.
+            id_column: Column holding the node IDs.
+            label: Input label of the nodes, as in the schema configuration.
+            properties: Columns to write as properties; defaults to all
+                columns except the ID column.
+            rename: Mapping of column names to property keys, for columns
+                whose name differs from the property key.
+
+        Returns:
+            The number of nodes written.
+        """
+        ontology_class = self.translator._get_ontology_mapping(label)
+        if ontology_class is None:
+            logger.warning(f"Label {label} is not in the schema; skipping.")
+            return 0
+
+        if properties is None:
+            properties = [
+                column for column in frame.columns if column != id_column
+            ]
+        columns = _property_columns(properties, rename)
+
+        # nodes without ID are skipped
+        frame = frame[_truthy(frame[id_column])]
+        if frame.empty:
+            return 0
+        ids = frame[id_column].astype(str)
+
+        schema_properties = self.schema[ontology_class].get("properties")
+        preferred_id = self.schema[ontology_class].get("preferred_id", "id")
+        if schema_properties:
+            types = dict(schema_properties)
+        else:
+            types = {
+                key: _type_name(frame[column])
+                for key, column in columns.items()
+            }
+        # BioCypher adds both to the properties of every node
+        types["id"] = "str"
+        types["preferred_id"] = "str" if preferred_id else None
+
+        fields = [ids.reset_index(drop=True)]
+        for key, kind in types.items():
+            if key == "id":
+                values = ids
+            elif key == "preferred_id":
+                values = pd.Series(preferred_id or None, index=frame.index)
+            elif key in columns:
+                values = frame[columns[key]]
+            else:
+                values = pd.Series(None, index=frame.index, dtype=object)
+            fields.append(
+                self._format(values, kind, strings=True).reset_index(drop=True)
+            )
+        fields.append(
+            pd.Series(self._node_labels(ontology_class), index=fields[0].index)
+        )
+
+        self.deduplicator.entity_types.add(ontology_class)
+        self._write_header(
+            ontology_class, [":ID", *self._header(types), ":LABEL"], True
+        )
+        self._write_parts(ontology_class, fields)
+
+        return len(frame)
+
+    def write_edges(
+        self,
+        frame: pd.DataFrame,
+        source_column: str,
+        target_column: str,
+        label: str,
+        id_column: Optional[str] = None,
+        properties: Optional[list] = None,
+        rename: Optional[dict] = None,
+    ) -> int:
+        """
+        Write one edge per row of the frame, as `BaseAdapter._emit_edges`
+        would emit them.
+
+        Args:
+            frame: Data frame with one row per edge.
+            source_column: Column holding the source node IDs.
+            target_column: Column holding the target node IDs.
+            label: Input label of the edges, as in the schema configuration.
+            id_column: Column holding the edge IDs; if None, edges are written
+                without ID.
+            properties: Columns to write as properties; defaults to none.
+            rename: Mapping of column names to property keys, for columns
+                whose name differs from the property key.
+
+        Returns:
+            The number of edges written.
+        """
+        ontology_class = self.translator._get_ontology_mapping(label)
+        if ontology_class is None:
+            logger.warning(f"Label {label} is not in the schema; skipping.")
+            return 0
+        if self.schema[ontology_class].get("represented_as") == "node":
+            raise ValueError(
+                f"Edges of {label} are represented as nodes, which the "
+                "columnar writer does not support."
+            )
+        edge_label = (
+            self.schema[ontology_class].get("label_as_edge") or ontology_class
+        )
+
+        columns = _property_columns(properties or [], rename)
+        # "id" is reserved for the edge ID
+        columns.pop("id", None)
+
+        # edges without source or target are skipped
+        frame = frame[
+            _truthy(frame[source_column]) & _truthy(frame[target_column])
+        ]
+        sources = frame[source_column].astype(str)
+        targets = frame[target_column].astype(str)
+        if id_column is not None:
+            has_id = pd.Series(_truthy(frame[id_column]), index=frame.index)
+            ids = frame[id_column].astype(str).where(has_id, "")
+        else:
+            has_id = pd.Series(False, index=frame.index)
+            ids = pd.Series("", index=frame.index)
+
+        # edges already written with the same ID, or the same source and
+        # target if they have none, are skipped
+        keys = ids.where(has_id, sources + "_" + targets)
+        seen = self.deduplicator.seen_relationships.get(edge_label, set())
+        written = ~keys.duplicated()
+        if seen:
+            written &= ~keys.isin(seen)
+        written = written.to_numpy()
+        frame, sources, targets, ids, keys = (
+            frame[written],
+            sources[written],
+            targets[written],
+            ids[written],
+            keys[written],
+        )
+        if frame.empty:
+            return 0
+        # as BioCypher, the edge type counts as written with its first edge
+        self.deduplicator.seen_relationships.setdefault(
+            edge_label, seen
+        ).update(keys.tolist())
+
+        schema_properties = self.schema[ontology_class].get("properties")
+        if schema_properties:
+            types = dict(schema_properties)
+        else:
+            types = {
+                key: _type_name(frame[column])
+                for key, column in columns.items()
+            }
+
+        use_id = self.schema[ontology_class].get("use_id") is not False
+        fields = [sources.reset_index(drop=True)]
+        if use_id:
+            fields.append(ids.reset_index(drop=True))
+        for key, kind in types.items():
+            if key in columns:
+                values = frame[columns[key]]
+            else:
+                values = pd.Series(None, index=frame.index, dtype=object)
+            fields.append(
+                self._format(values, kind, strings=False).reset_index(drop=True)
+            )
+        fields.append(targets.reset_index(drop=True))
+        fields.append(
+            pd.Series(
+                self.translator.name_sentence_to_pascal(edge_label),
+                index=fields[0].index,
+            )
+        )
+
+        header = [":START_ID", *(["id"] if use_id else [])]
+        header += self._header(types, edge=True) + [":END_ID", ":TYPE"]
+        self._write_header(edge_label, header, False)
+        self._write_parts(edge_label, fields)
+
+        return len(frame)
+
+    def _format(self, values: pd.Series, kind: str, strings: bool) -> pd.Series:
+        """
+        Format a column as BioCypher formats each of its values: None as an
+        empty field, values of numeric and boolean types as they are, with
+        booleans spelled as `coercion.emitted_values` emits them, lists
+        as quoted arrays, and everything else quoted.
+
+        Args:
+            values: The column.
+            kind: The type of the property, as in the schema configuration.
+            strings: Replace line breaks in strings by spaces, as BioCypher
+                does for node properties.
+        """
+        quote = self.writer.quote
+        unquoted = kind in _UNQUOTED_TYPES
+
+        def format_value(value) -> str:
+            if value is None or value is pd.NA:
+                return ""
+            if isinstance(value, float) and value != value:
+                # missing values of columns that are not floats
+                return ""
+            if unquoted:
+                return str(value)
+            if isinstance(value, list):
+                if strings:
+                    value = [_single_line(item) for item in value]
+                return self.writer._write_array_string(value)
+            if strings and isinstance(value, str):
+                value = _single_line(value)
+            return f"{quote}{value}{quote}"
+
+        dtype = values.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            # only the categories need formatting; missing values are NaN
+            categories = [
+                format_value(value) for value in dtype.categories.tolist()
+            ]
+            categories.append(format_value(float("nan")))
+            codes = values.cat.codes.to_numpy()
+            return pd.Series(
+                np.asarray(categories, dtype=object)[codes], index=values.index
+            )
+
+        if pd.api.types.is_bool_dtype(dtype):
+            # spelled as in `coercion.emitted_values`; missing ones are NaN
+            return (
+                values.astype(object).map(BOOLEAN_SPELLINGS).map(format_value)
+            )
+
+        if dtype.kind == "f":
+            # as the Python floats BioCypher receives, missing ones written
+            # as the sentinel of `coercion.emitted_values`
+            values = values.astype(np.float64)
+            text = values.astype(str).where(values.notna(), FLOAT_SENTINEL)
+            if unquoted:
+                return text
+            return quote + text + quote
+
+        if isinstance(dtype, np.dtype) and dtype.kind in "iu":
+            text = values.astype(str)
+            if unquoted:
+                return text
+            return quote + text + quote
+
+        return values.astype(object).map(format_value)
+
+    def _node_labels(self, ontology_class: str) -> str:
+        """
+        Return the :LABEL value of the nodes of a class: the class and its
+        ancestors in the ontology, as BioCypher writes it.
+        """
+        if ontology_class not in self._labels:
+            ancestors = self.translator.ontology.get_ancestors(ontology_class)
+            if ancestors:
+                labels = self.writer._write_array_string(
+                    sorted(
+                        {
+                            self.translator.name_sentence_to_pascal(ancestor)
+                            for ancestor in ancestors
+                        }
+                    )
+                )
+            else:
+                labels = self.translator.name_sentence_to_pascal(ontology_class)
+            self._labels[ontology_class] = labels
+
+        return self._labels[ontology_class]
+
+    @staticmethod
+    def _header(types: dict, edge: bool = False) -> list:
+        return [
+            # the neo4j writer only types "dbl" properties of nodes
+            key
+            + ("" if edge and kind == "dbl" else _HEADER_TYPES.get(kind, ""))
+            for key, kind in types.items()
+        ]
+
+    def _write_header(self, label: str, columns: list, is_node: bool) -> None:
+        """
+        Write the header file of a label and add it with its part files to
+        the import call.
+        """
+        name = self._file_label(label)
+        header = f"{name}-header.csv"
+        with open(
+            os.path.join(self.writer.outdir, header), "w", encoding="utf-8"
+        ) as f:
+            f.write(self.writer.delim.join(columns))
+
+        files = (
+            os.path.join(self.writer.import_call_file_prefix, header),
+            os.path.join(self.writer.import_call_file_prefix, f"{name}-part.*"),
+        )
+        if is_node:
+            self.writer.import_call_nodes.add(files)
+        else:
+            self.writer.import_call_edges.add(files)
+
+    def _write_parts(self, label: str, fields: list) -> None:
+        """
+        Join the formatted columns to lines and write them to new part files,
+        numbered after the ones already written for the label.
+        """
+        name = self._file_label(label)
+        delimiter = self.writer.delim
+        next_part = 1 + max(
+            map(part_number, part_files(self.writer.outdir, name)), default=-1
+        )
+
+        for start in range(0, len(fields[0]), _PART_ROWS):
+            chunk = [field.iloc[start : start + _PART_ROWS] for field in fields]
+            lines = chunk[0].str.cat(chunk[1:], sep=delimiter)
+
+            part = part_name(
+                name, next_part, self.compression_level is not None
+            )
+            logger.info(f"Writing {len(lines)} entries to {part}")
+            with open_part(
+                os.path.join(self.writer.outdir, part),
+                "w",
+                self.compression_level,
+            ) as f:
+                f.write("\n".join(lines.tolist()))
+                f.write("\n")
+            self.writer.parts.setdefault(label, []).append(part)
+            next_part += 1
+
+    def _file_label(self, label: str) -> str:
+        return self.translator.name_sentence_to_pascal(parse_label(label))
+
+
+def _property_columns(properties: list, rename: Optional[dict]) -> dict:
+    """
+    Map property keys to the columns holding them.
+    """
+    rename = rename or {}
+    return {rename.get(column, column): column for column in properties}
+
+
+def _type_name(values: pd.Series) -> Optional[str]:
+    """
+    Return the Python type name of the first value of a column, which
+    BioCypher uses as the type of properties the schema does not declare.
+    """
+    first = values.iloc[:1].tolist()
+    if not first or first[0] is None:
+        return None
+    return type(first[0]).__name__
+
+
+def _truthy(values: pd.Series) -> np.ndarray:
+    """
+    Return whether each value of a column is true in Python's sense, as
+    BioCypher checks IDs.
+    """
+    return np.asarray(values, dtype=object).astype(bool)
+
+
+def _single_line(value):
+    if not isinstance(value, str):
+        return value
+    return value.replace(os.linesep, " ").replace("\n", " ").replace("\r", " ")
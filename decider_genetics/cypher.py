@@ -0,0 +1,25 @@
+import re
+from biocypher._logger import logger
+
+logger.debug(f"Loading module {__name__}.")
+
+
+def quote_name(name: str) -> str:
+    """
+    Quote a label, relationship type or property key for Cypher.
+    """
+    return "`" + name.replace("`", "``") + "`"
+
+
+def pascal_case(name: str) -> str:
+    """
+    Return the label or relationship type BioCypher writes for an ontology
+    class of the schema configuration, e.g. "SequenceVariant" for
+    "sequence variant"; parts separated by dots are converted separately.
+    """
+    return ".".join(
+        re.sub(
+            r"(?:^|\s)([a-zA-Z])", lambda match: match.group(1).upper(), part
+        )
+        for part in name.split(".")
+    )
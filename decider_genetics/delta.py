@@ -0,0 +1,616 @@
+import math
+import os
+import numpy as np
+import pandas as pd
+from collections import Counter
+from typing import Iterable, Optional
+from biocypher import BioCypher
+from biocypher._logger import logger
+from decider_genetics.cypher import quote_name
+from decider_genetics.parts import part_files
+
+logger.debug(f"Loading module {__name__}.")
+
+# file of an output directory holding the keys and row hashes of its nodes
+# and edges, to compare the next build with
+ENTITY_INDEX = "entities.tsv.gz"
+
+# columns of the entity index; nodes have no source and target, edges without
+# ID an empty one
+_INDEX_COLUMNS = ["label", "source", "target", "id", "hash"]
+_KEY_COLUMNS = ["label", "source", "target", "id"]
+
+# neo4j-admin header types and the Python types their values are parsed as
+_INTEGER_TYPES = {"int", "long", "short", "byte"}
+_FLOAT_TYPES = {"float", "double"}
+_BOOLEAN_TYPES = {"boolean"}
+
+# columns of the import files that are not properties
+_ID = ":ID"
+_LABEL = ":LABEL"
+_START = ":START_ID"
+_END = ":END_ID"
+_TYPE = ":TYPE"
+
+# labels written anew by every build, not compared
+_SCHEMA_INFO = "Schema_info"
+
+
+def entity_index(
+    directory: str,
+    biocypher_config_path: str = "config/biocypher_config.yaml",
+) -> pd.DataFrame:
+    """
+    Read the nodes and edges of an output directory and return their keys and
+    row hashes: one row per node with its label and ID, and one row per edge
+    with its label, source, target and ID, if it has one.
+    """
+    delimiter, quote, _ = _delimiters(biocypher_config_path, directory)
+    return _concat(
+        _keys(label, frame)
+        for label, frame in _read_labels(directory, delimiter, quote)
+    )
+
+
+def write_entity_index(directory: str, index: pd.DataFrame) -> str:
+    """
+    Write an entity index into an output directory. The file carries no
+    timestamp, so the same entities give the same bytes.
+
+    Returns:
+        The path of the index file.
+    """
+    path = os.path.join(directory, ENTITY_INDEX)
+    index.to_csv(
+        f"{path}.partial",
+        sep="\t",
+        index=False,
+        compression={"method": "gzip", "mtime": 0},
+    )
+    os.replace(f"{path}.partial", path)
+    return path
+
+
+def read_entity_index(
+    path: str,
+    biocypher_config_path: str = "config/biocypher_config.yaml",
+) -> pd.DataFrame:
+    """
+    Read the entity index of an earlier build: the index file, or the one in
+    an output directory. Output directories without index are read in full.
+    """
+    if os.path.isdir(path):
+        if not os.path.exists(os.path.join(path, ENTITY_INDEX)):
+            return entity_index(path, biocypher_config_path)
+        path = os.path.join(path, ENTITY_INDEX)
+
+    return pd.read_csv(
+        path,
+        sep="\t",
+        dtype={column: str for column in _KEY_COLUMNS} | {"hash": "uint64"},
+        keep_default_na=False,
+    )
+
+
+class DeltaImport:
+    """
+    Changes from an earlier build to the build in an output directory, as
+    batched Cypher statements that bring a graph imported from the earlier
+    build up to date, instead of importing the whole graph anew.
+
+    Nodes are compared by label and ID, edges by label, source, target and
+    ID, and both by a hash of their row in the import files. Removed edges
+    and nodes are deleted first, then added and changed nodes merged and
+    their properties replaced, then added and changed edges; an edge whose
+    source or target changed counts as removed and added. Each statement
+    UNWINDs a batch of rows.
+
+    Args:
+        directory: Output directory of the current build.
+        previous: Entity index of the earlier build, see `read_entity_index`.
+        biocypher_config_path: BioCypher configuration of the build, for the
+            delimiters of its files.
+        batch_size: Maximum number of rows per statement.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        previous: pd.DataFrame,
+        biocypher_config_path: str = "config/biocypher_config.yaml",
+        batch_size: int = 10_000,
+    ):
+        self.directory = directory
+        self.previous = previous
+        self.biocypher_config_path = biocypher_config_path
+        self.batch_size = batch_size
+
+        self.index = None
+        self.added = Counter()
+        self.changed = Counter()
+        self.removed = Counter()
+        self._changes = None
+
+    def run(self) -> "DeltaImport":
+        """
+        Compare the builds. Afterwards, `index` holds the entity index of the
+        current build and the counters the changes per label.
+        """
+        delimiter, quote, array_delimiter = _delimiters(
+            self.biocypher_config_path, self.directory
+        )
+        # entities are looked up by a hash of their key columns
+        previous_keys = _key_hashes(self.previous)
+        previous = pd.Series(
+            self.previous["hash"].to_numpy(), index=previous_keys
+        )
+        previous = previous[~previous.index.duplicated()]
+
+        nodes, edges, indices, key_hashes, node_labels = [], [], [], [], []
+        for label, frame in _read_labels(self.directory, delimiter, quote):
+            keys = _keys(label, frame)
+            indices.append(keys)
+            is_node = _ID in frame.columns
+            if is_node:
+                node_labels.append(
+                    pd.Series(label, index=frame[_ID].to_numpy())
+                )
+
+            key_hashes.append(_key_hashes(keys))
+            positions = previous.index.get_indexer(key_hashes[-1])
+            new = positions == -1
+            modified = ~new & (
+                previous.to_numpy()[positions] != keys["hash"].to_numpy()
+            )
+            self.added[label] += int(new.sum())
+            self.changed[label] += int(modified.sum())
+            if (new | modified).any():
+                (nodes if is_node else edges).append(
+                    (label, frame[new | modified])
+                )
+
+        self.index = _concat(indices)
+        current = np.concatenate(key_hashes) if key_hashes else []
+        removed = self.previous[~pd.Index(previous_keys).isin(current)]
+        removed = removed[removed["label"] != _SCHEMA_INFO]
+        for label, count in removed["label"].value_counts().items():
+            self.removed[label] += int(count)
+
+        labels = _concat_series(node_labels)
+        self._changes = [
+            *_removed_edges(removed, _node_labels(self.previous)),
+            *_removed_nodes(removed),
+            *(
+                change
+                for label, frame in nodes
+                for change in _merged_nodes(label, frame, array_delimiter)
+            ),
+            *(
+                change
+                for _, frame in edges
+                for change in _merged_edges(frame, labels, array_delimiter)
+            ),
+        ]
+        return self
+
+    def statements(self) -> Iterable[tuple]:
+        """
+        Yield the Cypher statements of the changes with their parameters, as
+        (query, {"rows": [...]}) tuples, in the order they must be run.
+        """
+        if self._changes is None:
+            self.run()
+
+        for query, rows in self._changes:
+            for start in range(0, len(rows), self.batch_size):
+                yield query, {"rows": rows[start : start + self.batch_size]}
+
+    def write_script(self, path: str) -> int:
+        """
+        Write the statements to a Cypher script, e.g. for `cypher-shell -f`,
+        with the rows of each batch inlined as a list literal.
+
+        Returns:
+            The number of statements written.
+        """
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for query, parameters in self.statements():
+                f.write(
+                    query.replace("$rows", _literal(parameters["rows"]), 1)
+                    + ";\n"
+                )
+                count += 1
+        return count
+
+    def apply(self, driver, database: Optional[str] = None) -> int:
+        """
+        Run the statements with a Neo4j driver, each batch in a transaction of
+        its own.
+
+        Args:
+            driver: A `neo4j.Driver`, or any object whose `session(database=)`
+                returns a context manager with a `run(query, parameters)`
+                method, such as a mock.
+            database: Name of the database; None for the default one.
+
+        Returns:
+            The number of statements run.
+        """
+        count = 0
+        with driver.session(database=database) as session:
+            for query, parameters in self.statements():
+                session.run(query, parameters).consume()
+                count += 1
+        return count
+
+    def summary(self) -> dict:
+        """
+        Return the numbers of added, changed and removed nodes and edges per
+        label.
+        """
+        return {
+            kind: {
+                label: count
+                for label, count in sorted(counter.items())
+                if count
+            }
+            for kind, counter in [
+                ("added", self.added),
+                ("changed", self.changed),
+                ("removed", self.removed),
+            ]
+        }
+
+    def log_summary(self) -> None:
+        labels = sorted({*self.added, *self.changed, *self.removed})
+        for label in labels:
+            if self.added[label] or self.changed[label] or self.removed[label]:
+                logger.info(
+                    f"{label}: {self.added[label]} added, "
+                    f"{self.changed[label]} changed, {self.removed[label]} "
+                    "removed."
+                )
+
+
+def _delimiters(biocypher_config_path: str, directory: str) -> tuple:
+    """
+    Return the delimiter, quote character and array delimiter of the import
+    files, as configured.
+    """
+    bc = BioCypher(
+        biocypher_config_path=biocypher_config_path,
+        output_directory=directory,
+    )
+    bc._get_writer()
+    writer = bc._writer
+    return writer.delim, writer.quote, writer.adelim
+
+
+def _read_labels(directory: str, delimiter: str, quote: str):
+    """
+    Yield the label and the rows of every node and edge label of an output
+    directory, nodes first, as frames of strings with the header's columns.
+    """
+    headers = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith("-header.csv"):
+            continue
+        label = name[: -len("-header.csv")]
+        if label == _SCHEMA_INFO or not part_files(directory, label):
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            headers[label] = f.read().strip().split(delimiter)
+
+    # nodes first, so that the labels of edge sources and targets are known
+    for label in sorted(headers, key=lambda label: _ID not in headers[label]):
+        frames = [
+            pd.read_csv(
+                part,
+                sep=delimiter,
+                quotechar=quote,
+                header=None,
+                names=headers[label],
+                dtype=str,
+                keep_default_na=False,
+                na_filter=False,
+            )
+            for part in part_files(directory, label)
+        ]
+        yield label, pd.concat(frames, ignore_index=True)
+
+
+def _keys(label: str, frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return the entity index rows of the rows of a label.
+    """
+    empty = np.full(len(frame), "", dtype=object)
+    if _ID in frame.columns:
+        source, target, _id = empty, empty, frame[_ID].to_numpy()
+    else:
+        source = frame[_START].to_numpy()
+        target = frame[_END].to_numpy()
+        _id = frame["id"].to_numpy() if "id" in frame.columns else empty
+    return pd.DataFrame(
+        {
+            "label": label,
+            "source": source,
+            "target": target,
+            "id": _id,
+            "hash": pd.util.hash_pandas_object(frame, index=False).to_numpy(),
+        }
+    )
+
+
+def _key_hashes(index: pd.DataFrame) -> np.ndarray:
+    """
+    Hash the key columns of entity index rows.
+    """
+    # most keys are distinct, so factorizing them first would not pay off
+    return pd.util.hash_pandas_object(
+        index[_KEY_COLUMNS], index=False, categorize=False
+    ).to_numpy()
+
+
+def _node_labels(index: pd.DataFrame) -> pd.Series:
+    """
+    Return the labels of the nodes of an entity index, by node ID.
+    """
+    nodes = index[(index["source"] == "") & (index["target"] == "")]
+    return pd.Series(nodes["label"].to_numpy(), index=nodes["id"].to_numpy())
+
+
+def _removed_nodes(removed: pd.DataFrame) -> list:
+    nodes = removed[(removed["source"] == "") & (removed["target"] == "")]
+    return [
+        (
+            "UNWIND $rows AS row "
+            f"MATCH (n:{quote_name(label)} {{id: row.id}}) DETACH DELETE n",
+            [{"id": _id} for _id in group["id"].tolist()],
+        )
+        for label, group in nodes.groupby("label", sort=True)
+    ]
+
+
+def _removed_edges(removed: pd.DataFrame, node_labels: pd.Series) -> list:
+    edges = removed[(removed["source"] != "") | (removed["target"] != "")]
+    edges = edges.assign(
+        source_label=_lookup(node_labels, edges["source"]),
+        target_label=_lookup(node_labels, edges["target"]),
+    )
+    return [
+        (
+            "UNWIND $rows AS row "
+            f"MATCH (a{_pattern_label(source)} {{id: row.source}})"
+            f"-[r:{quote_name(label)}]->"
+            f"(b{_pattern_label(target)} {{id: row.target}}) "
+            "WHERE row.id IS NULL OR r.id = row.id DELETE r",
+            [
+                {"source": s, "target": t, "id": i or None}
+                for s, t, i in zip(
+                    group["source"].tolist(),
+                    group["target"].tolist(),
+                    group["id"].tolist(),
+                )
+            ],
+        )
+        for (label, source, target), group in edges.groupby(
+            ["label", "source_label", "target_label"], sort=True
+        )
+    ]
+
+
+def _merged_nodes(label: str, frame: pd.DataFrame, array_delimiter) -> list:
+    """
+    Return the statements merging the nodes of a label and replacing their
+    properties and labels, one per set of labels.
+    """
+    properties = [
+        column for column in frame.columns if column not in (_ID, _LABEL)
+    ]
+    rows = _property_maps(frame, properties, array_delimiter)
+    ids = frame[_ID].tolist()
+    labelsets = frame[_LABEL].tolist()
+
+    changes = []
+    for labelset in sorted(set(labelsets)):
+        labels = "".join(
+            f":{quote_name(name)}" for name in labelset.split("|") if name
+        )
+        changes.append(
+            (
+                "UNWIND $rows AS row "
+                f"MERGE (n:{quote_name(label)} {{id: row.id}}) "
+                f"SET n = row.properties{f', n{labels}' if labels else ''}",
+                [
+                    {"id": _id, "properties": row}
+                    for _id, row, other in zip(ids, rows, labelsets)
+                    if other == labelset
+                ],
+            )
+        )
+    return changes
+
+
+def _merged_edges(
+    frame: pd.DataFrame, node_labels: pd.Series, array_delimiter
+) -> list:
+    """
+    Return the statements merging edges between existing nodes and replacing
+    their properties, grouped by type, source and target label, and whether
+    the edges have IDs.
+    """
+    properties = [
+        column
+        for column in frame.columns
+        if column not in (_START, _END, _TYPE)
+    ]
+    rows = _property_maps(frame, properties, array_delimiter)
+    has_id = (
+        frame["id"] != ""
+        if "id" in frame.columns
+        else pd.Series(False, index=frame.index)
+    )
+    groups = pd.DataFrame(
+        {
+            "type": frame[_TYPE].to_numpy(),
+            "source_label": _lookup(node_labels, frame[_START]),
+            "target_label": _lookup(node_labels, frame[_END]),
+            "has_id": has_id.to_numpy(),
+            "position": np.arange(len(frame)),
+        }
+    )
+
+    sources = frame[_START].tolist()
+    targets = frame[_END].tolist()
+    ids = frame["id"].tolist() if "id" in frame.columns else None
+
+    changes = []
+    for (_type, source, target, with_id), group in groups.groupby(
+        ["type", "source_label", "target_label", "has_id"], sort=True
+    ):
+        relationship = f"r:{quote_name(_type)}"
+        if with_id:
+            relationship += " {id: row.id}"
+        changes.append(
+            (
+                "UNWIND $rows AS row "
+                f"MATCH (a{_pattern_label(source)} {{id: row.source}}) "
+                f"MATCH (b{_pattern_label(target)} {{id: row.target}}) "
+                f"MERGE (a)-[{relationship}]->(b) SET r = row.properties",
+                [
+                    {
+                        "source": sources[i],
+                        "target": targets[i],
+                        "id": ids[i] if with_id else None,
+                        "properties": rows[i],
+                    }
+                    for i in group["position"].tolist()
+                ],
+            )
+        )
+    return changes
+
+
+def _property_maps(
+    frame: pd.DataFrame, columns: list, array_delimiter: str
+) -> list:
+    """
+    Parse the property columns of import file rows, named `key:type` as in
+    the header, and return one dictionary of properties per row, without
+    missing values.
+    """
+    if not columns:
+        return [{} for _ in range(len(frame))]
+
+    keys, values = [], []
+    for column in columns:
+        key, _, kind = column.partition(":")
+        keys.append(key)
+        values.append(_parse(frame[column], kind, array_delimiter))
+    return [
+        {key: value for key, value in zip(keys, row) if value is not None}
+        for row in zip(*values)
+    ]
+
+
+def _parse(values: pd.Series, kind: str, array_delimiter: str) -> list:
+    """
+    Parse a column of an import file as the type of its header, returning
+    Python objects, with empty fields as None.
+    """
+    empty = (values == "").to_numpy()
+    if kind.endswith("[]"):
+        return [
+            (
+                None
+                if missing
+                else [
+                    _parse_value(item, kind[:-2])
+                    for item in value.split(array_delimiter)
+                ]
+            )
+            for value, missing in zip(values.tolist(), empty)
+        ]
+    if kind in _INTEGER_TYPES:
+        parsed = pd.to_numeric(values.where(~empty)).astype("Int64")
+    elif kind in _FLOAT_TYPES:
+        parsed = pd.to_numeric(values.where(~empty))
+    elif kind in _BOOLEAN_TYPES:
+        parsed = values.str.lower() == "true"
+    else:
+        parsed = values
+    return parsed.astype(object).where(~empty, None).tolist()
+
+
+def _parse_value(value: str, kind: str):
+    """
+    Parse a single array element as its type.
+    """
+    if kind in _INTEGER_TYPES:
+        return int(value)
+    if kind in _FLOAT_TYPES:
+        return float(value)
+    if kind in _BOOLEAN_TYPES:
+        return value.lower() == "true"
+    return value
+
+
+def _literal(value) -> str:
+    """
+    Format a Python value as a Cypher literal.
+    """
+    if value is None:
+        return "null"
+    if isinstance(value, (bool, np.bool_)):
+        return "true" if value else "false"
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        if math.isnan(value):
+            return "toFloat('NaN')"
+        if math.isinf(value):
+            return f"toFloat('{'' if value > 0 else '-'}Infinity')"
+        return repr(float(value))
+    if isinstance(value, dict):
+        return (
+            "{"
+            + ", ".join(
+                f"{quote_name(k)}: {_literal(v)}" for k, v in value.items()
+            )
+            + "}"
+        )
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(_literal(item) for item in value) + "]"
+    text = str(value).replace("\\", "\\\\").replace("'", "\\'")
+    return f"'{text}'"
+
+
+def _pattern_label(label: str) -> str:
+    # nodes of no known label are matched by ID only
+    return f":{quote_name(label)}" if label else ""
+
+
+def _lookup(node_labels: pd.Series, ids: pd.Series) -> np.ndarray:
+    """
+    Return the labels of the given node IDs, or "" for unknown nodes.
+    """
+    if node_labels.empty:
+        return np.full(len(ids), "", dtype=object)
+    node_labels = node_labels[~node_labels.index.duplicated()]
+    return node_labels.reindex(ids.to_numpy()).fillna("").to_numpy()
+
+
+def _concat(frames) -> pd.DataFrame:
+    frames = list(frames)
+    if not frames:
+        return pd.DataFrame({column: [] for column in _INDEX_COLUMNS}).astype(
+            {column: str for column in _KEY_COLUMNS} | {"hash": "uint64"}
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def _concat_series(series: list) -> pd.Series:
+    if not series:
+        return pd.Series(dtype=object)
+    return pd.concat(series)
@@ -0,0 +1,368 @@
+import copy
+import numpy as np
+import pandas as pd
+from collections import Counter
+from typing import Optional
+from biocypher._logger import logger
+from decider_genetics.tables import concat_tables, expand_paths, read_table
+
+logger.debug(f"Loading module {__name__}.")
+
+# columns of the copy number tables holding the gene node IDs (HGNC symbols)
+# and their Ensembl IDs
+SYMBOL_COLUMN = "Gene"
+ENSEMBL_COLUMN = "ID"
+
+# columns of an HGNC complete set table (hgnc_complete_set.txt), with several
+# symbols of a column separated by "|"
+HGNC_COLUMNS = ["symbol", "alias_symbol", "prev_symbol", "ensembl_gene_id"]
+
+# unresolved names kept per edge label, as examples for the report
+_EXAMPLES = 5
+
+
+class GeneIndex:
+    """
+    Index of the names genes go by in the inputs, mapping each to the ID of
+    its gene node: the HGNC symbol of the copy number tables, which are the
+    only input gene nodes are created from. The variants name genes by their
+    MANE symbol, OncoKB and oncodashkb by HGNC symbols of their own release,
+    so the index also maps Ensembl IDs, with or without version, and, given
+    an HGNC table, previous and alias symbols to the node IDs.
+
+    Adapters resolve whole columns of gene endpoints through the index with
+    `resolve_frame`, looking up each distinct name once, and drop the edges
+    whose gene is not in the index before they are hashed and written, since
+    the registry would drop them later anyway. The distinct edges and
+    unresolved ones are counted per edge label, by a hash of their rows, so
+    that edges resolved several times, e.g. by the shards of a build, count
+    once; `resolver` returns a copy with counts of its own, for one adapter,
+    and `absorb` collects the counts of the adapters of a build for
+    `summary`.
+
+    Names are matched exactly first, then ignoring case. Alias and previous
+    symbols that belong to several genes are left out.
+
+    Args:
+        symbols: Gene node IDs, i.e. HGNC symbols.
+        ensembl_ids: Ensembl IDs of the genes, aligned to `symbols`.
+        aliases: HGNC table with the columns of `HGNC_COLUMNS`.
+        drop_unresolved: Drop edges whose gene is not in the index, instead
+            of keeping their names as they are.
+    """
+
+    def __init__(
+        self,
+        symbols,
+        ensembl_ids=None,
+        aliases: Optional[pd.DataFrame] = None,
+        drop_unresolved: bool = True,
+    ):
+        self.drop_unresolved = drop_unresolved
+
+        genes = pd.DataFrame(
+            {
+                "key": np.asarray(symbols, dtype=object),
+                "gene": np.asarray(symbols, dtype=object),
+            }
+        )
+        if ensembl_ids is not None:
+            genes = pd.concat(
+                [
+                    genes,
+                    pd.DataFrame(
+                        {
+                            "key": np.asarray(ensembl_ids, dtype=object),
+                            "gene": genes["gene"].to_numpy(),
+                        }
+                    ),
+                ],
+                ignore_index=True,
+            )
+        genes = genes.dropna().drop_duplicates()
+
+        # gene node IDs, and the positions of their names in it
+        self._genes = pd.unique(genes["gene"][genes["key"] == genes["gene"]])
+        positions = pd.Index(self._genes).get_indexer(genes["gene"])
+        self._exact, _ = _unique_keys(genes["key"].to_numpy(), positions)
+        self._normalized, self.ambiguous = _unique_keys(
+            _normalize(genes["key"]).to_numpy(), positions
+        )
+
+        # aliases are matched to the genes through the names above
+        if aliases is not None:
+            names, alias_positions = self._alias_keys(aliases)
+            self._normalized, self.ambiguous = _unique_keys(
+                _normalize(pd.concat([genes["key"], names])).to_numpy(),
+                np.concatenate([positions, alias_positions]),
+            )
+
+        # label -> sorted hashes of the distinct edges, and of the unresolved
+        self.edges = {}
+        self.unresolved = {}
+        self.examples = {}
+        self.adapters = {}
+
+    @classmethod
+    def from_tables(
+        cls,
+        paths,
+        alias_path: Optional[str] = None,
+        drop_unresolved: bool = True,
+    ) -> "GeneIndex":
+        """
+        Create the index from the genes of copy number tables, and the alias
+        and previous symbols of an HGNC table.
+
+        Args:
+            paths: Copy number tables, as for `tables.expand_paths`.
+            alias_path: HGNC complete set table, tab-separated.
+            drop_unresolved: See `GeneIndex`.
+        """
+        genes = concat_tables(
+            [
+                read_table(path, [ENSEMBL_COLUMN, SYMBOL_COLUMN])
+                for path in expand_paths(paths)
+            ]
+        ).drop_duplicates()
+        aliases = None
+        if alias_path is not None:
+            aliases = read_table(
+                alias_path,
+                HGNC_COLUMNS,
+                dtypes=dict.fromkeys(HGNC_COLUMNS, str),
+            )
+
+        index = cls(
+            genes[SYMBOL_COLUMN].astype(object),
+            (
+                genes[ENSEMBL_COLUMN].astype(object)
+                if ENSEMBL_COLUMN in genes
+                else None
+            ),
+            aliases,
+            drop_unresolved,
+        )
+        logger.info(
+            f"Indexed {len(index)} gene(s) by {len(index._normalized)} "
+            f"name(s), leaving out {index.ambiguous} ambiguous one(s)."
+        )
+        return index
+
+    def __len__(self) -> int:
+        return len(self._genes)
+
+    def __getstate__(self) -> dict:
+        # adapters get a resolver, without the counts of the others
+        return {**self.__dict__, "adapters": {}}
+
+    def resolve(self, values) -> np.ndarray:
+        """
+        Return the position of the gene node of each value among the gene
+        node IDs, or -1 if the value is not in the index.
+        """
+        codes, uniques = pd.factorize(pd.Series(values))
+        uniques = pd.Index(np.asarray(uniques, dtype=object))
+
+        positions = _lookup(self._exact, uniques)
+        missing = positions < 0
+        if missing.any():
+            positions[missing] = _lookup(
+                self._normalized, _normalize(uniques[missing])
+            )
+
+        return np.where(codes >= 0, positions[codes], -1)
+
+    def resolve_frame(
+        self, frame: pd.DataFrame, column: str, label: Optional[str]
+    ) -> pd.DataFrame:
+        """
+        Replace the gene names in a column of edges by the IDs of their gene
+        nodes, as categoricals, and count the edges whose gene is not in the
+        index; they are dropped if `drop_unresolved` is set, and keep their
+        names otherwise.
+
+        Args:
+            frame: Data frame with one row per edge.
+            column: Column holding the gene names.
+            label: Label of all the edges, for the counts; None to count
+                nothing, e.g. for rows that are not written as edges.
+        """
+        positions = self.resolve(frame[column])
+        resolved = positions >= 0
+
+        if label is not None:
+            edges = _edge_hashes(frame)
+            _add_hashes(self.edges, label, edges)
+        if label is not None and not resolved.all():
+            _add_hashes(self.unresolved, label, edges[~resolved])
+            self.examples.setdefault(label, Counter()).update(
+                frame[column][~resolved]
+                .dropna()
+                .astype(str)
+                .value_counts()
+                .to_dict()
+            )
+
+        if self.drop_unresolved:
+            genes = pd.Categorical.from_codes(
+                positions[resolved], categories=self._genes
+            )
+            return frame[resolved].assign(**{column: genes})
+
+        names = np.where(
+            resolved,
+            self._genes[np.maximum(positions, 0)],
+            frame[column].astype(object).to_numpy(),
+        )
+        return frame.assign(**{column: names})
+
+    def resolver(self) -> "GeneIndex":
+        """
+        Return an index sharing the names of this one, with counts of its
+        own, to resolve the edges of one adapter with.
+        """
+        resolver = copy.copy(self)
+        resolver.adapters = {}
+        resolver.edges = {}
+        resolver.unresolved = {}
+        resolver.examples = {}
+        return resolver
+
+    def absorb(self, adapter: str, resolver: "GeneIndex") -> None:
+        """
+        Add the edges of the resolver of an adapter to the edges of this
+        index, e.g. once per shard of a build; edges that several resolvers
+        counted are counted once.
+        """
+        labels = self.adapters.setdefault(adapter, {})
+        for label, edges in resolver.edges.items():
+            unresolved = resolver.unresolved.get(label, edges[:0])
+            _add_hashes(self.edges, label, edges)
+            _add_hashes(self.unresolved, label, unresolved)
+
+            counts = labels.setdefault(label, {"examples": Counter()})
+            _add_hashes(counts, "edges", edges)
+            _add_hashes(counts, "unresolved", unresolved)
+            counts["examples"].update(resolver.examples.get(label, {}))
+
+    def summary(self) -> dict:
+        """
+        Return the numbers of indexed genes, names and left out ambiguous
+        names, and of the edges and unresolved edges per adapter and label.
+        """
+        return {
+            "genes": len(self._genes),
+            "names": len(self._normalized),
+            "ambiguous_names": self.ambiguous,
+            "drop_unresolved": self.drop_unresolved,
+            "adapters": {
+                adapter: {
+                    label: {
+                        "edges": len(counts["edges"]),
+                        "unresolved": len(counts["unresolved"]),
+                        # most frequent first, ties by name
+                        "examples": sorted(
+                            counts["examples"],
+                            key=lambda name: (-counts["examples"][name], name),
+                        )[:_EXAMPLES],
+                    }
+                    for label, counts in labels.items()
+                }
+                for adapter, labels in self.adapters.items()
+            },
+        }
+
+    def log_summary(self) -> None:
+        for adapter, labels in self.summary()["adapters"].items():
+            for label, counts in labels.items():
+                if not counts["unresolved"]:
+                    continue
+                logger.warning(
+                    f"{counts['unresolved']} of {counts['edges']} {label} "
+                    f"edge(s) of {adapter} name genes that are not in the "
+                    f"gene index, e.g. {', '.join(counts['examples'])}"
+                    f"{'; they were dropped' if self.drop_unresolved else ''}."
+                )
+
+    def _alias_keys(self, aliases: pd.DataFrame) -> tuple:
+        """
+        Return the names of the genes of an HGNC table and the positions of
+        their gene nodes. Each row is matched to a gene by its Ensembl ID,
+        else by its symbol, else by one of its previous symbols.
+        """
+        aliases = aliases.reset_index(drop=True)
+        names = pd.concat(
+            [
+                aliases[column].str.split("|").explode().str.strip().dropna()
+                for column in HGNC_COLUMNS
+                if column in aliases
+            ]
+        )
+        names = names[names != ""]
+
+        # the first column that matches a gene decides the row's gene
+        candidates = pd.concat(
+            [
+                aliases[column].str.split("|").explode().str.strip().dropna()
+                for column in ["ensembl_gene_id", "symbol", "prev_symbol"]
+                if column in aliases
+            ]
+        )
+        matched = pd.Series(self.resolve(candidates), index=candidates.index)
+        matched = matched[matched >= 0]
+        rows = matched[~matched.index.duplicated()]
+
+        names = names[names.index.isin(rows.index)]
+        return names, rows.reindex(names.index).to_numpy()
+
+
+def _edge_hashes(frame: pd.DataFrame) -> np.ndarray:
+    """
+    Return a 64-bit hash of each row of a frame of edges, with the gene names
+    as they are in the input.
+    """
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def _add_hashes(hashes: dict, key: str, new: np.ndarray) -> None:
+    """
+    Add hashes to the sorted distinct hashes under a key of a dictionary.
+    """
+    hashes[key] = np.union1d(hashes.get(key, new[:0]), new)
+
+
+def _normalize(keys) -> pd.Index:
+    """
+    Bring gene names into the form they are compared in when they do not
+    match exactly: upper case, and Ensembl IDs without version.
+    """
+    return pd.Index(
+        pd.Series(np.asarray(keys, dtype=object), dtype=object)
+        .str.strip()
+        .str.upper()
+        .str.replace(r"^(ENSG\d+)\.\d+$", r"\1", regex=True)
+    )
+
+
+def _unique_keys(keys: np.ndarray, positions: np.ndarray) -> tuple:
+    """
+    Return an index of the keys that map to a single position, and the
+    number of keys left out because they map to several.
+    """
+    pairs = pd.DataFrame({"key": keys, "position": positions})
+    pairs = pairs.dropna().drop_duplicates()
+    ambiguous = pairs["key"].duplicated(keep=False).to_numpy()
+    unique = pairs[~ambiguous]
+    return (
+        pd.Series(unique["position"].to_numpy(), index=pd.Index(unique["key"])),
+        int(pairs["key"][ambiguous].nunique()),
+    )
+
+
+def _lookup(index: pd.Series, keys: pd.Index) -> np.ndarray:
+    """
+    Return the positions the keys map to in a key index, -1 for unknown keys.
+    """
+    found = index.index.get_indexer(keys)
+    return np.where(found >= 0, index.to_numpy()[np.maximum(found, 0)], -1)
@@ -0,0 +1,170 @@
+import binascii
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from biocypher._logger import logger
+
+logger.debug(f"Loading module {__name__}.")
+
+# two independent SipHash keys (16 bytes each); the two 64-bit hashes are
+# concatenated to a 128-bit identifier, the same width as the md5 digests the
+# adapters used before
+_HASH_KEYS = ("decider-genetics", "genetics-decider")
+
+# below this number of rows, parallel hashing costs more than it saves
+_MIN_ROWS_PER_JOB = 100_000
+
+
+class IdCollisionError(ValueError):
+    """
+    Raised when two distinct rows are mapped to the same identifier.
+    """
+
+
+def hash_columns(
+    frame: pd.DataFrame,
+    columns: Optional[list] = None,
+    n_jobs: int = 1,
+    check_collisions: bool = True,
+) -> pd.Series:
+    """
+    Create one deterministic identifier per row from the values of the given
+    columns, hashing whole columns at once instead of row by row.
+
+    Values are hashed by content, not by their printed representation, so the
+    identifiers do not depend on pandas' repr, on the index, or on whether a
+    column was parsed as numbers, strings or categories. Missing values hash
+    identically regardless of dtype.
+
+    Args:
+        frame: Data frame holding the columns to hash.
+        columns: Columns that make up the identity of a row, in order.
+            Defaults to all columns of the frame.
+        n_jobs: Number of worker processes; rows are split into contiguous
+            blocks that are hashed in parallel.
+        check_collisions: Raise an `IdCollisionError` if two distinct rows
+            receive the same identifier.
+
+    Returns:
+        Series of 32-character hexadecimal identifiers, aligned to the index of
+        the frame.
+    """
+    if columns is None:
+        columns = list(frame.columns)
+
+    keys = pd.DataFrame(
+        {i: _canonical(frame[column]) for i, column in enumerate(columns)}
+    )
+
+    if n_jobs > 1 and len(keys) >= 2 * _MIN_ROWS_PER_JOB:
+        n_blocks = min(n_jobs, len(keys) // _MIN_ROWS_PER_JOB)
+        bounds = np.linspace(0, len(keys), n_blocks + 1, dtype=int)
+        blocks = [
+            keys.iloc[start:stop] for start, stop in zip(bounds, bounds[1:])
+        ]
+        with ProcessPoolExecutor(max_workers=n_blocks) as pool:
+            digests = np.concatenate(list(pool.map(_digest, blocks)))
+    else:
+        digests = _digest(keys)
+
+    ids = pd.Series(_to_hex(digests), index=frame.index, dtype=object)
+
+    if check_collisions:
+        _check_collisions(ids, keys)
+
+    return ids
+
+
+def hash_pairs(
+    source: pd.Series,
+    target: pd.Series,
+    n_jobs: int = 1,
+    check_collisions: bool = True,
+) -> pd.Series:
+    """
+    Create edge identifiers from a source and a target column.
+
+    Args:
+        source: Source node identifiers.
+        target: Target node identifiers, aligned to `source`.
+        n_jobs: Number of worker processes, see `hash_columns`.
+        check_collisions: Raise on collisions, see `hash_columns`.
+
+    Returns:
+        Series of identifiers, aligned to the index of `source`.
+    """
+    frame = pd.DataFrame(
+        {"source": source.values, "target": target.values},
+        index=source.index,
+    )
+    return hash_columns(frame, n_jobs=n_jobs, check_collisions=check_collisions)
+
+
+def _canonical(column: pd.Series) -> pd.Series:
+    """
+    Bring a column into a dtype-independent form: strings stay strings,
+    numbers and categories become their string values, missing values become
+    None. Integral floats become the string of the integer they equal, so
+    that 1 and 1.0 hash alike, e.g. in a column parsed as floats because of
+    missing values. Categoricals of strings without missing values are kept,
+    as pandas hashes them by hashing their categories, which gives the same
+    hashes as their values.
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        if column.cat.categories.dtype == object and column.notna().all():
+            return column.reset_index(drop=True)
+        column = pd.Series(np.asarray(column, dtype=object), index=column.index)
+    elif column.dtype.kind == "f":
+        values = column.to_numpy(dtype="float64", na_value=np.nan)
+        # beyond the range of int64, floats keep their string value
+        integral = (np.abs(values) < 2**63) & (np.floor(values) == values)
+        text = column.astype(str).to_numpy(dtype=object)
+        text[integral] = values[integral].astype(np.int64).astype(str)
+        column = pd.Series(text, index=column.index).where(column.notna())
+    elif column.dtype != object:
+        column = column.astype(str).where(column.notna())
+
+    return column.where(column.notna(), None).reset_index(drop=True)
+
+
+def _digest(keys: pd.DataFrame) -> np.ndarray:
+    """
+    Hash each row of the canonical key frame to two 64-bit integers.
+    """
+    digests = np.empty((len(keys), 2), dtype=np.uint64)
+    for i, hash_key in enumerate(_HASH_KEYS):
+        digests[:, i] = pd.util.hash_pandas_object(
+            keys, index=False, hash_key=hash_key, categorize=False
+        ).values
+    return digests
+
+
+def _to_hex(digests: np.ndarray) -> np.ndarray:
+    """
+    Format an (n, 2) array of 64-bit integers as hex strings in a single pass
+    over the underlying buffer.
+    """
+    # fix the byte order so identifiers do not depend on the platform
+    hexed = binascii.hexlify(digests.astype(">u8", order="C").tobytes())
+    return np.frombuffer(hexed, dtype="S32").astype(str).astype(object)
+
+
+def _check_collisions(ids: pd.Series, keys: pd.DataFrame) -> None:
+    """
+    Raise if one identifier was assigned to rows with different key values.
+    Identical rows legitimately share an identifier and are not reported.
+    """
+    duplicated = ids.duplicated(keep=False).values
+    if not duplicated.any():
+        return
+
+    distinct = (
+        keys[duplicated].assign(_id=ids.values[duplicated]).drop_duplicates()
+    )
+    clashes = distinct["_id"][distinct["_id"].duplicated()]
+    if not clashes.empty:
+        raise IdCollisionError(
+            f"{clashes.nunique()} identifier(s) were generated for more than "
+            f"one distinct row, e.g. {clashes.iloc[0]!r}."
+        )
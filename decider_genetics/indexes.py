@@ -0,0 +1,106 @@
+import os
+from typing import Optional
+from biocypher._logger import logger
+from decider_genetics.cypher import pascal_case, quote_name
+from decider_genetics.schema import load_schema
+
+logger.debug(f"Loading module {__name__}.")
+
+# name of the script in the output directory, next to the import call
+INDEX_SCRIPT = "indexes.cypher"
+
+# properties the generated queries of the chat app filter on often; every
+# node label and relationship type declaring one of them gets an index on it
+INDEXED_PROPERTIES = ["name", "CLNSIG", "chr", "level"]
+
+# seconds the script waits for the indexes to come online
+AWAIT_SECONDS = 600
+
+
+def constraint_query(label: str) -> str:
+    """
+    Return the query creating the uniqueness constraint of the IDs of the
+    nodes of a label, if it does not exist; it also indexes the IDs.
+    """
+    return (
+        f"CREATE CONSTRAINT {quote_name(_index_name(label, 'id'))} "
+        f"IF NOT EXISTS FOR (n:{quote_name(label)}) REQUIRE n.id IS UNIQUE"
+    )
+
+
+def index_statements(
+    schema_config_path: str, properties: Optional[list] = None
+) -> list:
+    """
+    Return the statements creating the indexes and constraints of the graph,
+    from its schema configuration: a uniqueness constraint on the IDs of
+    every node label, and an index on each of the given properties of every
+    node label and relationship type declaring it. Labels and relationship
+    types are named as BioCypher writes them.
+
+    Args:
+        schema_config_path: Path to the schema configuration YAML file.
+        properties: Properties to index; defaults to `INDEXED_PROPERTIES`.
+    """
+    if properties is None:
+        properties = INDEXED_PROPERTIES
+
+    constraints, indexes = [], []
+    for ontology_class, entry in load_schema(schema_config_path).items():
+        if not isinstance(entry, dict):
+            continue
+        declared = entry.get("properties") or {}
+        if entry.get("represented_as") == "node":
+            label = pascal_case(ontology_class)
+            variable, pattern = "n", f"(n:{quote_name(label)})"
+            constraints.append(constraint_query(label))
+        else:
+            label = pascal_case(entry.get("label_as_edge") or ontology_class)
+            variable, pattern = "r", f"()-[r:{quote_name(label)}]-()"
+        indexes.extend(
+            f"CREATE INDEX {quote_name(_index_name(label, key))} "
+            f"IF NOT EXISTS FOR {pattern} ON ({variable}.{quote_name(key)})"
+            for key in properties
+            if key in declared
+        )
+
+    return sorted(constraints) + sorted(indexes)
+
+
+def write_index_script(
+    output_directory: str,
+    schema_config_path: str,
+    properties: Optional[list] = None,
+) -> str:
+    """
+    Write the statements of `index_statements` as a script for
+    `cypher-shell -f`, to run once the import has finished; it waits for the
+    indexes to come online before it returns.
+
+    Args:
+        output_directory: Directory of the import call, which the script is
+            written to as `INDEX_SCRIPT`.
+        schema_config_path: Path to the schema configuration YAML file.
+        properties: Properties to index; defaults to `INDEXED_PROPERTIES`.
+
+    Returns:
+        The path of the script.
+    """
+    path = os.path.join(output_directory, INDEX_SCRIPT)
+    statements = index_statements(schema_config_path, properties)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            "// indexes and constraints generated from the schema "
+            "configuration;\n// run after the import with cypher-shell -f\n"
+        )
+        for statement in statements:
+            f.write(f"{statement};\n")
+        f.write(f"CALL db.awaitIndexes({AWAIT_SECONDS});\n")
+
+    logger.info(f"Wrote {len(statements)} index statement(s) to {path}.")
+    return path
+
+
+def _index_name(label: str, key: str) -> str:
+    # unique per label and property, as Neo4j requires
+    return f"{label}_{key}"
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+from biocypher._logger import logger
+
+logger.debug(f"Loading module {__name__}.")
+
+
+class IntervalIndex:
+    """
+    Index of closed genomic intervals `[start, end]`, e.g. gene coordinates,
+    for finding the intervals that contain given positions. Per chromosome,
+    the intervals are kept in numpy arrays sorted by start, together with the
+    running maximum of their ends; a query is then two `searchsorted` calls
+    per chromosome and a vectorised scan of the candidate ranges, instead of
+    a loop over positions.
+
+    Chromosome names are compared without a leading "chr" and case, so "chr1"
+    and "1" refer to the same chromosome. Intervals and positions with missing
+    coordinates are ignored.
+
+    Args:
+        chromosomes: Chromosome of each interval.
+        starts: First position of each interval.
+        ends: Last position of each interval.
+    """
+
+    def __init__(self, chromosomes, starts, ends):
+        starts = _as_positions(starts)
+        ends = _as_positions(ends)
+        valid = (starts >= 0) & (ends >= starts)
+
+        self._chromosomes = {}
+        for chromosome, rows in _group_rows(chromosomes, valid):
+            rows = rows[np.argsort(starts[rows], kind="stable")]
+            self._chromosomes[chromosome] = (
+                starts[rows],
+                np.maximum.accumulate(ends[rows]),
+                ends[rows],
+                rows,
+            )
+
+    def __len__(self) -> int:
+        return sum(len(arrays[3]) for arrays in self._chromosomes.values())
+
+    def overlaps(self, chromosomes, positions) -> tuple:
+        """
+        Find all pairs of a position and an interval that contains it.
+
+        Args:
+            chromosomes: Chromosome of each position.
+            positions: The positions, aligned to `chromosomes`.
+
+        Returns:
+            Two integer arrays of equal length: the row of the position and
+            the row of the interval (in the order the index was built from) of
+            each pair, ordered by position row, then interval row.
+        """
+        positions = _as_positions(positions)
+        valid = positions >= 0
+
+        queries, hits = [], []
+        for chromosome, rows in _group_rows(chromosomes, valid):
+            if chromosome not in self._chromosomes:
+                continue
+            starts, max_ends, ends, intervals = self._chromosomes[chromosome]
+            query = positions[rows]
+
+            # candidates start at or before the position, beginning with the
+            # first interval that any earlier-starting interval reaches past
+            upper = np.searchsorted(starts, query, side="right")
+            lower = np.searchsorted(max_ends, query, side="left")
+            counts = np.maximum(upper - lower, 0)
+
+            # expand each query to its range of candidates
+            first = np.cumsum(counts) - counts
+            candidates = np.repeat(lower - first, counts) + np.arange(
+                counts.sum()
+            )
+            query_rows = np.repeat(rows, counts)
+            contained = ends[candidates] >= positions[query_rows]
+
+            queries.append(query_rows[contained])
+            hits.append(intervals[candidates[contained]])
+
+        if not queries:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        queries = np.concatenate(queries)
+        hits = np.concatenate(hits)
+        order = np.lexsort((hits, queries))
+        return queries[order], hits[order]
+
+
+def normalise_chromosomes(chromosomes) -> tuple:
+    """
+    Map chromosome names to a common form, without "chr" prefix and in upper
+    case, normalising each distinct name only once.
+
+    Returns:
+        Integer codes of the normalised names (-1 for missing names) and the
+        normalised names.
+    """
+    codes, names = pd.factorize(pd.Series(chromosomes, dtype=object))
+    names = pd.Index(names.astype(str)).str.upper().str.removeprefix("CHR")
+    name_codes, names = pd.factorize(names)
+    return np.where(codes >= 0, name_codes[codes], -1), names
+
+
+def _as_positions(values) -> np.ndarray:
+    """
+    Convert positions, possibly given as text, to int64; missing or invalid
+    positions become -1.
+    """
+    values = pd.to_numeric(pd.Series(values), errors="coerce")
+    return values.fillna(-1).to_numpy(dtype=np.int64)
+
+
+def _group_rows(chromosomes, valid: np.ndarray):
+    """
+    Yield each normalised chromosome with the valid rows that lie on it.
+    """
+    codes, names = normalise_chromosomes(chromosomes)
+    rows = np.flatnonzero(valid & (codes >= 0))
+    # a stable sort of small integers is a radix sort
+    dtype = np.int16 if len(names) < 2**15 else np.int64
+    rows = rows[np.argsort(codes[rows].astype(dtype), kind="stable")]
+    bounds = np.flatnonzero(np.diff(codes[rows])) + 1
+    for group in np.split(rows, bounds):
+        if len(group):
+            yield names[codes[group[0]]], group
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import biocypher
+from typing import Optional
+from biocypher._logger import logger
+
+logger.debug(f"Loading module {__name__}.")
+
+# file of an output directory recording the build that wrote it
+MANIFEST_NAME = "manifest.json"
+
+# read files in blocks of this size when computing content hashes
+_BLOCK_SIZE = 1024**2
+
+
+def build_key(inputs: list, options: dict, config_paths: list) -> str:
+    """
+    Compute the key of a build from everything its output depends on: the
+    content of its input and configuration files, its options, the code of
+    this package and the BioCypher version. Paths of inputs are not part of
+    the key, only their content and order.
+
+    Args:
+        inputs: Paths of the input files or dataset directories.
+        options: Options of the build that change its output; must be
+            serialisable as JSON.
+        config_paths: Paths of the configuration files, see `config_files`.
+    """
+    key = hashlib.sha256()
+    key.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    key.update(biocypher.__version__.encode("utf-8"))
+
+    package = os.path.dirname(os.path.abspath(__file__))
+    for path in _files(package):
+        if path.endswith(".py"):
+            key.update(os.path.relpath(path, package).encode("utf-8"))
+            key.update(content_hash(path).encode("utf-8"))
+
+    for path in [*config_paths, *inputs]:
+        if os.path.isdir(path):
+            for file in _files(path):
+                key.update(os.path.relpath(file, path).encode("utf-8"))
+                key.update(content_hash(file).encode("utf-8"))
+        else:
+            key.update(content_hash(path).encode("utf-8"))
+
+    return key.hexdigest()
+
+
+def config_files(biocypher_config_path: str) -> list:
+    """
+    Return the BioCypher configuration file and the schema configuration it
+    refers to, which the adapters also read their properties from.
+    """
+    from decider_genetics.schema import schema_config_path
+
+    return [biocypher_config_path, schema_config_path(biocypher_config_path)]
+
+
+def output_hashes(directory: str) -> dict:
+    """
+    Return the SHA-256 of every file of an output directory except the
+    manifest, by path relative to the directory, in a stable order.
+    """
+    return {
+        os.path.relpath(path, directory): content_hash(path)
+        for path in _files(directory)
+        if os.path.relpath(path, directory) != MANIFEST_NAME
+    }
+
+
+def write_manifest(directory: str, key: str) -> dict:
+    """
+    Record the key of the build that wrote an output directory and the
+    hashes of its files in the directory's manifest.
+
+    Returns:
+        The manifest.
+    """
+    manifest = {"key": key, "files": output_hashes(directory)}
+    path = os.path.join(directory, MANIFEST_NAME)
+    # replaced in one step, so that an interrupted write leaves no manifest
+    # that seems valid
+    with open(f"{path}.partial", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(f"{path}.partial", path)
+
+    logger.info(
+        f"Wrote the hashes of {len(manifest['files'])} output file(s) to "
+        f"{path}."
+    )
+    return manifest
+
+
+def read_manifest(directory: str) -> Optional[dict]:
+    """
+    Return the manifest of an output directory, or None if it has none.
+    """
+    try:
+        with open(
+            os.path.join(directory, MANIFEST_NAME), encoding="utf-8"
+        ) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_current(directory: str, key: str) -> bool:
+    """
+    Check whether an output directory holds the output of a build with the
+    given key: its manifest has the key, and its files are the ones recorded,
+    unchanged.
+    """
+    manifest = read_manifest(directory)
+    if manifest is None or manifest.get("key") != key:
+        return False
+    return output_hashes(directory) == manifest.get("files")
+
+
+def content_hash(path: str) -> str:
+    """
+    Return the SHA-256 of a file's content.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _files(directory: str) -> list:
+    """
+    Return the files of a directory and its subdirectories in a stable order.
+    """
+    return sorted(
+        os.path.join(root, name)
+        for root, _, files in os.walk(directory)
+        for name in files
+    )
@@ -0,0 +1,537 @@
+import math
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, Optional
+from neo4j.exceptions import (
+    Neo4jError,
+    ServiceUnavailable,
+    SessionExpired,
+    TransientError,
+)
+from biocypher import BioCypher
+from biocypher._logger import logger
+from decider_genetics.coercion import BOOLEAN_SPELLINGS, FLOAT_SENTINEL
+from decider_genetics.cypher import quote_name
+from decider_genetics.indexes import constraint_query
+from decider_genetics.registry import NodeRegistry
+
+logger.debug(f"Loading module {__name__}.")
+
+# errors after which a batch is sent again: deadlocks and other transient
+# database errors, and lost connections
+_TRANSIENT_ERRORS = (
+    TransientError,
+    ServiceUnavailable,
+    SessionExpired,
+    ConnectionError,
+    TimeoutError,
+)
+
+# batches queued per concurrent transaction before the producer waits
+_QUEUED_PER_WORKER = 2
+
+
+class OnlineIngestor:
+    """
+    Write the node and edge tuples of adapters into a running Neo4j database,
+    instead of writing import files for neo4j-admin, e.g. to add new
+    sequencing results to a graph without rebuilding it.
+
+    Tuples are translated with the schema configuration as in an offline
+    build: labels become the ontology class and its ancestors, properties
+    are filtered and typed by the schema, and nodes get `id` and
+    `preferred_id` properties. They are collected into batches per label,
+    and each batch is sent as one `UNWIND $rows ... MERGE` statement in a
+    write transaction of its own. Several batches run at the same time, in
+    sessions of one driver, whose connection pool they share; a batch that
+    fails with a transient error, such as a deadlock between concurrent
+    transactions or a lost connection, is retried with exponential backoff.
+
+    Nodes are merged by ID and their properties updated, so ingesting the
+    same nodes again changes nothing. Edges are merged between existing
+    nodes, matched by the source and target classes the schema declares;
+    edges to nodes that exist neither in the database nor in the ingested
+    adapters are not created. All nodes are written before the first edge.
+
+    Args:
+        driver: A `neo4j.Driver`, or any object whose `session(database=)`
+            returns a context manager with a `run(query, parameters)`
+            method, such as a mock.
+        bc: The BioCypher instance whose translator and ontology to use.
+        database: Name of the database; None for the default one.
+        batch_size: Maximum number of rows per statement.
+        concurrency: Number of transactions running at the same time; the
+            driver's connection pool should hold at least as many.
+        max_retries: Number of times a batch is retried after a transient
+            error before the ingestion fails.
+        retry_delay: Delay in seconds before the first retry, doubled for
+            each further one.
+        create_constraints: Create a uniqueness constraint on the `id` of
+            every node label before merging nodes of it, so that nodes are
+            looked up by index, and merged only once by concurrent batches.
+    """
+
+    def __init__(
+        self,
+        driver,
+        bc: BioCypher,
+        database: Optional[str] = None,
+        batch_size: int = 10_000,
+        concurrency: int = 4,
+        max_retries: int = 5,
+        retry_delay: float = 0.5,
+        create_constraints: bool = True,
+    ):
+        if batch_size < 1:
+            raise ValueError("The batch size must be at least 1.")
+        if concurrency < 1:
+            raise ValueError("The concurrency must be at least 1.")
+
+        self.driver = driver
+        self.database = database
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.create_constraints = create_constraints
+
+        self.translator = bc._get_translator()
+        self.schema = self.translator.ontology.mapping.extended_schema
+
+        self.nodes = Counter()
+        self.edges = Counter()
+        self.skipped = Counter()
+        self.batches = 0
+        self.retries = 0
+        self.seconds = 0.0
+
+        self._specs = {}  # input label -> how its tuples are written
+        self._rows = {}  # query -> rows not yet sent
+        self._constrained = set()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._started = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self._shutdown(cancel=True)
+
+    def ingest(
+        self, adapters: list, registry: Optional[NodeRegistry] = None
+    ) -> "OnlineIngestor":
+        """
+        Write the nodes of all adapters, then their edges.
+
+        Args:
+            adapters: The adapters to ingest.
+            registry: Node registry shared by the adapters, if any; the nodes
+                it holds back to merge are written after the adapters' nodes.
+        """
+        for adapter in adapters:
+            self.write_nodes(adapter.get_nodes())
+        if registry is not None:
+            self.write_nodes(registry.merged_nodes())
+        # edges are matched to nodes written before
+        self.flush()
+
+        for adapter in adapters:
+            if hasattr(adapter, "get_edges"):
+                self.write_edges(adapter.get_edges())
+        self.flush()
+
+        return self
+
+    def write_nodes(self, nodes: Iterable) -> int:
+        """
+        Queue node tuples, sending full batches as they fill up.
+
+        Args:
+            nodes: Iterable of (id, label, properties) tuples.
+
+        Returns:
+            The number of nodes queued.
+        """
+        count = 0
+        for _id, label, properties in nodes:
+            spec = self._node_spec(label)
+            if spec is None or not _id:
+                self.skipped[label] += 1
+                continue
+
+            values = _properties(properties, spec["converters"])
+            values["id"] = str(_id)
+            if spec["preferred_id"] is not None:
+                values["preferred_id"] = spec["preferred_id"]
+
+            self._add(spec["query"], {"id": values["id"], "properties": values})
+            self.nodes[spec["label"]] += 1
+            count += 1
+        return count
+
+    def write_edges(self, edges: Iterable) -> int:
+        """
+        Queue edge tuples, sending full batches as they fill up. Nodes must
+        have been flushed before, see `flush`.
+
+        Args:
+            edges: Iterable of (id, source, target, label, properties)
+                tuples.
+
+        Returns:
+            The number of edges queued.
+        """
+        count = 0
+        for _id, source, target, label, properties in edges:
+            spec = self._edge_spec(label)
+            if spec is None or not source or not target:
+                self.skipped[label] += 1
+                continue
+
+            values = _properties(properties, spec["converters"])
+            with_id = bool(_id) and spec["use_id"]
+            if with_id:
+                values["id"] = str(_id)
+
+            self._add(
+                spec["queries"][with_id],
+                {
+                    "source": str(source),
+                    "target": str(target),
+                    "id": values.get("id"),
+                    "properties": values,
+                },
+            )
+            self.edges[spec["label"]] += 1
+            count += 1
+        return count
+
+    def flush(self) -> None:
+        """
+        Send the rows of all partial batches and wait until every batch has
+        been written.
+        """
+        for query in list(self._rows):
+            rows = self._rows.pop(query)
+            if rows:
+                self._submit(query, rows)
+        self._wait(0)
+
+        if self._started is not None:
+            self.seconds += time.perf_counter() - self._started
+            self._started = None
+
+    def close(self) -> None:
+        """
+        Flush the batches and stop the transaction threads.
+        """
+        try:
+            self.flush()
+        finally:
+            self._shutdown()
+
+    def summary(self) -> dict:
+        """
+        Return the numbers of nodes and edges written per label, skipped
+        tuples, batches, retries, and the throughput of the ingestion.
+        """
+        rows = sum(self.nodes.values()) + sum(self.edges.values())
+        return {
+            "nodes": dict(sorted(self.nodes.items())),
+            "edges": dict(sorted(self.edges.items())),
+            "skipped": {
+                label: count
+                for label, count in sorted(self.skipped.items())
+                if count
+            },
+            "batches": self.batches,
+            "retries": self.retries,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": (
+                round(rows / self.seconds) if self.seconds else None
+            ),
+        }
+
+    def log_summary(self) -> None:
+        summary = self.summary()
+        for kind in ("nodes", "edges"):
+            for label, count in summary[kind].items():
+                logger.info(f"{label}: {count} {kind} written.")
+        for label, count in summary["skipped"].items():
+            logger.warning(
+                f"{label}: {count} tuple(s) skipped, not in the schema or "
+                "without ID."
+            )
+        logger.info(
+            f"Wrote {summary['batches']} batch(es) in {summary['seconds']} s "
+            f"({summary['rows_per_second']} rows/s), with "
+            f"{summary['retries']} retry(s)."
+        )
+
+    def _node_spec(self, label: str) -> Optional[dict]:
+        """
+        Return the Neo4j label, property types and query of the nodes of an
+        input label, or None if it is not in the schema.
+        """
+        if label in self._specs:
+            return self._specs[label]
+
+        ontology_class = self.translator._get_ontology_mapping(label)
+        spec = None
+        if ontology_class is None:
+            logger.warning(f"Label {label} is not in the schema; skipping.")
+        else:
+            schema = self.schema[ontology_class]
+            name = self.translator.name_sentence_to_pascal(ontology_class)
+            # the class and its ancestors, as BioCypher writes them
+            ancestors = sorted(
+                {
+                    self.translator.name_sentence_to_pascal(ancestor)
+                    for ancestor in (
+                        self.translator.ontology.get_ancestors(ontology_class)
+                        or []
+                    )
+                }
+                - {name}
+            )
+            labels = "".join(
+                f":{quote_name(ancestor)}" for ancestor in ancestors
+            )
+            spec = {
+                "label": name,
+                "converters": _converters(schema),
+                "preferred_id": schema.get("preferred_id", "id") or None,
+                "query": (
+                    "UNWIND $rows AS row "
+                    f"MERGE (n:{quote_name(name)} {{id: row.id}}) "
+                    "SET n += row.properties"
+                    + (f", n{labels}" if labels else "")
+                ),
+            }
+            self._constrain(name)
+
+        self._specs[label] = spec
+        return spec
+
+    def _edge_spec(self, label: str) -> Optional[dict]:
+        """
+        Return the Neo4j type, property types and queries, with and without
+        edge IDs, of the edges of an input label, or None if it is not in the
+        schema.
+        """
+        if label in self._specs:
+            return self._specs[label]
+
+        ontology_class = self.translator._get_ontology_mapping(label)
+        spec = None
+        if ontology_class is None:
+            logger.warning(f"Label {label} is not in the schema; skipping.")
+        elif self.schema[ontology_class].get("represented_as") == "node":
+            raise ValueError(
+                f"Edges of {label} are represented as nodes, which online "
+                "ingestion does not support."
+            )
+        else:
+            schema = self.schema[ontology_class]
+            name = self.translator.name_sentence_to_pascal(
+                schema.get("label_as_edge") or ontology_class
+            )
+            source = self._endpoint_label(schema.get("source"), label)
+            target = self._endpoint_label(schema.get("target"), label)
+            match = (
+                "UNWIND $rows AS row "
+                f"MATCH (a{source} {{id: row.source}}) "
+                f"MATCH (b{target} {{id: row.target}}) "
+            )
+            spec = {
+                "label": name,
+                "converters": _converters(schema),
+                "use_id": schema.get("use_id") is not False,
+                "queries": {
+                    False: match + f"MERGE (a)-[r:{quote_name(name)}]->(b) "
+                    "SET r += row.properties",
+                    True: match
+                    + f"MERGE (a)-[r:{quote_name(name)} {{id: row.id}}]->(b) "
+                    "SET r += row.properties",
+                },
+            }
+
+        self._specs[label] = spec
+        return spec
+
+    def _endpoint_label(self, ontology_class, label: str) -> str:
+        """
+        Return the label pattern of the source or target nodes of edges, from
+        the class the schema declares for them.
+        """
+        if isinstance(ontology_class, str):
+            return ":" + quote_name(
+                self.translator.name_sentence_to_pascal(ontology_class)
+            )
+        logger.warning(
+            f"The schema declares no single source or target class of "
+            f"{label}; its nodes are matched by ID only, without index."
+        )
+        return ""
+
+    def _constrain(self, label: str) -> None:
+        """
+        Create the uniqueness constraint of the IDs of a node label, if it
+        does not exist.
+        """
+        if not self.create_constraints or label in self._constrained:
+            return
+        self._constrained.add(label)
+        try:
+            # the same constraint as in the index script of offline builds
+            self._run(constraint_query(label), None)
+        except Neo4jError as error:
+            # e.g. if the database already holds duplicate IDs
+            logger.warning(
+                f"Could not create the ID constraint of {label}: {error}; "
+                "its nodes are merged without it."
+            )
+
+    def _add(self, query: str, row: dict) -> None:
+        rows = self._rows.setdefault(query, [])
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self._rows[query] = []
+            self._submit(query, rows)
+
+    def _submit(self, query: str, rows: list) -> None:
+        """
+        Send a batch in a transaction thread, once fewer than the allowed
+        number of batches are queued.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.concurrency,
+                thread_name_prefix="online-ingest",
+            )
+        if self._started is None:
+            self._started = time.perf_counter()
+
+        self._wait(self.concurrency * _QUEUED_PER_WORKER - 1)
+        self._pending.add(self._executor.submit(self._run, query, rows))
+
+    def _wait(self, limit: int) -> None:
+        """
+        Wait until at most `limit` batches are pending, raising the error of
+        the first failed one.
+        """
+        while len(self._pending) > limit:
+            done, self._pending = wait(
+                self._pending, return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                future.result()
+
+    def _run(self, query: str, rows: Optional[list]) -> None:
+        """
+        Run a statement in a write transaction of its own, retrying it after
+        transient errors.
+        """
+        parameters = None if rows is None else {"rows": rows}
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.driver.session(database=self.database) as session:
+                    session.run(query, parameters).consume()
+                break
+            except _TRANSIENT_ERRORS as error:
+                if attempt == self.max_retries:
+                    raise
+                # jittered, so that deadlocked transactions do not collide
+                # again
+                delay = self.retry_delay * 2**attempt * random.uniform(0.5, 1)
+                logger.debug(
+                    f"Retrying a batch in {delay:.2f} s after {error!r}."
+                )
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+
+        if rows is not None:
+            with self._lock:
+                self.batches += 1
+
+    def _shutdown(self, cancel: bool = False) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=cancel)
+            self._executor = None
+        self._pending = set()
+
+
+def _converters(schema: dict) -> Optional[list]:
+    """
+    Return the keys of the properties of a schema entry with the functions
+    converting their values to the type Neo4j stores, or None if it declares
+    no properties and all are written as they are.
+    """
+    properties = schema.get("properties")
+    if not properties:
+        return None
+    return [
+        (key, _CONVERTERS.get(kind, _string))
+        for key, kind in properties.items()
+    ]
+
+
+def _properties(properties: dict, converters: Optional[list]) -> dict:
+    """
+    Filter the properties of a tuple by the schema and convert their values,
+    leaving out missing ones.
+    """
+    if converters is None:
+        return {
+            key: value for key, value in properties.items() if value is not None
+        }
+    values = {}
+    for key, convert in converters:
+        value = properties.get(key)
+        if value is not None:
+            values[key] = convert(value)
+    return values
+
+
+def _float(value) -> float:
+    # missing floats are NaN, as neo4j-admin imports them
+    return math.nan if value == FLOAT_SENTINEL else float(value)
+
+
+def _bool(value) -> bool:
+    # booleans are emitted as text, see `coercion.emitted_values`
+    if isinstance(value, str):
+        return value.lower() == BOOLEAN_SPELLINGS[True]
+    return bool(value)
+
+
+def _string(value):
+    # arrays are written as lists
+    if isinstance(value, (str, list)):
+        return value
+    if isinstance(value, tuple):
+        return list(value)
+    return str(value)
+
+
+# functions converting the values of properties of the schema types, which
+# also turn numpy scalars into Python objects; other types are strings
+_CONVERTERS = {
+    "int": int,
+    "integer": int,
+    "long": int,
+    "float": _float,
+    "double": _float,
+    "dbl": _float,
+    "bool": _bool,
+    "boolean": _bool,
+}
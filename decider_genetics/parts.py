@@ -0,0 +1,135 @@
+import glob
+import gzip
+import io
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from biocypher._logger import logger
+
+logger.debug(f"Loading module {__name__}.")
+
+# part files of the import, as BioCypher names them, optionally gzipped;
+# neo4j-admin decompresses files ending in .gz itself, and the import call's
+# `Label-part.*` pattern matches both
+_PART = re.compile(r"-part(\d+)\.csv(\.gz)?$")
+
+# bytes read and written at once when compressing an existing part file
+_CHUNK_SIZE = 1024**2
+
+
+def part_files(directory: str, label: str) -> list:
+    """
+    Return the part files of a label, plain or gzipped, in the order of their
+    numbers.
+    """
+    parts = [
+        part
+        for part in glob.glob(os.path.join(directory, f"{label}-part*.csv*"))
+        if _PART.search(part)
+    ]
+    return sorted(parts, key=part_number)
+
+
+def part_number(path: str) -> int:
+    """
+    Return the number of a part file.
+    """
+    return int(_PART.search(path).group(1))
+
+
+def part_name(label: str, number: int, compressed: bool = False) -> str:
+    """
+    Return the file name of a part of a label.
+    """
+    return (
+        f"{label}-part{str(number).zfill(3)}.csv{'.gz' if compressed else ''}"
+    )
+
+
+def open_part(path: str, mode: str = "r", compression_level: int = 6):
+    """
+    Open a part file as text, decompressing or compressing it as a stream if
+    it is gzipped. Compressed files carry no timestamp, so the same rows give
+    the same bytes.
+
+    Args:
+        path: Path of the part file; gzipped if it ends in .gz.
+        mode: "r" to read or "w" to write.
+        compression_level: gzip level from 1 (fastest) to 9 (smallest) of
+            written files.
+    """
+    if not path.endswith(".gz"):
+        return open(path, mode, encoding="utf-8")
+
+    stream = gzip.GzipFile(
+        path,
+        mode=f"{mode}b",
+        compresslevel=compression_level,
+        mtime=0,
+    )
+    return io.TextIOWrapper(stream, encoding="utf-8")
+
+
+def compress_parts(
+    directory: str,
+    compression_level: int = 6,
+    workers: Optional[int] = None,
+) -> list:
+    """
+    Gzip the plain part files of a directory, e.g. the ones BioCypher wrote,
+    replacing them; several files are compressed at the same time. Header
+    files are left as they are, so the import call stays valid.
+
+    Args:
+        directory: Directory holding the part files.
+        compression_level: gzip level from 1 (fastest) to 9 (smallest).
+        workers: Maximum number of files compressed at the same time;
+            defaults to the number of CPUs.
+
+    Returns:
+        The paths of the compressed files.
+    """
+    parts = sorted(
+        part
+        for part in glob.glob(os.path.join(directory, "*-part*.csv"))
+        if _PART.search(part)
+    )
+    if not parts:
+        return []
+
+    # zlib releases the GIL, so threads compress in parallel
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        return list(
+            pool.map(lambda part: _compress(part, compression_level), parts)
+        )
+
+
+def remove_parts(directory: str) -> int:
+    """
+    Remove the part files, plain or gzipped, of all labels of a directory,
+    e.g. the ones of an earlier build into the same directory, which new
+    parts would otherwise be numbered after.
+
+    Returns:
+        The number of files removed.
+    """
+    parts = [
+        part
+        for part in glob.glob(os.path.join(directory, "*-part*.csv*"))
+        if _PART.search(part)
+    ]
+    for part in parts:
+        os.remove(part)
+    return len(parts)
+
+
+def _compress(path: str, compression_level: int) -> str:
+    target = f"{path}.gz"
+    with open(path, "rb") as source, gzip.GzipFile(
+        target, mode="wb", compresslevel=compression_level, mtime=0
+    ) as f:
+        shutil.copyfileobj(source, f, _CHUNK_SIZE)
+    os.remove(path)
+    return target
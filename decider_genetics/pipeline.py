@@ -0,0 +1,843 @@
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import yaml
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Iterable, Optional
+from more_itertools import peekable
+from biocypher import BioCypher
+from biocypher._create import BioCypherNode
+from biocypher._logger import logger
+from decider_genetics.aggregates import combine_aggregates, write_aggregates
+from decider_genetics.cache import FrameCache
+from decider_genetics.columnar import ColumnarWriter
+from decider_genetics.genes import GeneIndex
+from decider_genetics.indexes import write_index_script
+from decider_genetics.parts import (
+    compress_parts,
+    part_files,
+    part_name,
+    remove_parts,
+)
+from decider_genetics.profiling import (
+    BuildProfiler,
+    attribute,
+    measure,
+    measure_iter,
+)
+from decider_genetics.registry import NodeRegistry
+from decider_genetics.schema import schema_config_path
+from decider_genetics.tables import expand_paths
+
+logger.debug(f"Loading module {__name__}.")
+
+# rough memory use of a worker process before it loads any data, and per byte
+# of adapter input, used to decide how many adapters may run at the same time
+_BASE_MEMORY = 256 * 1024**2
+_MEMORY_PER_INPUT_BYTE = 8
+
+# number of node or edge tuples pickled together when spilling to disk
+_SPILL_BATCH = 100_000
+
+
+class AdapterJob:
+    """
+    One adapter of a build. Jobs are run in worker processes, so the adapter
+    class and its arguments must be picklable.
+
+    Args:
+        name: Unique name of the job, used for its intermediate files.
+        adapter_class: Adapter class; it is created with `registry`, `cache`
+            and `profiler` keyword arguments in addition to `kwargs`.
+        kwargs: Further keyword arguments of the adapter.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        adapter_class: type,
+        kwargs: Optional[dict] = None,
+    ):
+        self.name = name
+        self.adapter_class = adapter_class
+        self.kwargs = kwargs or {}
+
+    def inputs(self) -> list:
+        """
+        Return the paths of the files and dataset directories the job's
+        adapter reads; creating the adapter loads nothing.
+        """
+        return self.adapter_class(**self.kwargs)._input_paths()
+
+    def memory(self) -> int:
+        """
+        Estimate the peak memory of the job from the size of the adapter's
+        inputs: the default ones, or the ones passed as `path`.
+        """
+        inputs = self.adapter_class._inputs
+        if self.kwargs.get("path") is not None:
+            inputs = expand_paths(self.kwargs["path"])
+        size = sum(_input_size(path) for path in inputs)
+        return _BASE_MEMORY + _MEMORY_PER_INPUT_BYTE * size
+
+
+class BuildPipeline:
+    """
+    Build the knowledge graph with several adapters at once. The output is the
+    same as writing the nodes of all adapters, then the merged nodes of the
+    registry, then the edges of all adapters with one BioCypher instance.
+
+    The build runs in two passes over the jobs, each in a pool of worker
+    processes:
+
+    1. Every worker loads its adapter, registers its nodes with a registry of
+       its own and spills the emitted nodes and edges to disk. The main
+       process then absorbs the worker registries in job order, which settles
+       which adapter writes each node and merges the properties of nodes of
+       the merged labels. The aggregates the adapters computed from their
+       frames, such as the number of variants of each patient, are set as
+       properties of the merged nodes.
+    2. Every worker writes the nodes its adapter owns and its edges, checked
+       against the IDs of all adapters, to part files in a directory of its
+       own.
+
+    The part files are then moved into the output directory, numbered in job
+    order, and the main process writes the merged nodes, a single import
+    call for all of them, and the script creating their indexes and
+    constraints, see `indexes.write_index_script`.
+
+    Jobs are started while their estimated memory fits into `max_memory`; a
+    job that does not fit on its own still runs, but alone.
+
+    Args:
+        jobs: The adapters to build, in the order their nodes would be written
+            in a serial build.
+        biocypher_config_path: BioCypher configuration of all writers.
+        output_directory: Output directory; defaults to the one configured in
+            the BioCypher configuration, or a time-stamped directory in
+            `biocypher-out`.
+        merge_labels: Node labels whose duplicates are merged, see
+            `NodeRegistry`.
+        drop_dangling: Drop edges to nodes no adapter emitted; if they are
+            kept, the import call skips them, see `write_import_call`.
+        cache_directory: Directory of the frame cache; None to disable it.
+        workers: Maximum number of worker processes; defaults to the number
+            of CPUs. With one worker, everything runs in this process.
+        max_memory: Memory budget in bytes of all running jobs; None for no
+            limit.
+        profiler: Profiler to measure the stages of each adapter with: load,
+            emit and write in the pipeline, and read, explode, hash and
+            dedupe within the adapters. Worker processes measure with copies
+            of it, whose records are added to it.
+        columnar: Spill the frames of the adapters and write them column by
+            column with a `ColumnarWriter`, instead of spilling and writing
+            one tuple per node and edge; nodes of the merged labels are
+            always written as tuples. The output is the same either way.
+        compression_level: gzip level from 1 (fastest) to 9 (smallest) of the
+            part files; None to write them uncompressed. Frames are
+            compressed as they are written, the part files BioCypher writes
+            afterwards, several at a time. Header files and the import call
+            are the same either way.
+        gene_index: Index of the gene names, which adapters resolve the gene
+            endpoints of their edges through, before they are written; the
+            counts of unresolved edges of each job are collected in it.
+        write_aggregates: Also write the aggregates of all nodes, including
+            the ones no adapter emitted, to `aggregates.AGGREGATES_FILE` in
+            the output directory, e.g. for the merge of shards to add up
+            their counts, see `ShardMerger`.
+    """
+
+    def __init__(
+        self,
+        jobs: list,
+        biocypher_config_path: str = "config/biocypher_config.yaml",
+        output_directory: Optional[str] = None,
+        merge_labels: Optional[list] = None,
+        drop_dangling: bool = True,
+        cache_directory: Optional[str] = "cache/frames",
+        workers: Optional[int] = None,
+        max_memory: Optional[int] = None,
+        profiler: Optional[BuildProfiler] = None,
+        columnar: bool = True,
+        compression_level: Optional[int] = None,
+        gene_index: Optional[GeneIndex] = None,
+        write_aggregates: bool = False,
+    ):
+        names = [job.name for job in jobs]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Job names must be unique, got {names}.")
+
+        self.jobs = jobs
+        self.biocypher_config_path = biocypher_config_path
+        self.output_directory = os.path.abspath(
+            output_directory
+            or configured_output_directory(biocypher_config_path)
+        )
+        self.merge_labels = merge_labels
+        self.drop_dangling = drop_dangling
+        self.cache_directory = cache_directory
+        self.workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+        self.max_memory = max_memory
+        self.profiler = profiler
+        self.columnar = columnar
+        self.compression_level = compression_level
+        self.gene_index = gene_index
+        self.write_aggregates = write_aggregates
+
+        self.registry = NodeRegistry(
+            merge_labels=merge_labels,
+            drop_dangling=drop_dangling,
+        )
+
+    def run(self) -> BioCypher:
+        """
+        Run the build and write the import call.
+
+        Returns:
+            The BioCypher instance that wrote the merged nodes and the import
+            call, e.g. to print its summary.
+        """
+        parts_directory = os.path.join(self.output_directory, ".parts")
+        stale = remove_parts(self.output_directory)
+        if stale:
+            logger.info(
+                f"Removed {stale} part file(s) of an earlier build from "
+                f"{self.output_directory}."
+            )
+        spill_directory = tempfile.mkdtemp(prefix="decider-genetics-")
+        try:
+            emitted = self._run_jobs(
+                _emit_job,
+                [
+                    (
+                        job,
+                        self.merge_labels,
+                        self.cache_directory,
+                        spill_directory,
+                        self.profiler,
+                        self.columnar,
+                        # one per job, so that each counts only its edges
+                        (
+                            self.gene_index.resolver()
+                            if self.gene_index is not None
+                            else None
+                        ),
+                    )
+                    for job in self.jobs
+                ],
+            )
+
+            dropped, aggregates = [], []
+            for job, (registry, profiler, resolver, job_aggregates) in zip(
+                self.jobs, emitted
+            ):
+                self._absorb_profiler(profiler)
+                aggregates.extend(job_aggregates)
+                if resolver is not None:
+                    self.gene_index.absorb(job.name, resolver)
+                with attribute(self.profiler, job.name), measure(
+                    self.profiler, "dedupe", rows_in=len(registry)
+                ) as stage:
+                    dropped.append(self.registry.absorb(registry))
+                    stage.dropped = len(dropped[-1])
+            with attribute(self.profiler, "merged"), measure(
+                self.profiler, "aggregate"
+            ) as stage:
+                stage.rows_out = self._set_aggregates(aggregates)
+
+            written = self._run_jobs(
+                _write_job,
+                [
+                    (
+                        job,
+                        self.biocypher_config_path,
+                        os.path.join(parts_directory, job.name),
+                        spill_directory,
+                        dropped_ids,
+                        # one per job, so that each counts only its edges
+                        self.registry.edge_checker(),
+                        self.profiler,
+                        self.compression_level,
+                    )
+                    for job, dropped_ids in zip(self.jobs, dropped)
+                ],
+            )
+        finally:
+            shutil.rmtree(spill_directory, ignore_errors=True)
+
+        bc = BioCypher(
+            biocypher_config_path=self.biocypher_config_path,
+            output_directory=self.output_directory,
+        )
+        for job, (headers, types, edge_checker, profiler) in zip(
+            self.jobs, written
+        ):
+            self._absorb_profiler(profiler)
+            self.registry.absorb_edges(edge_checker)
+            _collect_parts(
+                os.path.join(parts_directory, job.name),
+                self.output_directory,
+                headers,
+            )
+            register_parts(bc, headers, types)
+
+        # written like the nodes of a job, by an instance of their own:
+        # BioCypher rewrites the headers of all labels it has written each
+        # time it writes nodes, here the schema info node
+        merged_directory = os.path.join(parts_directory, "merged")
+        with attribute(self.profiler, "merged"), measure(
+            self.profiler, "write_nodes"
+        ) as stage:
+            headers, types = _write_nodes(
+                self.biocypher_config_path,
+                merged_directory,
+                stage.count_in(self.registry.merged_nodes()),
+            )
+        _collect_parts(merged_directory, self.output_directory, headers)
+        register_parts(bc, headers, types)
+        shutil.rmtree(parts_directory, ignore_errors=True)
+
+        with measure(self.profiler, "write_import_call"):
+            write_schema_info(bc)
+            write_import_call(bc, not self.drop_dangling)
+            write_index_script(
+                self.output_directory,
+                schema_config_path(self.biocypher_config_path),
+            )
+        if self.compression_level is not None:
+            with measure(self.profiler, "compress") as stage:
+                stage.rows_out = len(
+                    compress_parts(
+                        self.output_directory,
+                        self.compression_level,
+                        self.workers,
+                    )
+                )
+
+        if self.profiler is not None:
+            self.profiler.dump_profiles()
+
+        return bc
+
+    def _set_aggregates(self, items: list) -> int:
+        """
+        Combine the aggregates of all jobs and set them as properties of the
+        merged nodes of the aggregate labels.
+
+        Returns:
+            Number of nodes with aggregates of their own.
+        """
+        aggregates = combine_aggregates(items)
+        if self.write_aggregates:
+            write_aggregates(self.output_directory, aggregates)
+
+        count = 0
+        for label, frame in aggregates.items():
+            if label not in self.registry.merge_labels:
+                logger.info(f"Leaving out the aggregates of {label} nodes.")
+                continue
+            nodes = self.registry.set_properties(label, frame)
+            logger.info(
+                f"Set {', '.join(frame.columns)} of {nodes} {label} node(s)."
+            )
+            count += nodes
+        return count
+
+    def _absorb_profiler(self, profiler: Optional[BuildProfiler]) -> None:
+        if profiler is not None:
+            self.profiler.absorb(profiler)
+
+    def _run_jobs(self, function, arguments: list) -> list:
+        """
+        Call the function with each argument tuple of `arguments`, the first
+        of which is the job, and return the results in job order.
+        """
+        if self.workers == 1:
+            return [function(*args) for args in arguments]
+
+        memory = [args[0].memory() for args in arguments]
+        # start the largest jobs first, so that small ones fill the gaps
+        pending = sorted(range(len(arguments)), key=lambda i: -memory[i])
+        running = {}
+        used = 0
+        results = [None] * len(arguments)
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            while pending or running:
+                while pending and len(running) < self.workers:
+                    i = next(
+                        (
+                            i
+                            for i in pending
+                            if not running
+                            or self.max_memory is None
+                            or used + memory[i] <= self.max_memory
+                        ),
+                        None,
+                    )
+                    if i is None:
+                        break
+                    pending.remove(i)
+                    running[pool.submit(function, *arguments[i])] = i
+                    used += memory[i]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = running.pop(future)
+                    used -= memory[i]
+                    results[i] = future.result()
+
+        return results
+
+
+def configured_output_directory(biocypher_config_path: str) -> str:
+    """
+    Return the output directory of a BioCypher configuration, or a
+    time-stamped directory in `biocypher-out` if it configures none.
+    """
+    with open(biocypher_config_path, encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+
+    return (config.get("biocypher") or {}).get(
+        "output_directory"
+    ) or os.path.join("biocypher-out", datetime.now().strftime("%Y%m%d%H%M%S"))
+
+
+def _input_size(path: str) -> int:
+    """
+    Return the size of an input file, or of all files of a dataset directory.
+    """
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, files in os.walk(path)
+            for name in files
+        )
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _emit_job(
+    job: AdapterJob,
+    merge_labels: Optional[list],
+    cache_directory: Optional[str],
+    spill_directory: str,
+    profiler: Optional[BuildProfiler],
+    columnar: bool,
+    gene_index: Optional[GeneIndex],
+) -> tuple:
+    """
+    Load the job's adapter and spill its nodes and unchecked edges to disk,
+    as tuples or as frames, resolving the genes of its edges through the gene
+    index, if given, and compute its aggregates.
+
+    Returns:
+        The registry of the adapter's nodes, the profiler with the
+        measurements of the job, if profiling, the gene index with the
+        counts of the job's edges, and the (label, frame) tuples of the
+        adapter's aggregates.
+    """
+    profiler = profiler.clone() if profiler is not None else None
+    registry = NodeRegistry(merge_labels=merge_labels)
+    cache = FrameCache(cache_directory) if cache_directory else None
+
+    with attribute(profiler, job.name):
+        with measure(profiler, "load"):
+            adapter = job.adapter_class(
+                registry=registry, cache=cache, profiler=profiler, **job.kwargs
+            )
+            adapter.gene_index = gene_index
+            adapter.load()
+
+        with _FrameSpill(
+            _spill_path(spill_directory, job, "node-frames")
+        ) as frames:
+            if columnar:
+                adapter.writer = frames
+            _spill(
+                measure_iter(profiler, "emit_nodes", adapter.get_nodes()),
+                _spill_path(spill_directory, job, "nodes"),
+            )
+        if profiler is not None:
+            # duplicates within the adapter, dropped by its registry
+            profiler.record(
+                "emit_nodes",
+                rows_out=frames.rows,
+                dropped=sum(registry.duplicates.values()),
+            )
+
+        if hasattr(adapter, "get_edges"):
+            # edges can only be checked against the nodes of all adapters
+            adapter.registry = None
+            with _FrameSpill(
+                _spill_path(spill_directory, job, "edge-frames")
+            ) as frames:
+                if columnar:
+                    adapter.writer = frames
+                _spill(
+                    measure_iter(profiler, "emit_edges", adapter.get_edges()),
+                    _spill_path(spill_directory, job, "edges"),
+                )
+            if profiler is not None:
+                profiler.record("emit_edges", rows_out=frames.rows)
+
+        aggregates = []
+        if hasattr(adapter, "get_aggregates"):
+            with measure(profiler, "aggregate") as stage:
+                aggregates = list(adapter.get_aggregates())
+                stage.rows_out = sum(len(frame) for _, frame in aggregates)
+
+    if profiler is not None:
+        profiler.dump_profiles()
+
+    return registry, profiler, gene_index, aggregates
+
+
+def _write_job(
+    job: AdapterJob,
+    biocypher_config_path: str,
+    output_directory: str,
+    spill_directory: str,
+    dropped: set,
+    checker: NodeRegistry,
+    profiler: Optional[BuildProfiler],
+    compression_level: Optional[int],
+) -> tuple:
+    """
+    Write the spilled nodes of the job, except the ones another adapter
+    writes, and its spilled edges to part files; spilled frames are written
+    with a `ColumnarWriter`.
+
+    Returns:
+        The written header files, as a dictionary of file names and whether
+        they belong to nodes, the node and edge types written, the edge
+        checker with the edge counts, and the profiler with the measurements
+        of the job, if profiling.
+    """
+    profiler = profiler.clone() if profiler is not None else None
+    shutil.rmtree(output_directory, ignore_errors=True)
+    bc = BioCypher(
+        biocypher_config_path=biocypher_config_path,
+        output_directory=output_directory,
+    )
+    # created for the first frame, so that jobs without any create no writer
+    writer = None
+
+    with attribute(profiler, job.name):
+        with measure(profiler, "write_nodes") as stage:
+            nodes = stage.count_in(
+                _unspill(_spill_path(spill_directory, job, "nodes"))
+            )
+            _write(
+                bc.write_nodes,
+                stage.count_out(
+                    node for node in nodes if node[0] not in dropped
+                ),
+            )
+            for (id_column, *args), frame in _unspill(
+                _spill_path(spill_directory, job, "node-frames")
+            ):
+                stage.rows_in = (stage.rows_in or 0) + len(frame)
+                if dropped:
+                    frame = frame[~frame[id_column].isin(dropped)]
+                writer = writer or ColumnarWriter(bc, compression_level)
+                stage.rows_out = (stage.rows_out or 0) + writer.write_nodes(
+                    frame, id_column, *args
+                )
+            stage.dropped = (stage.rows_in or 0) - (stage.rows_out or 0)
+
+        with measure(profiler, "write_edges") as stage:
+            edges = stage.count_in(
+                _unspill(_spill_path(spill_directory, job, "edges"))
+            )
+            _write(bc.write_edges, stage.count_out(checker.check_edges(edges)))
+            for (source, target, label, *args), frame in _unspill(
+                _spill_path(spill_directory, job, "edge-frames")
+            ):
+                stage.rows_in = (stage.rows_in or 0) + len(frame)
+                frame = frame[checker.check_frame(frame, source, target, label)]
+                writer = writer or ColumnarWriter(bc, compression_level)
+                stage.rows_out = (stage.rows_out or 0) + writer.write_edges(
+                    frame, source, target, label, *args
+                )
+            stage.dropped = (stage.rows_in or 0) - (stage.rows_out or 0)
+
+    if profiler is not None:
+        profiler.dump_profiles()
+
+    return (*_written_files(bc), checker, profiler)
+
+
+def _write_nodes(
+    biocypher_config_path: str, output_directory: str, nodes: Iterable
+) -> tuple:
+    """
+    Write node tuples to part files with a BioCypher instance of their own.
+
+    Returns:
+        The written header files and the node types written, as
+        `_written_files`.
+    """
+    shutil.rmtree(output_directory, ignore_errors=True)
+    bc = BioCypher(
+        biocypher_config_path=biocypher_config_path,
+        output_directory=output_directory,
+    )
+    _write(bc.write_nodes, nodes)
+
+    return _written_files(bc)
+
+
+def _written_files(bc: BioCypher) -> tuple:
+    """
+    Return the header files a BioCypher instance wrote, as a dictionary of
+    file names and whether they belong to nodes, and the node and edge types
+    it wrote.
+    """
+    headers = {}
+    types = (set(), set())
+    if bc._writer is not None:
+        for header, _ in bc._writer.import_call_nodes:
+            headers[os.path.basename(header)] = True
+        for header, _ in bc._writer.import_call_edges:
+            headers[os.path.basename(header)] = False
+        deduplicator = bc._get_deduplicator()
+        types = (
+            set(deduplicator.entity_types),
+            set(deduplicator.seen_relationships),
+        )
+
+    return headers, types
+
+
+def _write(write, items: Iterable) -> None:
+    """
+    Call a BioCypher write method, unless there is nothing to write; BioCypher
+    fails on empty iterables.
+    """
+    items = peekable(items)
+    if items:
+        write(items)
+
+
+def _spill_path(spill_directory: str, job: AdapterJob, kind: str) -> str:
+    return os.path.join(spill_directory, f"{job.name}.{kind}.pickle")
+
+
+class _FrameSpill:
+    """
+    Stand-in for a `ColumnarWriter` in the first pass of a build: pickles the
+    frames passed to `write_nodes` and `write_edges`, reduced to the columns
+    written, with their arguments, to be written in the second pass.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = 0
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._file is not None:
+            self._file.close()
+
+    def write_nodes(
+        self,
+        frame,
+        id_column: str,
+        label: str,
+        properties: Optional[list] = None,
+        rename: Optional[dict] = None,
+    ) -> int:
+        if properties is None:
+            properties = [
+                column for column in frame.columns if column != id_column
+            ]
+        return self._dump(
+            (id_column, label, properties, rename),
+            frame,
+            [id_column, *properties],
+        )
+
+    def write_edges(
+        self,
+        frame,
+        source_column: str,
+        target_column: str,
+        label: str,
+        id_column: Optional[str] = None,
+        properties: Optional[list] = None,
+        rename: Optional[dict] = None,
+    ) -> int:
+        columns = [source_column, target_column, *(properties or [])]
+        if id_column is not None:
+            columns.append(id_column)
+        return self._dump(
+            (
+                source_column,
+                target_column,
+                label,
+                id_column,
+                properties,
+                rename,
+            ),
+            frame,
+            columns,
+        )
+
+    def _dump(self, args: tuple, frame, columns: list) -> int:
+        if self._file is None:
+            self._file = open(self.path, "wb")
+        frame = frame[list(dict.fromkeys(columns))]
+        # one record per frame, read back by `_unspill` as a batch of one
+        pickle.dump(
+            [(args, frame)], self._file, protocol=pickle.HIGHEST_PROTOCOL
+        )
+        self.rows += len(frame)
+        return len(frame)
+
+
+def _spill(items: Iterable, path: str) -> None:
+    """
+    Pickle an iterable of tuples to a file, in batches.
+    """
+    batch = []
+    with open(path, "wb") as f:
+        for item in items:
+            batch.append(item)
+            if len(batch) == _SPILL_BATCH:
+                pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+                batch = []
+        if batch:
+            pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _unspill(path: str):
+    """
+    Yield the tuples spilled to a file; nothing if it does not exist.
+    """
+    if not os.path.exists(path):
+        return
+
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield from pickle.load(f)
+            except EOFError:
+                return
+
+
+def _collect_parts(
+    directory: str, output_directory: str, headers: dict
+) -> None:
+    """
+    Move the header and part files of a job into the output directory. Parts
+    are numbered after the parts already there, so that the import call's
+    `Label-part.*` pattern matches all of them; headers of labels that are
+    already there must be identical.
+    """
+    for header in headers:
+        source = os.path.join(directory, header)
+        target = os.path.join(output_directory, header)
+        if os.path.exists(target):
+            with open(source, encoding="utf-8") as a, open(
+                target, encoding="utf-8"
+            ) as b:
+                if a.read() != b.read():
+                    raise ValueError(
+                        f"Adapters wrote different headers to {header}."
+                    )
+            os.remove(source)
+        else:
+            os.replace(source, target)
+
+        label = header[: -len("-header.csv")]
+        next_part = len(part_files(output_directory, label))
+        for part in part_files(directory, label):
+            os.replace(
+                part,
+                os.path.join(
+                    output_directory,
+                    part_name(label, next_part, part.endswith(".gz")),
+                ),
+            )
+            next_part += 1
+
+
+def register_parts(bc: BioCypher, headers: dict, types: tuple) -> None:
+    """
+    Add the header and part files of some labels, already in the output
+    directory, to the import call of a BioCypher instance, and their node and
+    edge types to its schema info.
+
+    Args:
+        bc: The BioCypher instance writing the import call.
+        headers: Names of the header files and whether they belong to nodes.
+        types: Set of node types and set of edge types, as tracked by the
+            BioCypher deduplicator.
+    """
+    if bc._writer is None:
+        bc._get_writer()
+
+    writer = bc._writer
+    for header, is_node in headers.items():
+        label = header[: -len("-header.csv")]
+        files = (
+            os.path.join(writer.import_call_file_prefix, header),
+            os.path.join(writer.import_call_file_prefix, f"{label}-part.*"),
+        )
+        if is_node:
+            writer.import_call_nodes.add(files)
+        else:
+            writer.import_call_edges.add(files)
+
+    entity_types, relationships = types
+    deduplicator = bc._get_deduplicator()
+    deduplicator.entity_types.update(entity_types)
+    for relationship in relationships:
+        deduplicator.seen_relationships.setdefault(relationship, set())
+
+
+def write_schema_info(bc: BioCypher) -> None:
+    """
+    Write the schema info of a BioCypher instance to `schema_info.yaml` and
+    as a node, as `BioCypher.write_schema_info(as_node=True)` does, without
+    also writing the import call, which `write_import_call` writes once all
+    files are known.
+    """
+    schema = bc.write_schema_info()
+    bc.write_nodes(
+        [
+            BioCypherNode(
+                node_id="schema_info",
+                node_label="schema_info",
+                properties={"schema_info": json.dumps(schema)},
+            )
+        ],
+        force=True,
+    )
+
+
+def write_import_call(bc: BioCypher, keep_dangling: bool = False) -> None:
+    """
+    Write the import call of a BioCypher instance, listing its files in a
+    stable order; BioCypher keeps them in sets, whose order changes from one
+    run to the next.
+
+    Args:
+        bc: The BioCypher instance writing the import call.
+        keep_dangling: Whether edges to nodes outside the import were kept;
+            if so, neo4j-admin is told to skip them, whatever the
+            configuration says, instead of aborting the import.
+    """
+    writer = bc._writer
+    if writer is not None:
+        writer.import_call_nodes = sorted(writer.import_call_nodes)
+        writer.import_call_edges = sorted(writer.import_call_edges)
+        if keep_dangling:
+            writer.skip_bad_relationships = True
+    bc.write_import_call()
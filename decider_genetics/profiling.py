@@ -0,0 +1,349 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Iterable, Optional
+from biocypher._logger import logger
+
+logger.debug(f"Loading module {__name__}.")
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+class Stage:
+    """
+    One run of a build stage. The measured code sets the row counts it
+    knows, e.g. `rows_out` after reading or `dropped` after de-duplicating;
+    the profiler adds the timings.
+    """
+
+    def __init__(self, adapter: str, name: str, rows_in: Optional[int]):
+        self.adapter = adapter
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.dropped = None
+
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.children = 0.0  # wall time spent in nested stages
+        self.peak = 0
+        self._started = None
+
+    def count_in(self, items: Iterable):
+        """
+        Yield the items, counting them as rows in.
+        """
+        self.rows_in = self.rows_in or 0
+        for item in items:
+            self.rows_in += 1
+            yield item
+
+    def count_out(self, items: Iterable):
+        """
+        Yield the items, counting them as rows out.
+        """
+        self.rows_out = self.rows_out or 0
+        for item in items:
+            self.rows_out += 1
+            yield item
+
+
+class BuildProfiler:
+    """
+    Measure the stages of a build per adapter: wall and CPU time, rows in
+    and out, dropped duplicates, and peaks of traced memory and of the
+    resident set size. Runs of the same stage of an adapter, e.g. one per
+    chunk, are added up. Each finished run is logged as a JSON event, and
+    `report` returns the totals.
+
+    Stages may be nested, e.g. hashing within emitting edges; the wall time
+    of a stage includes its nested stages, its self time does not.
+
+    Args:
+        trace_memory: Trace Python allocations with `tracemalloc` to record
+            the peak memory of each stage; slows the build down noticeably.
+        profile_directory: Directory to dump a cProfile file per adapter and
+            stage to, as `<adapter>.<stage>.prof`; None to not profile.
+    """
+
+    def __init__(
+        self,
+        trace_memory: bool = False,
+        profile_directory: Optional[str] = None,
+    ):
+        self.trace_memory = trace_memory
+        self.profile_directory = profile_directory
+
+        self._records = {}  # (adapter, stage) -> totals
+        self._adapter = None
+        self._stack = []
+        self._profiles = {}
+
+    def __getstate__(self) -> dict:
+        # profiles cannot be pickled; they are dumped by the process that
+        # collected them
+        return {**self.__dict__, "_stack": [], "_profiles": {}}
+
+    def clone(self) -> "BuildProfiler":
+        """
+        Return an empty profiler with the same settings, e.g. for a worker
+        process, whose records are added back with `absorb`.
+        """
+        return BuildProfiler(self.trace_memory, self.profile_directory)
+
+    def absorb(self, other: "BuildProfiler") -> None:
+        """
+        Add the records of another profiler to the records of this one.
+        """
+        for key, record in other._records.items():
+            self._add(key, record)
+
+    @contextmanager
+    def adapter(self, name: str):
+        """
+        Attribute the stages run within the context to the named adapter;
+        stages outside of any adapter are attributed to "build".
+        """
+        previous, self._adapter = self._adapter, name
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        try:
+            yield
+        finally:
+            self._adapter = previous
+
+    @contextmanager
+    def stage(self, name: str, rows_in: Optional[int] = None):
+        """
+        Measure the code run within the context as one run of a stage.
+
+        Args:
+            name: Name of the stage, e.g. "read" or "hash".
+            rows_in: Number of input rows, if known beforehand.
+
+        Yields:
+            The `Stage`, to set its row counts on.
+        """
+        stage = Stage(self._adapter or "build", name, rows_in)
+        self._enter(stage)
+        try:
+            yield stage
+        finally:
+            self._exit(stage)
+        self._finish(stage)
+
+    def iter_stage(
+        self, name: str, items: Iterable, size: Optional[Callable] = None
+    ):
+        """
+        Yield the items of an iterable, e.g. a generator of nodes, measuring
+        only the time spent producing them as one run of a stage, and
+        counting them as rows out.
+
+        Args:
+            name: Name of the stage.
+            items: The iterable.
+            size: Function returning the number of rows of an item, e.g. of a
+                chunk; by default, every item is one row.
+        """
+        stage = Stage(self._adapter or "build", name, None)
+        stage.rows_out = 0
+        items = iter(items)
+        while True:
+            self._enter(stage)
+            try:
+                item = next(items)
+            except StopIteration:
+                self._exit(stage)
+                break
+            except BaseException:
+                self._exit(stage)
+                raise
+            self._exit(stage)
+            stage.rows_out += 1 if size is None else size(item)
+            yield item
+
+        self._finish(stage)
+
+    def record(self, name: str, **counts) -> None:
+        """
+        Add counts such as `dropped` to the totals of a stage of the current
+        adapter, e.g. once they are known after the stage finished.
+        """
+        self._add(
+            (self._adapter or "build", name),
+            {key: value for key, value in counts.items() if value is not None},
+        )
+
+    def report(self) -> dict:
+        """
+        Return the totals of every stage of every adapter, in the order they
+        first ran.
+        """
+        return {
+            "stages": [
+                {"adapter": adapter, "stage": name, **record}
+                for (adapter, name), record in self._records.items()
+            ],
+        }
+
+    def write_report(self, path: str) -> None:
+        """
+        Write the report as JSON.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def dump_profiles(self) -> None:
+        """
+        Write the collected cProfile statistics, adding them to the ones
+        another process already wrote for the same adapter and stage.
+        """
+        if not self._profiles:
+            return
+
+        os.makedirs(self.profile_directory, exist_ok=True)
+        for (adapter, name), profile in self._profiles.items():
+            path = os.path.join(
+                self.profile_directory, f"{adapter}.{name}.prof"
+            )
+            stats = pstats.Stats(profile)
+            if os.path.exists(path):
+                stats.add(path)
+            stats.dump_stats(path)
+        self._profiles = {}
+
+    def _enter(self, stage: Stage) -> None:
+        self._sample_memory()
+
+        if self.profile_directory is not None:
+            if self._stack:
+                self._profile(self._stack[-1]).disable()
+            self._profile(stage).enable()
+
+        self._stack.append(stage)
+        stage._started = (time.perf_counter(), time.process_time())
+
+    def _exit(self, stage: Stage) -> None:
+        wall = time.perf_counter() - stage._started[0]
+        stage.wall += wall
+        stage.cpu += time.process_time() - stage._started[1]
+
+        self._sample_memory()
+        self._stack.pop()
+        if self._stack:
+            self._stack[-1].children += wall
+
+        if self.profile_directory is not None:
+            self._profile(stage).disable()
+            if self._stack:
+                self._profile(self._stack[-1]).enable()
+
+    def _sample_memory(self) -> None:
+        """
+        Raise the memory peak of all running stages to the peak traced since
+        the last sample, and start a new sampling interval.
+        """
+        if not self.trace_memory or not tracemalloc.is_tracing():
+            return
+
+        peak = tracemalloc.get_traced_memory()[1]
+        for stage in self._stack:
+            stage.peak = max(stage.peak, peak)
+        tracemalloc.reset_peak()
+
+    def _profile(self, stage: Stage) -> cProfile.Profile:
+        key = (stage.adapter, stage.name)
+        if key not in self._profiles:
+            self._profiles[key] = cProfile.Profile()
+        return self._profiles[key]
+
+    def _finish(self, stage: Stage) -> None:
+        record = {
+            "calls": 1,
+            "wall_seconds": stage.wall,
+            "self_seconds": stage.wall - stage.children,
+            "cpu_seconds": stage.cpu,
+            "rows_in": stage.rows_in,
+            "rows_out": stage.rows_out,
+            "dropped": stage.dropped,
+            "peak_traced_bytes": stage.peak if self.trace_memory else None,
+            "max_rss_bytes": _max_rss(),
+        }
+        record = {
+            key: value for key, value in record.items() if value is not None
+        }
+        self._add((stage.adapter, stage.name), record)
+
+        logger.info(
+            "Build stage finished: "
+            + json.dumps(
+                {"adapter": stage.adapter, "stage": stage.name, **record}
+            )
+        )
+
+    def _add(self, key: tuple, record: dict) -> None:
+        totals = self._records.setdefault(key, {})
+        for field, value in record.items():
+            if field in ("peak_traced_bytes", "max_rss_bytes"):
+                totals[field] = max(totals.get(field, 0), value)
+            else:
+                totals[field] = totals.get(field, 0) + value
+
+
+def measure(profiler: Optional[BuildProfiler], name: str, **kwargs):
+    """
+    Measure a stage with the profiler, if one is given; otherwise, return a
+    context that yields a `Stage` that is not recorded, so that the measured
+    code need not check.
+    """
+    if profiler is None:
+        return nullcontext(Stage(None, name, kwargs.get("rows_in")))
+    return profiler.stage(name, **kwargs)
+
+
+def measure_iter(
+    profiler: Optional[BuildProfiler],
+    name: str,
+    items: Iterable,
+    size: Optional[Callable] = None,
+) -> Iterable:
+    """
+    Measure the production of items with the profiler, if one is given, see
+    `BuildProfiler.iter_stage`; otherwise, return the items unchanged.
+    """
+    if profiler is None:
+        return items
+    return profiler.iter_stage(name, items, size)
+
+
+def attribute(profiler: Optional[BuildProfiler], adapter: str):
+    """
+    Attribute stages to an adapter with the profiler, if one is given, see
+    `BuildProfiler.adapter`.
+    """
+    if profiler is None:
+        return nullcontext()
+    return profiler.adapter(adapter)
+
+
+def _max_rss() -> Optional[int]:
+    """
+    Return the peak resident set size of this process so far, in bytes.
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
@@ -0,0 +1,317 @@
+import math
+import numpy as np
+import pandas as pd
+from collections import Counter
+from typing import Iterable, Optional
+from biocypher._logger import logger
+
+logger.debug(f"Loading module {__name__}.")
+
+
+class NodeRegistry:
+    """
+    Registry of the nodes emitted by all adapters of one build, shared by
+    passing it to every adapter. Nodes are de-duplicated by ID as they are
+    emitted, and edges are checked against the registered IDs, so that
+    neither has to be cleaned up by neo4j-admin at import time.
+
+    Nodes of the labels in `merge_labels` (entities several sources
+    contribute to, such as genes or patients) are held back and emitted once,
+    with the properties of all their occurrences merged, by `merged_nodes`.
+    All other nodes are streamed through on first occurrence and only their
+    IDs are kept.
+
+    Args:
+        merge_labels: Node labels whose duplicates should be merged instead
+            of dropped.
+        drop_dangling: Drop edges whose source or target node was never
+            emitted, instead of only counting them.
+    """
+
+    def __init__(
+        self,
+        merge_labels: Optional[list] = None,
+        drop_dangling: bool = False,
+    ):
+        self.merge_labels = set(merge_labels or [])
+        self.drop_dangling = drop_dangling
+
+        self._labels = {}  # node id -> label
+        self._held = {}  # node id -> properties, for merged labels
+        self._index = None  # index of the registered ids, see `check_frame`
+
+        self.nodes = Counter()
+        self.duplicates = Counter()
+        self.conflicts = Counter()
+        self.edges = Counter()
+        self.dangling = Counter()
+
+    def __getstate__(self) -> dict:
+        # the index is rebuilt from the ids when needed
+        return {**self.__dict__, "_index": None}
+
+    def __contains__(self, node_id) -> bool:
+        return node_id in self._labels
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def register_nodes(self, nodes: Iterable):
+        """
+        Register node tuples and yield the ones that should be written now:
+        the first occurrence of each node whose label is not merged.
+
+        Args:
+            nodes: Iterable of (id, label, properties) tuples.
+        """
+        for node in nodes:
+            _id, label, properties = node
+
+            known_label = self._labels.get(_id)
+            if known_label is None:
+                self._labels[_id] = label
+                self.nodes[label] += 1
+                if label in self.merge_labels:
+                    self._held[_id] = dict(properties)
+                else:
+                    yield node
+                continue
+
+            self.duplicates[label] += 1
+            if known_label != label:
+                self.conflicts[label] += 1
+            elif _id in self._held:
+                self._merge(self._held[_id], properties, label)
+
+    def register_ids(self, ids: list, label: str) -> list:
+        """
+        Register the IDs of nodes of a label that is not merged, e.g. of the
+        rows of a frame written column by column, instead of node tuples.
+
+        Args:
+            ids: Node IDs.
+            label: Label of all the nodes.
+
+        Returns:
+            Whether each node should be written, i.e. is the first occurrence
+            of its ID.
+        """
+        if label in self.merge_labels:
+            raise ValueError(f"Nodes of {label} must be registered as tuples.")
+
+        labels = self._labels
+        first = []
+        for _id in ids:
+            known_label = labels.get(_id)
+            if known_label is None:
+                labels[_id] = label
+                self.nodes[label] += 1
+                first.append(True)
+                continue
+
+            self.duplicates[label] += 1
+            if known_label != label:
+                self.conflicts[label] += 1
+            first.append(False)
+
+        return first
+
+    def merged_nodes(self):
+        """
+        Yield the held-back nodes of the merged labels, each once with the
+        merged properties of all its occurrences, and release them.
+        """
+        for _id in list(self._held):
+            yield (_id, self._labels[_id], self._held.pop(_id))
+
+    def set_properties(self, label: str, frame: pd.DataFrame) -> int:
+        """
+        Set properties of the held-back nodes of a merged label, e.g.
+        aggregates computed over all adapters, overriding the values of
+        their occurrences.
+
+        Args:
+            label: Merged label of the nodes.
+            frame: Data frame indexed by node ID, with one column per
+                property; nodes of the label that are not in it get the
+                value 0, as counts of nothing.
+
+        Returns:
+            Number of the nodes in the frame that are held back.
+        """
+        if label not in self.merge_labels:
+            raise ValueError(f"Properties of {label} nodes cannot be set.")
+
+        columns = list(frame.columns)
+        rows = dict(zip(frame.index.tolist(), frame.itertuples(index=False)))
+        zeros = (0,) * len(columns)
+        found = 0
+        for _id, properties in self._held.items():
+            if self._labels[_id] != label:
+                continue
+            values = rows.get(_id)
+            if values is None:
+                values = zeros
+            else:
+                found += 1
+            properties.update(zip(columns, (int(value) for value in values)))
+
+        return found
+
+    def check_edges(self, edges: Iterable):
+        """
+        Count edges whose source or target was never registered, and drop
+        them if `drop_dangling` is set. Edges must be checked after all nodes
+        have been registered.
+
+        Args:
+            edges: Iterable of (id, source, target, label, properties)
+                tuples.
+        """
+        labels = self._labels
+        for edge in edges:
+            label = edge[3]
+            self.edges[label] += 1
+            if edge[1] not in labels or edge[2] not in labels:
+                self.dangling[label] += 1
+                if self.drop_dangling:
+                    continue
+            yield edge
+
+    def check_frame(
+        self,
+        frame: pd.DataFrame,
+        source_column: str,
+        target_column: str,
+        label: str,
+    ) -> np.ndarray:
+        """
+        Check the edges of a frame, one per row, like `check_edges`, but
+        looking up whole columns at once.
+
+        Args:
+            frame: Data frame with one row per edge.
+            source_column: Column holding the source node IDs.
+            target_column: Column holding the target node IDs.
+            label: Label of all the edges.
+
+        Returns:
+            Whether each edge should be written.
+        """
+        # ids are only ever added, so the index is current while their
+        # number is unchanged
+        if self._index is None or len(self._index) != len(self._labels):
+            self._index = pd.Index(list(self._labels), dtype=object)
+
+        known = (
+            self._index.get_indexer(frame[source_column].astype(object)) >= 0
+        ) & (self._index.get_indexer(frame[target_column].astype(object)) >= 0)
+
+        dangling = int((~known).sum())
+        if len(frame):
+            self.edges[label] += len(frame)
+        if dangling:
+            self.dangling[label] += dangling
+        if self.drop_dangling:
+            return known
+        return np.ones(len(frame), dtype=bool)
+
+    def absorb(self, other: "NodeRegistry") -> set:
+        """
+        Take over the nodes registered with another registry, e.g. one that
+        an adapter filled in a worker process, as if they had been registered
+        here after all nodes so far.
+
+        Args:
+            other: Registry with the same merge labels, whose edges have not
+                been checked yet.
+
+        Returns:
+            IDs of the nodes the other registry passed through that are
+            duplicates of nodes registered here, and must not be written.
+        """
+        dropped = set()
+        for _id, label in other._labels.items():
+            known_label = self._labels.get(_id)
+            if known_label is None:
+                self._labels[_id] = label
+                self.nodes[label] += 1
+                if _id in other._held:
+                    self._held[_id] = other._held[_id]
+                continue
+
+            self.duplicates[label] += 1
+            if _id not in other._held:
+                dropped.add(_id)
+            if known_label != label:
+                self.conflicts[label] += 1
+            elif _id in self._held:
+                self._merge(self._held[_id], other._held[_id], label)
+
+        self.duplicates.update(other.duplicates)
+        self.conflicts.update(other.conflicts)
+
+        return dropped
+
+    def edge_checker(self) -> "NodeRegistry":
+        """
+        Return a registry that knows the IDs registered here, but holds no
+        node properties, to check edges in another process.
+        """
+        checker = NodeRegistry(drop_dangling=self.drop_dangling)
+        checker._labels = self._labels
+        return checker
+
+    def absorb_edges(self, checker: "NodeRegistry") -> None:
+        """
+        Add the edge counts of an edge checker to the counts of this registry.
+        """
+        self.edges.update(checker.edges)
+        self.dangling.update(checker.dangling)
+
+    def summary(self) -> dict:
+        """
+        Return counts of unique and duplicate nodes and of property conflicts
+        per node label, and of all and dangling edges per edge label.
+        """
+        return {
+            "nodes": dict(self.nodes),
+            "duplicate_nodes": dict(self.duplicates),
+            "conflicting_nodes": dict(self.conflicts),
+            "edges": dict(self.edges),
+            "dangling_edges": dict(self.dangling),
+        }
+
+    def log_summary(self) -> None:
+        for label, count in self.duplicates.items():
+            logger.info(
+                f"Dropped {count} duplicate {label} node(s) "
+                f"({self.conflicts[label]} with conflicting properties)."
+            )
+        for label, count in self.dangling.items():
+            logger.warning(
+                f"{count} of {self.edges[label]} {label} edge(s) point to "
+                f"nodes that were never emitted"
+                f"{' and were dropped' if self.drop_dangling else ''}."
+            )
+
+    def _merge(self, held: dict, properties: dict, label: str) -> None:
+        """
+        Fill missing values of a held node from a duplicate occurrence; on
+        differing values, the first occurrence wins and a conflict is counted.
+        """
+        conflict = False
+        for key, value in properties.items():
+            if _is_missing(value):
+                continue
+            if _is_missing(held.get(key)):
+                held[key] = value
+            elif held[key] != value:
+                conflict = True
+
+        if conflict:
+            self.conflicts[label] += 1
+
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
@@ -0,0 +1,63 @@
+import yaml
+from functools import lru_cache
+from biocypher._logger import logger
+
+logger.debug(f"Loading module {__name__}.")
+
+# the schema configuration BioCypher reads if its configuration names none
+DEFAULT_SCHEMA_CONFIG_PATH = "config/schema_config.yaml"
+
+
+def schema_config_path(biocypher_config_path: str) -> str:
+    """
+    Return the path of the schema configuration a BioCypher configuration
+    refers to, as BioCypher reads it: relative to the working directory, and
+    `DEFAULT_SCHEMA_CONFIG_PATH` if the configuration names none.
+
+    Args:
+        biocypher_config_path: Path to the BioCypher configuration YAML file.
+    """
+    with open(biocypher_config_path, encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+
+    return (config.get("biocypher") or {}).get(
+        "schema_config_path"
+    ) or DEFAULT_SCHEMA_CONFIG_PATH
+
+
+@lru_cache(maxsize=None)
+def load_schema(path: str) -> dict:
+    """
+    Read the BioCypher schema configuration.
+
+    Args:
+        path: Path to the schema configuration YAML file.
+
+    Returns:
+        Dictionary of schema entries, keyed by ontology class.
+    """
+    with open(path, encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def get_properties(input_label: str, path: str) -> dict:
+    """
+    Return the properties the schema declares for the entity with the given
+    input label, i.e., the properties BioCypher will actually write.
+
+    Args:
+        input_label: Label used by the adapters for the node or edge type.
+        path: Path to the schema configuration YAML file.
+
+    Returns:
+        Dictionary of property names and their types; empty if the entity is
+        not in the schema or declares no properties.
+    """
+    for entry in load_schema(path).values():
+        labels = entry.get("input_label")
+        if isinstance(labels, str):
+            labels = [labels]
+        if input_label in (labels or []):
+            return dict(entry.get("properties") or {})
+
+    return {}
@@ -0,0 +1,527 @@
+import hashlib
+import os
+import yaml
+import zlib
+import pandas as pd
+from collections import Counter
+from typing import Optional
+from biocypher import BioCypher
+from biocypher._logger import logger
+from decider_genetics.aggregates import (
+    AGGREGATES_FILE,
+    ID_COLUMN,
+    read_aggregates,
+)
+from decider_genetics.parts import open_part, part_files, part_name
+from decider_genetics.indexes import write_index_script
+from decider_genetics.pipeline import (
+    register_parts,
+    write_import_call,
+    write_schema_info,
+)
+from decider_genetics.schema import schema_config_path
+from decider_genetics.tables import read_table
+
+logger.debug(f"Loading module {__name__}.")
+
+# maximum number of rows per merged part file
+_PART_ROWS = 1_000_000
+
+# labels whose files are written anew by the merge instead of merged
+_SCHEMA_INFO = "Schema_info"
+
+
+def shard_of(patient: str, shards: int) -> int:
+    """
+    Return the shard a patient belongs to. The assignment only depends on the
+    patient ID, so that shards built on different machines partition the
+    same patients in the same way.
+    """
+    return zlib.crc32(str(patient).encode("utf-8")) % shards
+
+
+def shard_patients(inputs: list, shards: int, shard: int) -> list:
+    """
+    Read the patient IDs of the given inputs and return the ones of a shard.
+
+    Args:
+        inputs: Tables holding patients, as (path, patient column, delimiter)
+            tuples; only the patient column is read.
+        shards: Number of shards.
+        shard: Index of the shard, from 0 to `shards` - 1.
+
+    Returns:
+        The sorted patient IDs of the shard.
+    """
+    if not 0 <= shard < shards:
+        raise ValueError(f"Shard {shard} is not one of {shards} shards.")
+
+    patients = set()
+    for path, column, sep in inputs:
+        values = read_table(path, [column], dtypes={column: str}, sep=sep)
+        patients.update(values[column].dropna().unique())
+
+    return sorted(
+        patient for patient in patients if shard_of(patient, shards) == shard
+    )
+
+
+class ShardMerger:
+    """
+    Merge the outputs of several builds, e.g. of patient shards, into one
+    neo4j-admin import set. Node files of the same label are concatenated
+    with every node ID written once, edge files with identical edges written
+    once, and edges whose source or target is in no node file are dropped;
+    the schema info, import call and index script are written anew.
+
+    Builds to be merged must use the same BioCypher configuration and should
+    keep their dangling edges, since an edge of one shard may point to a node
+    written by another. Of duplicate nodes the first occurrence is kept;
+    duplicates with differing properties are counted as conflicts. Patients
+    are confined to one shard, so shared nodes, such as genes, variants or
+    drugs, have the same properties in every shard, except for counts over
+    the patients of a shard, such as the patients with a variant in a gene:
+    the counts of `summed_properties` are added up over the builds instead,
+    including the ones of builds that counted a node without emitting it.
+
+    Args:
+        directories: Output directories of the builds, in the order their
+            rows should be written.
+        biocypher_config_path: BioCypher configuration of the builds.
+        output_directory: Output directory of the merged import set.
+        drop_dangling: Drop edges to nodes of no build, instead of only
+            counting them and having the import call skip them.
+        compression_level: gzip level from 1 (fastest) to 9 (smallest) of the
+            merged part files; None to write them uncompressed. The builds'
+            part files may be compressed either way.
+        summed_properties: Keys of integer node properties that count over
+            the patients of a build, which are added up over the builds,
+            from the aggregates files the builds wrote, see
+            `aggregates.write_aggregates`.
+    """
+
+    def __init__(
+        self,
+        directories: list,
+        biocypher_config_path: str = "config/biocypher_config.yaml",
+        output_directory: Optional[str] = None,
+        drop_dangling: bool = True,
+        compression_level: Optional[int] = None,
+        summed_properties: Optional[list] = None,
+    ):
+        self.directories = directories
+        self.biocypher_config_path = biocypher_config_path
+        self.output_directory = output_directory
+        self.drop_dangling = drop_dangling
+        self.compression_level = compression_level
+        self.summed_properties = summed_properties or []
+
+        self.nodes = Counter()
+        self.duplicates = Counter()
+        self.conflicts = Counter()
+        self.edges = Counter()
+        self.duplicate_edges = Counter()
+        self.dangling = Counter()
+        self._totals = {}
+
+    def run(self) -> BioCypher:
+        """
+        Merge the builds and write the import call.
+
+        Returns:
+            The BioCypher instance that wrote the schema info and the import
+            call.
+        """
+        bc = BioCypher(
+            biocypher_config_path=self.biocypher_config_path,
+            output_directory=self.output_directory,
+        )
+        bc._get_writer()
+        writer = bc._writer
+        output_directory = writer.outdir
+        delimiter = writer.delim
+
+        headers = self._headers()
+        for header in headers.values():
+            if os.path.exists(os.path.join(output_directory, header["file"])):
+                raise ValueError(
+                    f"{output_directory} already holds {header['file']}."
+                )
+
+        self._totals = self._count_totals()
+
+        # nodes first, so that edges can be checked against all node IDs
+        node_ids = {}
+        written = {}
+        for label, header in headers.items():
+            if header["is_node"]:
+                if self._merge_nodes(
+                    label, header, node_ids, output_directory, delimiter
+                ):
+                    written[header["file"]] = True
+        for label, header in headers.items():
+            if not header["is_node"]:
+                if self._merge_edges(
+                    label, header, node_ids, output_directory, delimiter
+                ):
+                    written[header["file"]] = False
+
+        register_parts(bc, written, self._types())
+        write_schema_info(bc)
+        write_import_call(bc, not self.drop_dangling)
+        write_index_script(
+            output_directory, schema_config_path(self.biocypher_config_path)
+        )
+
+        return bc
+
+    def _count_totals(self) -> dict:
+        """
+        Add up the counts of `summed_properties` of the builds, from their
+        aggregates files, see `aggregates.write_aggregates`.
+
+        Returns:
+            Mapping of property keys to their totals, by node ID; empty if
+            a build has no aggregates file, so that nodes keep the counts of
+            the first build holding them.
+        """
+        frames, missing = [], []
+        for directory in self.directories:
+            frame = read_aggregates(directory)
+            if frame is None:
+                missing.append(directory)
+            else:
+                frames.append(frame[frame["key"].isin(self.summed_properties)])
+
+        if self.summed_properties and missing:
+            logger.warning(
+                f"{', '.join(missing)} hold(s) no {AGGREGATES_FILE}; the "
+                f"{', '.join(self.summed_properties)} of their nodes are not "
+                "added up, but taken from the first build holding the node."
+            )
+            return {}
+
+        totals = {key: {} for key in self.summed_properties}
+        if frames:
+            sums = (
+                pd.concat(frames, ignore_index=True)
+                .groupby(["key", ID_COLUMN], sort=False)["value"]
+                .sum()
+            )
+            for (key, _id), value in sums.items():
+                totals[key][_id] = int(value)
+        return totals
+
+    def _headers(self) -> dict:
+        """
+        Collect the header files of all builds, by label, in the order they
+        first occur; headers of the same label must be identical.
+        """
+        headers = {}
+        for directory in self.directories:
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith("-header.csv"):
+                    continue
+                label = name[: -len("-header.csv")]
+                if label == _SCHEMA_INFO:
+                    continue
+
+                path = os.path.join(directory, name)
+                with open(path, encoding="utf-8") as f:
+                    text = f.read()
+
+                if label not in headers:
+                    headers[label] = {
+                        "file": name,
+                        "text": text,
+                        # the ID column of nodes comes first
+                        "is_node": text.startswith(":ID"),
+                        "sources": [],
+                    }
+                elif headers[label]["text"] != text:
+                    raise ValueError(
+                        f"Builds {headers[label]['sources'][0]} and "
+                        f"{directory} have different headers for {label}."
+                    )
+                headers[label]["sources"].append(directory)
+
+        return headers
+
+    def _merge_nodes(
+        self,
+        label: str,
+        header: dict,
+        node_ids: dict,
+        output_directory: str,
+        delimiter: str,
+    ) -> bool:
+        """
+        Write the nodes of a label, each ID once. `node_ids` maps the IDs
+        written so far to a digest of their row, to detect conflicts.
+
+        Returns:
+            Whether any node was written.
+        """
+        columns = header["text"].strip().split(delimiter)
+        summed = {
+            position: self._totals[key]
+            for position, key in enumerate(
+                column.partition(":")[0] for column in columns
+            )
+            if key in self._totals
+        }
+        if summed:
+            return self._sum_nodes(
+                label, header, summed, node_ids, output_directory, delimiter
+            )
+
+        with _PartWriter(
+            output_directory, label, header["text"], self.compression_level
+        ) as parts:
+            for line in self._lines(label, header):
+                # the ID is the first column and never quoted
+                _id = line.split(delimiter, 1)[0]
+                digest = _digest(line)
+                known = node_ids.get(_id)
+                if known is None:
+                    node_ids[_id] = digest
+                    self.nodes[label] += 1
+                    parts.write(line)
+                    continue
+
+                self.duplicates[label] += 1
+                if known != digest:
+                    self.conflicts[label] += 1
+
+        return parts.rows > 0
+
+    def _sum_nodes(
+        self,
+        label: str,
+        header: dict,
+        summed: dict,
+        node_ids: dict,
+        output_directory: str,
+        delimiter: str,
+    ) -> bool:
+        """
+        Write the nodes of a label, each ID once, with the counts in the
+        columns at the positions of `summed` replaced by their totals over
+        the builds. Nodes are compared without these columns to detect
+        conflicts.
+
+        Args:
+            summed: Mapping of column positions to the totals of their
+                property, by node ID.
+
+        Returns:
+            Whether any node was written.
+        """
+        width = len(header["text"].strip().split(delimiter))
+        with _PartWriter(
+            output_directory, label, header["text"], self.compression_level
+        ) as parts:
+            for line in self._lines(label, header):
+                fields = line.rstrip("\n").split(delimiter)
+                _id = fields[0]
+                # a property holding the delimiter shifts the columns; such
+                # nodes are written as they are
+                counted = len(fields) == width
+                # builds without the counting adapter leave the count empty
+                present = {}
+                if counted:
+                    for position in summed:
+                        present[position] = fields[position] != ""
+                        fields[position] = ""
+                digest = _digest(delimiter.join(fields))
+
+                known = node_ids.get(_id)
+                if known is not None:
+                    self.duplicates[label] += 1
+                    if known != digest:
+                        self.conflicts[label] += 1
+                    continue
+
+                node_ids[_id] = digest
+                self.nodes[label] += 1
+                if not counted:
+                    parts.write(line)
+                    continue
+                for position, totals in summed.items():
+                    if present[position]:
+                        fields[position] = str(totals.get(_id, 0))
+                parts.write(delimiter.join(fields))
+
+        return parts.rows > 0
+
+    def _merge_edges(
+        self,
+        label: str,
+        header: dict,
+        node_ids: dict,
+        output_directory: str,
+        delimiter: str,
+    ) -> bool:
+        """
+        Write the edges of a label, each distinct row once, dropping edges to
+        unknown nodes if `drop_dangling` is set.
+
+        Returns:
+            Whether any edge was written.
+        """
+        columns = header["text"].strip().split(delimiter)
+        # properties may contain the delimiter, so the target is located from
+        # the end of the row, where only it and the type follow
+        target = columns.index(":END_ID") - len(columns)
+
+        seen = set()
+        with _PartWriter(
+            output_directory, label, header["text"], self.compression_level
+        ) as parts:
+            for line in self._lines(label, header):
+                digest = _digest(line)
+                if digest in seen:
+                    self.duplicate_edges[label] += 1
+                    continue
+                seen.add(digest)
+
+                self.edges[label] += 1
+                fields = line.rstrip("\n").split(delimiter)
+                if fields[0] not in node_ids or fields[target] not in node_ids:
+                    self.dangling[label] += 1
+                    if self.drop_dangling:
+                        continue
+                parts.write(line)
+
+        return parts.rows > 0
+
+    def _lines(self, label: str, header: dict):
+        """
+        Yield the rows of all part files of a label, build by build.
+        """
+        for directory in header["sources"]:
+            for part in part_files(directory, label):
+                with open_part(part) as f:
+                    yield from f
+
+    def _types(self) -> tuple:
+        """
+        Return the node and edge types present in any of the builds, from
+        their schema info files.
+        """
+        entity_types, relationships = set(), set()
+        for directory in self.directories:
+            path = os.path.join(directory, "schema_info.yaml")
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as f:
+                schema = yaml.safe_load(f) or {}
+
+            for key, value in schema.items():
+                if not isinstance(value, dict):
+                    continue
+                if not value.get("present_in_knowledge_graph"):
+                    continue
+                if value.get("is_relationship"):
+                    relationships.add(key)
+                else:
+                    entity_types.add(key)
+
+        return entity_types, relationships
+
+    def summary(self) -> dict:
+        """
+        Return counts of written, duplicate and conflicting nodes per node
+        label, and of written, duplicate and dangling edges per edge label.
+        """
+        return {
+            "nodes": dict(self.nodes),
+            "duplicate_nodes": dict(self.duplicates),
+            "conflicting_nodes": dict(self.conflicts),
+            "edges": dict(self.edges),
+            "duplicate_edges": dict(self.duplicate_edges),
+            "dangling_edges": dict(self.dangling),
+        }
+
+    def log_summary(self) -> None:
+        for label, count in self.duplicates.items():
+            logger.info(
+                f"Merged {count} duplicate {label} node(s) "
+                f"({self.conflicts[label]} with conflicting properties)."
+            )
+        for label, count in self.duplicate_edges.items():
+            logger.info(f"Merged {count} duplicate {label} edge(s).")
+        for label, count in self.dangling.items():
+            logger.warning(
+                f"{count} of {self.edges[label]} {label} edge(s) point to "
+                f"nodes that no build emitted"
+                f"{' and were dropped' if self.drop_dangling else ''}."
+            )
+
+
+class _PartWriter:
+    """
+    Write the header and rows of a label to numbered part files of at most
+    `_PART_ROWS` rows, gzipped if a compression level is given; the header is
+    only written if there are rows.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        label: str,
+        header: str,
+        compression_level: Optional[int] = None,
+    ):
+        self.directory = directory
+        self.label = label
+        self.header = header
+        self.compression_level = compression_level
+        self.rows = 0
+        self._file = None
+        self._parts = 0
+        self._rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._file is not None:
+            self._file.close()
+        if self.rows:
+            with open(
+                os.path.join(self.directory, f"{self.label}-header.csv"),
+                "w",
+                encoding="utf-8",
+            ) as f:
+                f.write(self.header)
+
+    def write(self, line: str) -> None:
+        if self._file is None or self._rows == _PART_ROWS:
+            if self._file is not None:
+                self._file.close()
+            self._file = open_part(
+                os.path.join(
+                    self.directory,
+                    part_name(
+                        self.label,
+                        self._parts,
+                        self.compression_level is not None,
+                    ),
+                ),
+                "w",
+                self.compression_level,
+            )
+            self._parts += 1
+            self._rows = 0
+        if not line.endswith("\n"):
+            line += "\n"
+        self._file.write(line)
+        self._rows += 1
+        self.rows += 1
+
+
+def _digest(line: str) -> bytes:
+    return hashlib.blake2b(
+        line.rstrip("\n").encode("utf-8"), digest_size=16
+    ).digest()
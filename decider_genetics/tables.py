@@ -0,0 +1,351 @@
+import glob
+import os
+import operator
+import pandas as pd
+import pyarrow
+import pyarrow.dataset
+import pyarrow.fs
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional, Union
+from biocypher._logger import logger
+
+logger.debug(f"Loading module {__name__}.")
+
+PARQUET_SUFFIXES = (".parquet", ".pq")
+ARROW_SUFFIXES = (".arrow", ".feather", ".ipc")
+
+# comparison operators of row filters, as in pandas.read_parquet
+_OPERATORS = {
+    "==": operator.eq,
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def table_format(path: str) -> str:
+    """
+    Determine the format of an input table from its file name: "parquet",
+    "ipc" (Arrow IPC / Feather) or "csv" (delimited text). A directory is a
+    (possibly hive-partitioned) dataset in the format of the files it
+    contains.
+
+    Args:
+        path: Path to a file or dataset directory.
+    """
+    if os.path.isdir(path):
+        for _, _, files in sorted(os.walk(path)):
+            for name in sorted(files):
+                if name.startswith((".", "_")):
+                    continue
+                if name.endswith(PARQUET_SUFFIXES):
+                    return "parquet"
+                if name.endswith(ARROW_SUFFIXES):
+                    return "ipc"
+        raise ValueError(f"No Parquet or Arrow files found in {path}.")
+
+    if path.endswith(PARQUET_SUFFIXES):
+        return "parquet"
+    if path.endswith(ARROW_SUFFIXES):
+        return "ipc"
+    return "csv"
+
+
+def read_table(
+    path: str,
+    columns: list,
+    dtypes: Optional[dict] = None,
+    filters: Optional[list] = None,
+    sep: str = "\t",
+    nrows: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Read the given columns of a delimited text file, a Parquet or Arrow IPC
+    file, or a partitioned dataset of either, as a data frame.
+
+    Columnar inputs are read through a memory-mapped `pyarrow.dataset`: only
+    the requested columns are decoded, and the filters are pushed down to
+    skip partitions and row groups whose statistics rule them out. Text
+    inputs are parsed with pandas and filtered afterwards.
+
+    Args:
+        path: Path to the table or dataset directory.
+        columns: Columns to read, in the order of the returned frame, so that
+            it does not depend on the layout of the input; columns missing
+            from the input are skipped.
+        dtypes: Dtypes to convert columns to, as passed to `read_csv`, so that
+            the frame does not depend on the input format; columns typed `str`
+            become text with missing values kept.
+        filters: Row filters as (column, operator, value) tuples that must all
+            hold, with the operators of `pandas.read_parquet` ("==", "!=",
+            "<", "<=", ">", ">=", "in", "not in").
+        sep: Delimiter of text inputs.
+        nrows: Read at most this many (filtered) rows.
+    """
+    frames = iter_table(path, columns, dtypes, filters, sep, nrows=nrows)
+    frame = next(frames, None)
+    if frame is None:
+        return pd.DataFrame(columns=columns)
+    return frame
+
+
+def iter_table(
+    path: str,
+    columns: list,
+    dtypes: Optional[dict] = None,
+    filters: Optional[list] = None,
+    sep: str = "\t",
+    chunk_size: Optional[int] = None,
+    nrows: Optional[int] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Like `read_table`, but yield the table in frames of about `chunk_size`
+    rows; if `chunk_size` is None, yield it as a single frame.
+    """
+    if table_format(path) == "csv":
+        yield from _iter_text(
+            path, columns, dtypes, filters, sep, chunk_size, nrows
+        )
+        return
+
+    dataset = _dataset(path)
+    present = [column for column in columns if column in dataset.schema.names]
+    expression = _filter_expression(filters)
+
+    if nrows is not None:
+        tables = [dataset.head(nrows, columns=present, filter=expression)]
+    elif chunk_size is None:
+        tables = [dataset.to_table(columns=present, filter=expression)]
+    else:
+        tables = (
+            pyarrow.Table.from_batches([batch])
+            for batch in dataset.to_batches(
+                columns=present,
+                filter=expression,
+                batch_size=chunk_size,
+            )
+        )
+
+    for table in tables:
+        yield _to_pandas(table, dtypes)
+
+
+def expand_paths(paths: Union[str, Iterable]) -> list:
+    """
+    Return the tables an input names: a path, a glob pattern such as
+    "data/batch-*.tsv", or a list of either. Matches of a pattern are sorted,
+    so that the tables are always read in the same order; dataset
+    directories count as one table, and tables named twice are read once.
+
+    Args:
+        paths: Path or pattern, or a list of them.
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+
+    expanded = []
+    for path in map(os.fspath, paths):
+        if not any(char in path for char in "*?["):
+            expanded.append(path)
+            continue
+        matches = sorted(glob.glob(path, recursive=True))
+        if not matches:
+            raise FileNotFoundError(f"No input matches {path}.")
+        expanded.extend(matches)
+
+    return list(dict.fromkeys(expanded))
+
+
+def map_tables(
+    read: Callable, paths: list, workers: Optional[int] = None
+) -> Iterator:
+    """
+    Read tables with `read(path)` in a pool of threads, e.g. many per-batch
+    files of one input, and yield the results in the order of `paths`. At
+    most `workers` tables are read ahead of the one the consumer holds, so
+    that memory depends on the size of a table, not of all of them. Parsing
+    text with pandas and reading columnar files with Arrow release the GIL,
+    so the reads overlap.
+
+    Args:
+        read: Function reading one table.
+        paths: Paths of the tables.
+        workers: Number of tables read at the same time; defaults to the
+            number of CPUs.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers <= 1:
+        for path in paths:
+            yield read(path)
+        return
+
+    remaining = iter(paths)
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="read-table"
+    ) as executor:
+        pending = deque(
+            executor.submit(read, path) for path in islice(remaining, workers)
+        )
+        try:
+            while pending:
+                result = pending.popleft().result()
+                for path in islice(remaining, 1):
+                    pending.append(executor.submit(read, path))
+                yield result
+                del result
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def concat_tables(frames: list) -> pd.DataFrame:
+    """
+    Concatenate frames read from several tables. Columns that are
+    categorical in all frames stay categorical, with the categories of all
+    of them, instead of becoming object columns as with `pd.concat`.
+    """
+    if len(frames) == 1:
+        return frames[0]
+
+    categorical = [
+        column
+        for column in frames[0].columns
+        if all(
+            isinstance(frame[column].dtype, pd.CategoricalDtype)
+            for frame in frames
+        )
+    ]
+    if categorical:
+        dtypes = {
+            column: pd.CategoricalDtype(
+                reduce(
+                    lambda left, right: left.union(right, sort=False),
+                    (frame[column].cat.categories for frame in frames),
+                )
+            )
+            for column in categorical
+        }
+        frames = [frame.astype(dtypes) for frame in frames]
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def filter_rows(frame: pd.DataFrame, filters: Optional[list]) -> pd.DataFrame:
+    """
+    Return the rows of a frame that match all filters, given as in
+    `read_table`, e.g. for inputs read by other means.
+    """
+    if not filters:
+        return frame
+    return frame[_filter_mask(frame, filters)]
+
+
+def _iter_text(path, columns, dtypes, filters, sep, chunk_size, nrows):
+    filter_columns = [column for column, _, _ in filters or []]
+    wanted = set(columns) | set(filter_columns)
+
+    reader = pd.read_csv(
+        path,
+        sep=sep,
+        header=0,
+        usecols=lambda column: column in wanted,
+        dtype=dtypes,
+        chunksize=chunk_size,
+        nrows=nrows if not filters else None,
+    )
+    chunks = [reader] if chunk_size is None else reader
+
+    try:
+        for chunk in chunks:
+            if filters:
+                chunk = chunk[_filter_mask(chunk, filters)]
+                chunk = chunk.drop(
+                    columns=[
+                        column
+                        for column in filter_columns
+                        if column not in columns
+                    ]
+                )
+                if nrows is not None:
+                    chunk = chunk.head(nrows)
+            yield chunk[[column for column in columns if column in chunk]]
+    finally:
+        if chunk_size is not None:
+            reader.close()
+
+
+def _dataset(path: str):
+    return pyarrow.dataset.dataset(
+        path,
+        format=table_format(path),
+        partitioning="hive",
+        filesystem=pyarrow.fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def _filter_mask(frame: pd.DataFrame, filters: list) -> pd.Series:
+    mask = pd.Series(True, index=frame.index)
+    for column, op, value in filters:
+        values = frame[column]
+        if op == "in":
+            mask &= values.isin(value)
+        elif op == "not in":
+            mask &= ~values.isin(value)
+        else:
+            mask &= _operator(op)(values, value)
+    return mask
+
+
+def _filter_expression(filters: Optional[list]):
+    expression = None
+    for column, op, value in filters or []:
+        field = pyarrow.dataset.field(column)
+        if op == "in":
+            condition = field.isin(value)
+        elif op == "not in":
+            condition = ~field.isin(value)
+        else:
+            condition = _operator(op)(field, value)
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _operator(op: str):
+    try:
+        return _OPERATORS[op]
+    except KeyError:
+        raise ValueError(f"Unsupported filter operator {op!r}.") from None
+
+
+def _to_pandas(table, dtypes: Optional[dict]) -> pd.DataFrame:
+    """
+    Convert an Arrow table to a data frame with the dtypes text inputs are
+    parsed with. Integer columns typed `str` are cast to text by Arrow, so
+    that integers with missing values do not pass through floats; other
+    columns are formatted by pandas, e.g. floats as "23.0".
+    """
+    dtypes = dtypes or {}
+    for column, dtype in dtypes.items():
+        if dtype is str and column in table.column_names:
+            i = table.column_names.index(column)
+            if pyarrow.types.is_integer(table.schema.field(i).type):
+                table = table.set_column(
+                    i, column, table.column(i).cast(pyarrow.string())
+                )
+
+    frame = table.to_pandas()
+    for column, dtype in dtypes.items():
+        if column not in frame:
+            continue
+        values = frame[column]
+        if dtype is not str:
+            frame[column] = values.astype(dtype)
+        elif values.dtype != object:
+            frame[column] = values.astype(str).where(values.notna())
+    return frame
@@ -1,4 +1,19 @@
 sleep 15
 echo "Creating database '$BC_TABLE_NAME'"
 cypher-shell -u $NEO4J_USER -p $NEO4J_PASSWORD "create database $BC_TABLE_NAME;"
-echo "Database created!"
\ No newline at end of file
+echo "Database created!"
+
+# indexes and constraints generated by the build from the schema
+# configuration; the script returns once they are online
+INDEX_SCRIPT=import/$BC_TABLE_NAME/indexes.cypher
+if [ -f "$INDEX_SCRIPT" ]; then
+  for i in $(seq 60); do
+    cypher-shell -u $NEO4J_USER -p $NEO4J_PASSWORD -d $BC_TABLE_NAME \
+      "RETURN 1;" > /dev/null 2>&1 && break
+    sleep 2
+  done
+  echo "Creating indexes and constraints"
+  cypher-shell -u $NEO4J_USER -p $NEO4J_PASSWORD -d $BC_TABLE_NAME \
+    -f "$INDEX_SCRIPT"
+  echo "Indexes online!"
+fi
@@ -3,5 +3,8 @@ cd /usr/app/
 cp -r /src/* .
 cp config/biocypher_docker_config.yaml config/biocypher_config.yaml
 poetry install
-python3 create_knowledge_graph.py
-chmod -R 777 biocypher-log
\ No newline at end of file
+# skipped if the volume holds the output of the same inputs and code; further
+# options, e.g. "--streaming --memory-budget 512", are taken from
+# $BUILD_OPTIONS and the arguments of the script
+python3 create_knowledge_graph.py --reproducible ${BUILD_OPTIONS} "$@"
+chmod -R 777 biocypher-log
@@ -7,4 +7,13 @@ if [ -f /data/build2neo/neo4j-admin-import-call.sh ]; then
 fi
 neo4j start
 sleep 10
+# indexes and constraints generated by the build from the schema
+# configuration; the script returns once they are online
+if [ -f /data/build2neo/indexes.cypher ]; then
+  for i in $(seq 60); do
+    cypher-shell "RETURN 1;" > /dev/null 2>&1 && break
+    sleep 2
+  done
+  cypher-shell -f /data/build2neo/indexes.cypher
+fi
 neo4j stop
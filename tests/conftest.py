@@ -0,0 +1,80 @@
+import os
+import threading
+import pytest
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+
+@pytest.fixture
+def biocypher_config(tmp_path) -> str:
+    """
+    Path of a BioCypher configuration like the repository's, with the
+    ontology of the test data instead of the Biolink model.
+    """
+    path = tmp_path / "biocypher_config.yaml"
+    path.write_text(f"""biocypher:
+  offline: true
+  debug: false
+  schema_config_path: config/schema_config.yaml
+  head_ontology:
+    url: {os.path.join(DATA, "ontology.ttl")}
+    root_node: entity
+
+neo4j:
+  delimiter: '\\t'
+  array_delimiter: '|'
+  skip_duplicate_nodes: false
+  skip_bad_relationships: false
+""")
+    return str(path)
+
+
+class FakeDriver:
+    """
+    Stand-in for a `neo4j.Driver` that records the statements run in its
+    sessions, failing the first `failures` of them with the given error.
+    """
+
+    def __init__(self, failures: int = 0, error: Exception = None):
+        self.statements = []
+        self.failures = failures
+        self.error = error
+        self._lock = threading.Lock()
+
+    def session(self, database=None):
+        return _FakeSession(self)
+
+    def _run(self, query: str, parameters):
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                raise self.error
+            self.statements.append((query, parameters))
+        return _FakeResult()
+
+
+class _FakeSession:
+    def __init__(self, driver: FakeDriver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def run(self, query: str, parameters=None):
+        return self.driver._run(query, parameters)
+
+
+class _FakeResult:
+    def consume(self):
+        return None
+
+
+@pytest.fixture
+def fake_driver():
+    """
+    Factory of `FakeDriver`s.
+    """
+    return FakeDriver
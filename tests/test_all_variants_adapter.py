@@ -0,0 +1,240 @@
+import logging
+import numpy as np
+import pandas as pd
+import pytest
+from decider_genetics.adapters.all_variants_adapter import AllVariantsAdapter
+from decider_genetics.adapters.cn_genes_adapter import CnGenesAdapter
+from decider_genetics.cli import cn_adapter_args, variant_adapter_args
+
+VARIANT_COLUMNS = ["ID", "patient", "samples", "readCounts", "Gene.MANE"]
+
+
+def _writer(template: str, directory):
+    """
+    Return a function writing tables like the `template` table to
+    `directory`, with the given values of the given columns.
+    """
+    template = pd.read_csv(template, sep="\t", dtype=str, nrows=1)
+
+    def write(name: str, rows: list, columns: list) -> str:
+        frame = pd.concat([template] * len(rows), ignore_index=True)
+        frame[columns] = rows
+        path = directory / name
+        frame.to_csv(path, sep="\t", index=False)
+        return str(path)
+
+    return write
+
+
+@pytest.fixture
+def write_variants(tmp_path):
+    """
+    Write variant tables like the synthetic one, with the variant IDs,
+    patients, samples, read counts and genes of the given rows, or with the
+    given columns.
+    """
+    write = _writer("data/synthetic_variants.csv", tmp_path)
+
+    def write_variants(name: str, rows: list, columns=VARIANT_COLUMNS) -> str:
+        return write(name, rows, columns)
+
+    return write_variants
+
+
+@pytest.fixture
+def write_copy_numbers(tmp_path):
+    """
+    Write a copy number table like the synthetic one, with the gene names,
+    coordinates and patients of the given rows.
+    """
+    write = _writer("data/synthetic_cns.csv", tmp_path)
+
+    def write_copy_numbers(rows: list) -> str:
+        return write(
+            "copy_numbers.tsv", rows, ["Gene", "chr", "start", "end", "sample"]
+        )
+
+    return write_copy_numbers
+
+
+def _adapter(path, copy_numbers=None, **kwargs) -> AllVariantsAdapter:
+    args = variant_adapter_args()
+    if copy_numbers is None:
+        # no positional overlaps, which read the copy number table
+        del args["copy_numbers"]
+    else:
+        args["copy_numbers"] = dict(cn_adapter_args(), path=copy_numbers)
+    return AllVariantsAdapter(**args, path=path, **kwargs)
+
+
+def _edges(adapter: AllVariantsAdapter) -> dict:
+    edges = {}
+    for _, source, target, label, _ in adapter.get_edges():
+        edges.setdefault(label, []).append((source, target))
+    return edges
+
+
+def test_samples_are_paired_with_their_read_counts(write_variants, caplog):
+    path = write_variants(
+        "variants.tsv",
+        [
+            ["v1", "p1", "p1_A;p1_B", "10,1;20,2", "G1"],
+            ["v2", "p1", "p1_A;p1_B", "30,3", "G2"],
+            ["v3", "p2", "p2_A", "40,4;50,5", "G3"],
+        ],
+    )
+    adapter = _adapter(path)
+
+    with caplog.at_level(logging.WARNING):
+        adapter.load()
+
+    pairs = adapter.sample_variants.fillna("")
+    assert list(zip(pairs["ID"], pairs["sample"], pairs["readCounts"])) == [
+        ("v1", "p1_A", "10,1"),
+        ("v1", "p1_B", "20,2"),
+        ("v2", "p1_A", "30,3"),
+        ("v2", "p1_B", ""),
+        ("v3", "p2_A", "40,4"),
+    ]
+    assert "2 of 3 row(s) have a different number of readCounts" in caplog.text
+
+
+def test_edges_are_emitted_once(write_variants):
+    path = write_variants(
+        "variants.tsv",
+        [
+            # two samples of the same patient, and a gene listed twice
+            ["v1", "p1", "p1_A;p1_B", "10,1;20,2", "G1;G1"],
+            ["v2", "p1", "p1_A", "30,3", "G1;G2"],
+        ],
+    )
+
+    edges = _edges(_adapter(path))
+
+    assert sorted(edges["patient_has_variant"]) == [("p1", "v1"), ("p1", "v2")]
+    assert sorted(edges["variant_in_gene"]) == [
+        ("v1", "G1"),
+        ("v2", "G1"),
+        ("v2", "G2"),
+    ]
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_edges_of_variants_in_several_tables_are_emitted_once(
+    write_variants, streaming
+):
+    rows = [
+        ["v1", "p1", "p1_A", "10,1", "G1"],
+        ["v2", "p2", "p2_A", "20,2", "G2"],
+    ]
+    paths = [
+        write_variants("first.tsv", rows),
+        write_variants("second.tsv", rows[::-1]),
+    ]
+
+    edges = _edges(_adapter(paths, streaming=streaming))
+
+    assert sorted(edges["patient_has_variant"]) == [("p1", "v1"), ("p2", "v2")]
+    assert sorted(edges["variant_in_gene"]) == [("v1", "G1"), ("v2", "G2")]
+
+
+def test_variants_are_linked_to_the_genes_containing_them(
+    write_variants, write_copy_numbers
+):
+    copy_numbers = write_copy_numbers(
+        [
+            ["G1", "chr1", "100", "200", "p1"],
+            ["G2", "chr1", "150", "300", "p1"],
+            ["G3", "chr2", "100", "200", "p2"],
+        ]
+    )
+    variants = write_variants(
+        "variants.tsv",
+        [
+            # within G1 and G2, on a chromosome named without prefix
+            ["v1", "p1", "p1_A", "10,1", "NONE", "1", "160"],
+            # the same position in a patient without alterations of G1 or G2
+            ["v2", "p2", "p2_A", "20,2", "NONE", "chr1", "160"],
+            # within G3, which is also annotated
+            ["v3", "p2", "p2_A", "30,3", "G3", "chr2", "200"],
+            # outside of any gene
+            ["v4", "p1", "p1_A", "40,4", "NONE", "chr1", "99"],
+        ],
+        VARIANT_COLUMNS + ["CHROM", "POS"],
+    )
+    alterations = CnGenesAdapter(**cn_adapter_args(), path=copy_numbers)
+    alterations.load()
+    alteration_ids = dict(
+        zip(
+            zip(alterations.variants["sample"], alterations.variants["Gene"]),
+            alterations.variants["VARIANT_ID"],
+        )
+    )
+
+    edges = _edges(_adapter(variants, copy_numbers=copy_numbers))
+
+    assert sorted(edges["variant_in_gene"]) == [
+        ("v1", "G1"),
+        ("v1", "G2"),
+        ("v2", "G1"),
+        ("v2", "G2"),
+        ("v3", "G3"),
+    ]
+    assert sorted(edges["variant_in_copy_number_variant"]) == sorted(
+        [
+            ("v1", alteration_ids["p1", "G1"]),
+            ("v1", alteration_ids["p1", "G2"]),
+            ("v3", alteration_ids["p2", "G3"]),
+        ]
+    )
+
+
+def _sorted(items) -> list:
+    # nodes and edges, whose properties are dicts, in a comparable order
+    return sorted(map(repr, items))
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_tables_read_in_parallel_give_the_output_of_one_table(
+    tmp_path, streaming
+):
+    data = pd.read_csv("data/synthetic_variants.csv", sep="\t", dtype=str)
+    groups = np.array_split(sorted(data["patient"].unique()), 4)
+    for number, patients in enumerate(groups):
+        table = data[data["patient"].isin(patients)]
+        if number == len(groups) - 1:
+            # rows that are also in the other tables
+            table = pd.concat([table, data.iloc[::10]])
+        table.to_csv(tmp_path / f"batch-{number}.tsv", sep="\t", index=False)
+
+    single = _adapter("data/synthetic_variants.csv", streaming=streaming)
+    batches = _adapter(
+        str(tmp_path / "batch-*.tsv"), streaming=streaming, read_workers=3
+    )
+
+    assert batches._inputs == tuple(
+        str(tmp_path / f"batch-{number}.tsv") for number in range(4)
+    )
+    assert _sorted(batches.get_nodes()) == _sorted(single.get_nodes())
+    assert _sorted(batches.get_edges()) == _sorted(single.get_edges())
+
+
+def test_copy_numbers_of_several_tables_are_read_once(tmp_path):
+    data = pd.read_csv("data/synthetic_cns.csv", sep="\t", dtype=str)
+    samples = sorted(data["sample"].unique())
+    # overlapping tables: each has the samples of its neighbour, too
+    for number in range(3):
+        table = data[data["sample"].isin(samples[number * 7 : number * 7 + 9])]
+        table.to_csv(tmp_path / f"batch-{number}.tsv", sep="\t", index=False)
+
+    single = CnGenesAdapter(**cn_adapter_args())
+    batches = CnGenesAdapter(
+        **cn_adapter_args(), path=str(tmp_path / "batch-*.tsv"), read_workers=2
+    )
+    single.load()
+    batches.load()
+
+    assert batches.variants["VARIANT_ID"].is_unique
+    assert batches.genes["Gene"].is_unique
+    assert _sorted(batches.get_nodes()) == _sorted(single.get_nodes())
+    assert _sorted(batches.get_edges()) == _sorted(single.get_edges())
@@ -0,0 +1,60 @@
+import os
+import shutil
+import pytest
+from decider_genetics.adapters.clinical_adapter import ClinicalAdapter
+from decider_genetics.cache import FrameCache
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # the schema and inputs are read relative to the working directory
+    root = os.getcwd()
+    shutil.copytree(os.path.join(root, "config"), tmp_path / "config")
+    os.makedirs(tmp_path / "data")
+    shutil.copy(
+        os.path.join(root, "data", "synthetic_clinical.csv"), tmp_path / "data"
+    )
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def _key(cache: FrameCache, schema: str = "config/schema_config.yaml") -> str:
+    adapter = ClinicalAdapter(cache=cache)
+    return cache.key(
+        adapter, adapter._input_paths(), adapter._selection(), schema
+    )
+
+
+def test_key_depends_on_schema(workdir):
+    cache = FrameCache(str(workdir / "cache"))
+    before = _key(cache)
+    assert _key(cache) == before
+
+    schema = workdir / "config" / "schema_config.yaml"
+    schema.write_text(
+        schema.read_text().replace("hr_deficient: bool", "hr_deficient: str")
+    )
+
+    assert _key(cache) != before
+
+
+def test_key_depends_on_the_schema_in_use(workdir):
+    cache = FrameCache(str(workdir / "cache"))
+    other = workdir / "other_schema.yaml"
+    other.write_text(
+        (workdir / "config" / "schema_config.yaml")
+        .read_text()
+        .replace("hr_deficient: bool", "hr_deficient: str")
+    )
+
+    assert _key(cache, str(other)) != _key(cache)
+
+
+def test_key_depends_on_inputs(workdir):
+    cache = FrameCache(str(workdir / "cache"))
+    before = _key(cache)
+
+    with open(workdir / "data" / "synthetic_clinical.csv", "a") as f:
+        f.write("patient99;50;20;IIIC;PDS;6.0;No;No;PR;No;HRD negative\n")
+
+    assert _key(cache) != before
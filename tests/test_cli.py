@@ -0,0 +1,197 @@
+import logging
+import pytest
+from decider_genetics import cli
+from decider_genetics.adapters.all_variants_adapter import AllVariantsAdapter
+from decider_genetics.parts import open_part, part_files
+from decider_genetics.schema import schema_config_path
+
+
+def _build(
+    config: str, directory, *options, adapters=("variants", "copy_numbers")
+) -> None:
+    cli.main(
+        [
+            "--adapters",
+            *adapters,
+            "--config",
+            config,
+            "--output-dir",
+            str(directory),
+            "--no-cache",
+            "--workers",
+            "1",
+            *options,
+        ]
+    )
+
+
+def _rows(directory, label: str) -> list:
+    rows = []
+    for part in part_files(str(directory), label):
+        with open_part(part) as f:
+            rows.extend(f)
+    return rows
+
+
+def test_streaming_options_reach_the_variant_adapter():
+    jobs = cli.adapter_jobs(
+        ["variants", "clinical"], {}, streaming=True, memory_budget=1024
+    )
+
+    variants, clinical = jobs
+    assert variants.kwargs["streaming"] is True
+    assert variants.kwargs["memory_budget"] == 1024
+    assert "streaming" not in clinical.kwargs
+
+
+def test_streaming_build_writes_the_same_output(
+    biocypher_config, tmp_path, monkeypatch
+):
+    created = []
+    init = AllVariantsAdapter.__init__
+
+    def record(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        created.append(self)
+
+    monkeypatch.setattr(AllVariantsAdapter, "__init__", record)
+
+    _build(biocypher_config, tmp_path / "held")
+    # a budget of 1 MiB streams the synthetic variants in several chunks
+    _build(
+        biocypher_config,
+        tmp_path / "streamed",
+        "--streaming",
+        "--memory-budget",
+        "1",
+    )
+
+    assert [adapter.streaming for adapter in created] == [False, True]
+    assert created[1].memory_budget == 1024**2
+    for label in ["SequenceVariant", "PatientToSequenceVariantAssociation"]:
+        assert _rows(tmp_path / "streamed", label) == _rows(
+            tmp_path / "held", label
+        )
+
+
+def test_memory_budget_requires_streaming(capsys):
+    with pytest.raises(SystemExit):
+        cli.main(["--memory-budget", "512"])
+    assert "--memory-budget requires --streaming" in capsys.readouterr().err
+
+
+def test_adapters_read_the_schema_of_the_config(biocypher_config, tmp_path):
+    # a schema outside the working directory, without the CADD score
+    schema = tmp_path / "schema_config.yaml"
+    with open("config/schema_config.yaml", encoding="utf-8") as f:
+        schema.write_text(f.read().replace("        CADD_phred: float\n", ""))
+    config = tmp_path / "other_config.yaml"
+    with open(biocypher_config, encoding="utf-8") as f:
+        config.write_text(
+            f.read().replace("config/schema_config.yaml", str(schema))
+        )
+
+    assert schema_config_path(str(config)) == str(schema)
+    (job,) = cli.adapter_jobs(
+        ["variants"], {}, schema_config_path=schema_config_path(str(config))
+    )
+    adapter = job.adapter_class(**job.kwargs)
+
+    assert adapter.schema_config_path == str(schema)
+    assert "CADD_phred" not in adapter._columns
+    assert (
+        "CADD_phred"
+        in AllVariantsAdapter(**cli.variant_adapter_args())._columns
+    )
+
+
+def _import_call(directory) -> str:
+    with open(directory / "neo4j-admin-import-call.sh", encoding="utf-8") as f:
+        return f.read()
+
+
+def _dangling_edges(directory) -> list:
+    """
+    Return the edges of an import set whose source or target is not among its
+    nodes, which neo4j-admin fails on unless told to skip them.
+    """
+    nodes, edges = set(), []
+    for header in directory.glob("*-header.csv"):
+        columns = header.read_text().strip().split("\t")
+        label = header.name[: -len("-header.csv")]
+        for row in _rows(directory, label):
+            values = [
+                value.strip("'") for value in row.rstrip("\n").split("\t")
+            ]
+            if ":ID" in columns:
+                nodes.add(values[columns.index(":ID")])
+            elif ":START_ID" in columns:
+                edges.append(
+                    (
+                        values[columns.index(":START_ID")],
+                        values[columns.index(":END_ID")],
+                    )
+                )
+    return [edge for edge in edges if not set(edge) <= nodes]
+
+
+def test_subset_build_imports_without_skipping(biocypher_config, tmp_path):
+    # the variants point to genes only the copy number adapter emits
+    _build(biocypher_config, tmp_path / "subset", adapters=["variants"])
+
+    assert _dangling_edges(tmp_path / "subset") == []
+    assert "--skip-bad-relationships" not in _import_call(tmp_path / "subset")
+
+
+def test_kept_dangling_edges_are_skipped_on_import(biocypher_config, tmp_path):
+    _build(
+        biocypher_config,
+        tmp_path / "kept",
+        "--keep-dangling",
+        adapters=["variants"],
+    )
+
+    assert _dangling_edges(tmp_path / "kept")
+    assert "--skip-bad-relationships=true" in _import_call(tmp_path / "kept")
+
+
+def _files(directory) -> dict:
+    """
+    Return the header and the sorted rows of each label of an import set.
+    """
+    return {
+        header.name: (header.read_text(), sorted(_rows(directory, label)))
+        for header in directory.glob("*-header.csv")
+        for label in [header.name[: -len("-header.csv")]]
+    }
+
+
+def test_columnar_build_writes_the_same_output(biocypher_config, tmp_path):
+    # the same synthetic clinical data in both builds
+    options = ["--seed", "0"]
+    adapters = cli.ADAPTERS
+    _build(biocypher_config, tmp_path / "columnar", *options, adapters=adapters)
+    _build(
+        biocypher_config,
+        tmp_path / "tuples",
+        *options,
+        "--no-columnar",
+        adapters=adapters,
+    )
+
+    columnar = _files(tmp_path / "columnar")
+    assert "SequenceVariant-header.csv" in columnar
+    # booleans in the spelling BioCypher was always given
+    patients = "".join(columnar["Patient-header.csv"][1])
+    assert "\ttrue\t" in patients and "\tTrue\t" not in patients
+    assert columnar == _files(tmp_path / "tuples")
+
+
+def test_headers_and_import_call_are_written_once(
+    biocypher_config, tmp_path, caplog
+):
+    with caplog.at_level(logging.INFO):
+        _build(biocypher_config, tmp_path / "build")
+
+    assert "already exists. Overwriting" not in caplog.text
+    assert caplog.text.count("import call to") == 1
@@ -0,0 +1,73 @@
+import pandas as pd
+from decider_genetics.adapters.clinical_adapter import ClinicalAdapter
+
+HEADER = (
+    "Patient;Age;BMI;Stage;Treatment;Chemotherapy cycles;Maintenance;PARPi;"
+    "Primary outcome;BRCA mutation;HR deficient"
+)
+
+
+def _properties(path) -> dict:
+    adapter = ClinicalAdapter(path=str(path), seed=0)
+    return {_id: properties for _id, _, properties in adapter.get_nodes()}
+
+
+def test_flags_default_to_false(tmp_path):
+    path = tmp_path / "clinical.csv"
+    path.write_text(
+        "\n".join(
+            [
+                HEADER,
+                "p1;72;21,5;IVB;PDS;6.0;No;Yes;PR;Yes;HRD positive",
+                "p2;64;28,6;IIB;PDS;6.0;;No;PR;No;HRD negative",
+                "p3;55;;IIIC;NACT;;;;PR;;",
+                "p4;60;24;IIIC;NACT;3.0;;ND;PR;unknown;Insuff material",
+            ]
+        )
+        + "\n"
+    )
+
+    properties = _properties(path)
+
+    flags = ["parpi", "brca_mutation", "hr_deficient"]
+    assert {
+        patient: [properties[patient][flag] for flag in flags]
+        for patient in properties
+    } == {
+        "p1": ["true", "true", "true"],
+        "p2": ["false", "false", "false"],
+        "p3": ["false", "false", "false"],
+        "p4": ["false", "false", "false"],
+    }
+    assert properties["p1"]["bmi"] == 21.5
+    assert properties["p3"]["chemotherapy_cycles"] is None
+
+
+def test_flags_match_the_yes_no_columns():
+    # the flags of the synthetic data are the ones the adapter always wrote:
+    # only "yes" and a positive HRD test are true, spelled in lower case
+    raw = pd.read_csv("data/synthetic_clinical.csv", sep=";")
+    expected = {
+        patient: [
+            str(str(parpi).lower() == "yes").lower(),
+            str(str(brca).lower() == "yes").lower(),
+            str(str(hrd).lower() == "hrd positive").lower(),
+        ]
+        for patient, parpi, brca, hrd in zip(
+            raw["Patient"],
+            raw["PARPi"],
+            raw["BRCA mutation"],
+            raw["HR deficient"],
+        )
+    }
+
+    properties = _properties("data/synthetic_clinical.csv")
+
+    assert {
+        patient: [
+            properties[patient]["parpi"],
+            properties[patient]["brca_mutation"],
+            properties[patient]["hr_deficient"],
+        ]
+        for patient in properties
+    } == expected
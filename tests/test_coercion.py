@@ -0,0 +1,34 @@
+import pandas as pd
+from decider_genetics.coercion import coerce_properties, emitted_values
+
+SCHEMA = "config/schema_config.yaml"
+
+
+def test_missing_spellings_only_apply_to_numbers_and_booleans():
+    frame = pd.DataFrame(
+        {
+            "age": ["56", "nd", "-"],
+            "parpi": ["Yes", "ND", "no"],
+            "stage": ["IVB", "nd", "-"],
+            "primary_outcome": ["-", "NA", "Complete Response"],
+        }
+    )
+
+    coerced = coerce_properties(frame, "patient", SCHEMA)
+
+    assert coerced["age"].tolist() == [56, pd.NA, pd.NA]
+    assert coerced["parpi"].tolist() == [True, pd.NA, False]
+    # text properties are written as they are
+    assert coerced["stage"].tolist() == ["IVB", "nd", "-"]
+    assert coerced["primary_outcome"].tolist() == [
+        "-",
+        "NA",
+        "Complete Response",
+    ]
+
+
+def test_booleans_are_emitted_in_lower_case():
+    flags = pd.Series([True, None, False], dtype="boolean")
+
+    assert emitted_values(flags) == ["true", None, "false"]
+    assert emitted_values(pd.Series([False, True])) == ["false", "true"]
@@ -0,0 +1,191 @@
+import json
+import shutil
+import time
+import pytest
+from decider_genetics.cli import main
+from decider_genetics.delta import (
+    ENTITY_INDEX,
+    DeltaImport,
+    entity_index,
+    read_entity_index,
+    write_entity_index,
+)
+from decider_genetics.manifest import MANIFEST_NAME
+
+
+def _build(config: str, directory) -> dict:
+    """
+    Build the clinical and copy number adapters reproducibly and return the
+    bytes of the entity index and the manifest.
+    """
+    main(
+        [
+            "--adapters",
+            "clinical",
+            "copy_numbers",
+            "--config",
+            config,
+            "--output-dir",
+            str(directory),
+            "--reproducible",
+            "--no-cache",
+            "--workers",
+            "1",
+        ]
+    )
+    return {
+        name: (directory / name).read_bytes()
+        for name in [ENTITY_INDEX, MANIFEST_NAME]
+    }
+
+
+def test_reproducible_builds_are_identical(biocypher_config, tmp_path):
+    # the paths of the output directory are part of the import call
+    directory = tmp_path / "out"
+    first = _build(biocypher_config, directory)
+
+    shutil.rmtree(directory)
+    # gzip timestamps have a resolution of a second
+    time.sleep(1.1)
+    second = _build(biocypher_config, directory)
+
+    assert first == second
+    assert ENTITY_INDEX in json.loads(second[MANIFEST_NAME])["files"]
+
+
+PATIENT_HEADER = ":ID\tname\tage:long\t:LABEL"
+GENE_HEADER = ":ID\tname\t:LABEL"
+EDGE_HEADER = ":START_ID\tid\t:END_ID\t:TYPE"
+
+
+def _write(directory, label: str, header: str, rows: list) -> None:
+    directory.mkdir(exist_ok=True)
+    (directory / f"{label}-header.csv").write_text(header)
+    (directory / f"{label}-part000.csv").write_text(
+        "".join("\t".join(row) + "\n" for row in rows)
+    )
+
+
+def _patient(_id: str, age: str) -> list:
+    return [_id, f"'{_id.upper()}'", age, "'Entity|Patient'"]
+
+
+def _output(directory, patients: list, edges: list) -> None:
+    _write(directory, "Patient", PATIENT_HEADER, patients)
+    _write(directory, "Gene", GENE_HEADER, [["g1", "'G1'", "'Entity|Gene'"]])
+    _write(
+        directory,
+        "Mutation",
+        EDGE_HEADER,
+        [[source, _id, target, "Mutation"] for source, _id, target in edges],
+    )
+
+
+@pytest.fixture
+def builds(tmp_path) -> tuple:
+    previous, current = tmp_path / "previous", tmp_path / "current"
+    _output(
+        previous,
+        [_patient("p1", "70"), _patient("p2", "60"), _patient("p3", "50")],
+        [("p1", "e1", "g1"), ("p2", "e2", "g1")],
+    )
+    # p1 changed, p3 removed and p4 added, with their edges
+    _output(
+        current,
+        [_patient("p1", "71"), _patient("p2", "60"), _patient("p4", "40")],
+        [("p1", "e1", "g1"), ("p4", "e4", "g1")],
+    )
+    return previous, current
+
+
+def test_delta_detects_added_changed_and_removed_entities(
+    biocypher_config, builds
+):
+    previous, current = builds
+
+    delta = DeltaImport(
+        str(current),
+        read_entity_index(str(previous), biocypher_config),
+        biocypher_config,
+    ).run()
+
+    assert delta.summary() == {
+        "added": {"Mutation": 1, "Patient": 1},
+        "changed": {"Patient": 1},
+        "removed": {"Mutation": 1, "Patient": 1},
+    }
+
+
+def test_delta_statements_remove_before_they_merge(
+    biocypher_config, builds, fake_driver
+):
+    previous, current = builds
+    delta = DeltaImport(
+        str(current),
+        read_entity_index(str(previous), biocypher_config),
+        biocypher_config,
+        batch_size=1,
+    )
+
+    statements = list(delta.statements())
+
+    assert statements == [
+        (
+            "UNWIND $rows AS row "
+            "MATCH (a:`Patient` {id: row.source})-[r:`Mutation`]->"
+            "(b:`Gene` {id: row.target}) "
+            "WHERE row.id IS NULL OR r.id = row.id DELETE r",
+            {"rows": [{"source": "p2", "target": "g1", "id": "e2"}]},
+        ),
+        (
+            "UNWIND $rows AS row "
+            "MATCH (n:`Patient` {id: row.id}) DETACH DELETE n",
+            {"rows": [{"id": "p3"}]},
+        ),
+        (
+            "UNWIND $rows AS row MERGE (n:`Patient` {id: row.id}) "
+            "SET n = row.properties, n:`Entity`:`Patient`",
+            {"rows": [{"id": "p1", "properties": {"name": "P1", "age": 71}}]},
+        ),
+        (
+            "UNWIND $rows AS row MERGE (n:`Patient` {id: row.id}) "
+            "SET n = row.properties, n:`Entity`:`Patient`",
+            {"rows": [{"id": "p4", "properties": {"name": "P4", "age": 40}}]},
+        ),
+        (
+            "UNWIND $rows AS row "
+            "MATCH (a:`Patient` {id: row.source}) "
+            "MATCH (b:`Gene` {id: row.target}) "
+            "MERGE (a)-[r:`Mutation` {id: row.id}]->(b) SET r = row.properties",
+            {
+                "rows": [
+                    {
+                        "source": "p4",
+                        "target": "g1",
+                        "id": "e4",
+                        "properties": {"id": "e4"},
+                    }
+                ]
+            },
+        ),
+    ]
+
+    driver = fake_driver()
+    assert delta.apply(driver) == len(statements)
+    assert driver.statements == statements
+
+
+def test_delta_against_its_own_index_is_empty(biocypher_config, builds):
+    _, current = builds
+    write_entity_index(
+        str(current), entity_index(str(current), biocypher_config)
+    )
+
+    delta = DeltaImport(
+        str(current),
+        read_entity_index(str(current), biocypher_config),
+        biocypher_config,
+    ).run()
+
+    assert list(delta.statements()) == []
+    assert delta.summary() == {"added": {}, "changed": {}, "removed": {}}
@@ -0,0 +1,94 @@
+import pandas as pd
+import pytest
+from decider_genetics.genes import GeneIndex
+
+
+@pytest.fixture
+def index() -> GeneIndex:
+    aliases = pd.DataFrame(
+        {
+            "symbol": ["BRCA1", "TP53", "KRAS"],
+            "alias_symbol": ["RNF53|BRCC1", "P53", "RNF53"],
+            "prev_symbol": ["", "", ""],
+            "ensembl_gene_id": ["", "ENSG00000141510", ""],
+        }
+    )
+    return GeneIndex(
+        ["BRCA1", "TP53", "KRAS"],
+        ["ENSG00000012048", "ENSG00000141510", "ENSG00000133703"],
+        aliases,
+    )
+
+
+def _edges(genes: list) -> pd.DataFrame:
+    return pd.DataFrame(
+        {"variant": [f"v{i}" for i in range(len(genes))], "Gene": genes}
+    )
+
+
+def test_names_resolve_to_gene_symbols(index):
+    edges = _edges(
+        [
+            "BRCA1",  # symbol
+            "kras",  # symbol in another case
+            "ENSG00000141510.17",  # Ensembl ID with version
+            "P53",  # alias
+            "RNF53",  # alias of two genes
+            "NOPE",  # unknown
+        ]
+    )
+
+    resolved = index.resolve_frame(edges, "Gene", "variant_in_gene")
+
+    assert resolved["variant"].tolist() == ["v0", "v1", "v2", "v3"]
+    assert resolved["Gene"].astype(str).tolist() == [
+        "BRCA1",
+        "KRAS",
+        "TP53",
+        "TP53",
+    ]
+    assert index.ambiguous == 1
+
+
+def test_unresolved_names_are_kept_unless_dropped(index):
+    index.drop_unresolved = False
+
+    resolved = index.resolve_frame(
+        _edges(["ENSG00000133703", "NOPE"]), "Gene", "variant_in_gene"
+    )
+
+    assert resolved["Gene"].tolist() == ["KRAS", "NOPE"]
+
+
+def test_summary_counts_distinct_edges_of_all_resolvers(index):
+    # the same edges, resolved by two shards of a build
+    first, second = index.resolver(), index.resolver()
+    first.resolve_frame(_edges(["BRCA1", "NOPE", "NOPE"]), "Gene", "gene")
+    second.resolve_frame(_edges(["BRCA1", "NOPE", "TP53"]), "Gene", "gene")
+    second.resolve_frame(_edges(["BRCA1"]), "Gene", None)
+    index.absorb("variants", first)
+    index.absorb("variants", second)
+
+    summary = index.summary()
+
+    assert summary["genes"] == 3
+    assert summary["ambiguous_names"] == 1
+    # (v0, BRCA1), (v1, NOPE), (v2, NOPE) and (v2, TP53)
+    assert summary["adapters"] == {
+        "variants": {
+            "gene": {"edges": 4, "unresolved": 2, "examples": ["NOPE"]}
+        }
+    }
+
+
+def test_summary_is_logged(index, caplog):
+    resolver = index.resolver()
+    resolver.resolve_frame(_edges(["NOPE", "BRCA1"]), "Gene", "gene")
+    index.absorb("oncokb", resolver)
+
+    index.log_summary()
+
+    assert (
+        "1 of 2 gene edge(s) of oncokb name genes that are not in the gene "
+        "index, e.g. NOPE; they were dropped." in caplog.text
+    )
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+from decider_genetics.ids import hash_columns, hash_pairs
+
+
+def test_numbers_hash_alike_whatever_their_dtype():
+    names = ["a", "b", "c"]
+    frames = [
+        pd.DataFrame({"n": [1, 2, 3], "name": names}),
+        pd.DataFrame({"n": [1.0, 2.0, 3.0], "name": names}),
+        pd.DataFrame({"n": pd.array([1, 2, 3], dtype="Int64"), "name": names}),
+        pd.DataFrame({"n": ["1", "2", "3"], "name": names}),
+    ]
+
+    ids = [hash_columns(frame).tolist() for frame in frames]
+
+    assert all(other == ids[0] for other in ids[1:])
+
+
+def test_floats_with_missing_values_hash_like_integers():
+    # a column with a missing value is parsed as floats
+    floats = pd.DataFrame({"n": [1.0, np.nan, -3.0]})
+    integers = pd.DataFrame({"n": pd.array([1, None, -3], dtype="Int64")})
+
+    assert hash_columns(floats).tolist() == hash_columns(integers).tolist()
+
+
+def test_fractional_floats_keep_their_value():
+    ids = hash_columns(pd.DataFrame({"n": [1.5, 1.0, 1.25, 1]}))
+
+    assert ids.nunique() == 3
+    assert ids[1] == ids[3]
+
+
+def test_ids_do_not_depend_on_the_index():
+    frame = pd.DataFrame({"source": ["a", "b"], "target": ["c", "d"]})
+    shifted = frame.set_axis([10, 20])
+
+    assert (
+        hash_pairs(frame["source"], frame["target"]).tolist()
+        == hash_pairs(shifted["source"], shifted["target"]).tolist()
+    )
@@ -0,0 +1,57 @@
+import os
+from decider_genetics.indexes import (
+    INDEX_SCRIPT,
+    constraint_query,
+    index_statements,
+    write_index_script,
+)
+
+SCHEMA = os.path.join(os.path.dirname(__file__), "data", "schema_config.yaml")
+
+
+def test_statements_follow_the_schema():
+    assert index_statements(SCHEMA) == [
+        "CREATE CONSTRAINT `Gene_id` IF NOT EXISTS "
+        "FOR (n:`Gene`) REQUIRE n.id IS UNIQUE",
+        "CREATE CONSTRAINT `Patient_id` IF NOT EXISTS "
+        "FOR (n:`Patient`) REQUIRE n.id IS UNIQUE",
+        "CREATE CONSTRAINT `SequenceVariant_id` IF NOT EXISTS "
+        "FOR (n:`SequenceVariant`) REQUIRE n.id IS UNIQUE",
+        "CREATE INDEX `GeneIsDruggable_level` IF NOT EXISTS "
+        "FOR ()-[r:`GeneIsDruggable`]-() ON (r.`level`)",
+        "CREATE INDEX `Gene_chr` IF NOT EXISTS " "FOR (n:`Gene`) ON (n.`chr`)",
+        "CREATE INDEX `Gene_name` IF NOT EXISTS "
+        "FOR (n:`Gene`) ON (n.`name`)",
+        "CREATE INDEX `SequenceVariant_CLNSIG` IF NOT EXISTS "
+        "FOR (n:`SequenceVariant`) ON (n.`CLNSIG`)",
+    ]
+
+
+def test_only_the_given_properties_are_indexed():
+    statements = index_statements(SCHEMA, ["start", "alteration"])
+
+    assert [s for s in statements if s.startswith("CREATE INDEX")] == [
+        "CREATE INDEX `GeneIsDruggable_alteration` IF NOT EXISTS "
+        "FOR ()-[r:`GeneIsDruggable`]-() ON (r.`alteration`)",
+        "CREATE INDEX `Gene_start` IF NOT EXISTS "
+        "FOR (n:`Gene`) ON (n.`start`)",
+    ]
+
+
+def test_names_are_quoted():
+    assert constraint_query("Odd`Label") == (
+        "CREATE CONSTRAINT `Odd``Label_id` IF NOT EXISTS "
+        "FOR (n:`Odd``Label`) REQUIRE n.id IS UNIQUE"
+    )
+
+
+def test_script_waits_for_the_indexes(tmp_path):
+    path = write_index_script(str(tmp_path), SCHEMA, ["name"])
+
+    assert path == str(tmp_path / INDEX_SCRIPT)
+    with open(path, encoding="utf-8") as f:
+        lines = [line for line in f.read().splitlines() if line[:2] != "//"]
+    assert lines == [
+        *(f"{statement};" for statement in index_statements(SCHEMA, ["name"])),
+        "CALL db.awaitIndexes(600);",
+    ]
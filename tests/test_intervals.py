@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+from decider_genetics.intervals import IntervalIndex
+
+
+def _brute_force(intervals: pd.DataFrame, positions: pd.DataFrame) -> list:
+    """
+    Pairs of position row and interval row by comparing every position with
+    every interval.
+    """
+
+    def name(chromosome):
+        return str(chromosome).upper().removeprefix("CHR")
+
+    pairs = []
+    for query, (chromosome, position) in enumerate(positions.to_numpy()):
+        if pd.isna(chromosome) or pd.isna(position):
+            continue
+        for row, (other, start, end) in enumerate(intervals.to_numpy()):
+            if pd.isna(other) or pd.isna(start) or pd.isna(end):
+                continue
+            if name(chromosome) == name(other) and start <= position <= end:
+                pairs.append((query, row))
+    return pairs
+
+
+def _overlaps(intervals: pd.DataFrame, positions: pd.DataFrame) -> list:
+    index = IntervalIndex(
+        intervals["chr"], intervals["start"], intervals["end"]
+    )
+    queries, hits = index.overlaps(positions["chr"], positions["pos"])
+    return list(zip(queries.tolist(), hits.tolist()))
+
+
+def test_nested_intervals_are_found_behind_longer_ones():
+    # the long first interval keeps the running maximum of the ends above
+    # the short ones it contains, so they must still be scanned
+    intervals = pd.DataFrame(
+        {
+            "chr": ["1", "1", "1", "1"],
+            "start": [0, 10, 30, 35],
+            "end": [100, 20, 40, 36],
+        }
+    )
+    positions = pd.DataFrame({"chr": ["1"] * 5, "pos": [5, 15, 25, 35, 101]})
+
+    assert _overlaps(intervals, positions) == [
+        (0, 0),
+        (1, 0),
+        (1, 1),
+        (2, 0),
+        (3, 0),
+        (3, 2),
+        (3, 3),
+    ]
+
+
+def test_chromosome_names_match_with_and_without_prefix():
+    intervals = pd.DataFrame(
+        {"chr": ["chr1", "X", "chrY"], "start": [1, 1, 1], "end": [9, 9, 9]}
+    )
+    positions = pd.DataFrame(
+        {"chr": ["1", "chrX", "y", "chr2"], "pos": [5, 5, 5, 5]}
+    )
+
+    assert _overlaps(intervals, positions) == [(0, 0), (1, 1), (2, 2)]
+
+
+def test_missing_coordinates_are_ignored():
+    intervals = pd.DataFrame(
+        {
+            "chr": ["1", None, "1", "1", "1"],
+            "start": ["1", "1", None, "1", "."],
+            "end": ["9", "9", "9", None, "9"],
+        }
+    )
+    positions = pd.DataFrame(
+        {"chr": ["1", None, "1", "1"], "pos": ["5", "5", None, "."]}
+    )
+
+    assert _overlaps(intervals, positions) == [(0, 0)]
+    assert len(IntervalIndex(*(intervals[c] for c in intervals))) == 1
+
+
+def test_empty_index_finds_nothing():
+    index = IntervalIndex([], [], [])
+    queries, hits = index.overlaps(["1"], [5])
+
+    assert len(index) == 0
+    assert len(queries) == len(hits) == 0
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_overlaps_match_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    chromosomes = np.array(["1", "chr1", "2", "chrX", None], dtype=object)
+
+    starts = rng.integers(0, 1000, 60).astype(float)
+    # mostly short intervals and a few long ones that contain them
+    lengths = np.where(rng.random(60) < 0.1, 500, rng.integers(0, 50, 60))
+    starts[rng.random(60) < 0.05] = np.nan
+    intervals = pd.DataFrame(
+        {
+            "chr": rng.choice(chromosomes, 60),
+            "start": starts,
+            "end": starts + lengths,
+        }
+    )
+    positions = pd.DataFrame(
+        {
+            "chr": rng.choice(chromosomes, 200),
+            "pos": rng.integers(0, 1500, 200),
+        }
+    )
+
+    assert _overlaps(intervals, positions) == _brute_force(intervals, positions)
@@ -0,0 +1,168 @@
+import importlib.util
+import math
+import os
+import pytest
+from biocypher import BioCypher
+from neo4j.exceptions import TransientError
+from decider_genetics.online import OnlineIngestor
+
+
+@pytest.fixture
+def bc(biocypher_config, tmp_path) -> BioCypher:
+    return BioCypher(
+        biocypher_config_path=biocypher_config,
+        output_directory=str(tmp_path / "out"),
+    )
+
+
+def _batches(driver, keyword: str) -> list:
+    return [
+        (query, parameters["rows"])
+        for query, parameters in driver.statements
+        if parameters is not None and keyword in query
+    ]
+
+
+def test_nodes_are_merged_in_batches(bc, fake_driver):
+    driver = fake_driver()
+    nodes = [
+        (f"patient{i}", "patient", {"age": 60 + i, "bmi": "NaN", "x": 1})
+        for i in range(1, 4)
+    ]
+
+    with OnlineIngestor(driver, bc, batch_size=2, concurrency=1) as ingestor:
+        assert ingestor.write_nodes(nodes) == 3
+
+    # the constraint comes first, without parameters
+    query, parameters = driver.statements[0]
+    assert query.startswith("CREATE CONSTRAINT `Patient_id` IF NOT EXISTS")
+    assert parameters is None
+
+    batches = _batches(driver, "MERGE")
+    assert [len(rows) for _, rows in batches] == [2, 1]
+    query = batches[0][0]
+    assert query.startswith(
+        "UNWIND $rows AS row MERGE (n:`Patient` {id: row.id}) "
+        "SET n += row.properties, n:`BiologicalEntity`"
+    )
+    assert all(query == other for other, _ in batches)
+
+    row = batches[0][1][0]
+    assert row["id"] == "patient1"
+    properties = row["properties"]
+    # properties outside the schema are left out, floats are converted
+    assert "x" not in properties
+    assert properties["age"] == 61
+    assert math.isnan(properties["bmi"])
+    assert properties["id"] == "patient1"
+    assert properties["preferred_id"] == "id"
+    assert ingestor.summary()["nodes"] == {"Patient": 3}
+    assert ingestor.batches == 2
+
+
+def test_edges_are_merged_between_their_classes(bc, fake_driver):
+    driver = fake_driver()
+    edges = [
+        ("e1", "v1", "BRCA1", "variant_in_gene", {}),
+        (None, "v2", "BRCA2", "variant_in_gene", {}),
+        ("e3", "v3", None, "variant_in_gene", {}),
+        ("e4", "v4", "TP53", "unknown_label", {}),
+    ]
+
+    with OnlineIngestor(driver, bc, concurrency=1) as ingestor:
+        assert ingestor.write_edges(edges) == 2
+
+    batches = dict(_batches(driver, "MATCH"))
+    match = (
+        "UNWIND $rows AS row "
+        "MATCH (a:`SequenceVariant` {id: row.source}) "
+        "MATCH (b:`Gene` {id: row.target}) "
+    )
+    with_id = (
+        match + "MERGE (a)-[r:`SequenceVariantToGeneAssociation` {id: row.id}]"
+        "->(b) SET r += row.properties"
+    )
+    without_id = (
+        match + "MERGE (a)-[r:`SequenceVariantToGeneAssociation`]->(b) "
+        "SET r += row.properties"
+    )
+    assert batches[with_id] == [
+        {
+            "source": "v1",
+            "target": "BRCA1",
+            "id": "e1",
+            "properties": {"id": "e1"},
+        }
+    ]
+    assert batches[without_id] == [
+        {"source": "v2", "target": "BRCA2", "id": None, "properties": {}}
+    ]
+    assert ingestor.summary()["skipped"] == {
+        "unknown_label": 1,
+        "variant_in_gene": 1,
+    }
+
+
+def test_transient_errors_are_retried(bc, fake_driver):
+    driver = fake_driver(failures=2, error=TransientError("deadlock"))
+
+    with OnlineIngestor(
+        driver,
+        bc,
+        concurrency=1,
+        retry_delay=0,
+        create_constraints=False,
+    ) as ingestor:
+        ingestor.write_nodes([("patient1", "patient", {})])
+
+    assert len(_batches(driver, "MERGE")) == 1
+    assert ingestor.retries == 2
+    assert ingestor.batches == 1
+
+
+def test_retries_are_limited(bc, fake_driver):
+    driver = fake_driver(failures=3, error=TransientError("deadlock"))
+    ingestor = OnlineIngestor(
+        driver,
+        bc,
+        concurrency=1,
+        max_retries=2,
+        retry_delay=0,
+        create_constraints=False,
+    )
+
+    with pytest.raises(TransientError):
+        with ingestor:
+            ingestor.write_nodes([("patient1", "patient", {})])
+            ingestor.flush()
+
+
+def _load_benchmark():
+    # the benchmarks are scripts, not a package
+    path = os.path.join(
+        os.path.dirname(__file__), "..", "benchmarks", "benchmark_online.py"
+    )
+    spec = importlib.util.spec_from_file_location("benchmark_online", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_concurrent_transactions_raise_throughput(bc):
+    run = _load_benchmark().run
+
+    nodes = [(f"patient{i}", "patient", {"age": 60}) for i in range(80)]
+    # a round trip much longer than the time to build a batch
+    options = {"latency": 0.02, "row_seconds": 0, "pool_size": 4}
+
+    serial, concurrent = (
+        run(bc, nodes, [], 10, concurrency, options) for concurrency in (1, 4)
+    )
+
+    for result in (serial, concurrent):
+        assert result["rows"] == 80
+        assert result["batches"] == 8
+        assert result["rows_per_second"] == pytest.approx(
+            80 / result["seconds"], rel=0.05
+        )
+    assert concurrent["seconds"] < serial["seconds"] / 2
@@ -0,0 +1,124 @@
+import gzip
+import pandas as pd
+import pytest
+from decider_genetics.adapters.pandas_adapter import PandasAdapter
+
+LABELS = "BiologicalEntity|BiologicalProcess|NamedThing"
+
+
+def _process(name: str) -> str:
+    process = f"{name}:biological_process"
+    return f"{process};'{process}';'id';{LABELS}"
+
+
+def _association(gene: str, process: str) -> str:
+    return f"{gene}:gene_hugo;{process}:biological_process;GeneToProcess"
+
+
+@pytest.fixture
+def export(tmp_path):
+    """
+    An oncodashkb export whose processes and associations are split into
+    part files, plain and gzipped, that share some of their rows.
+    """
+
+    def write(name: str, lines: list):
+        text = "".join(line + "\n" for line in lines)
+        if name.endswith(".gz"):
+            with gzip.open(tmp_path / name, "wt") as file:
+                file.write(text)
+        else:
+            (tmp_path / name).write_text(text)
+
+    write(
+        "BiologicalProcess-part000.csv",
+        [_process("None"), _process("DNA repair"), _process("apoptosis")],
+    )
+    write(
+        "BiologicalProcess-part001.csv.gz",
+        [_process("apoptosis"), _process("cell cycle")],
+    )
+    write(
+        "GeneToBiologicalProcess-part000.csv",
+        [
+            _association("FANCA", "None"),
+            _association("FANCA", "DNA repair"),
+            _association("TP53", "apoptosis"),
+        ],
+    )
+    # numbered after part001, though it sorts before it as text
+    write(
+        "GeneToBiologicalProcess-part010.csv",
+        [_association("TP53", "cell cycle")],
+    )
+    write(
+        "GeneToBiologicalProcess-part001.csv.gz",
+        [
+            _association("TP53", "apoptosis"),
+            _association("BRCA1", "DNA repair"),
+        ],
+    )
+    return tmp_path
+
+
+def test_part_files_are_read_in_order(export):
+    adapter = PandasAdapter(path=str(export), read_workers=2)
+
+    assert [path.rsplit("/", 1)[1] for path in adapter._inputs] == [
+        "BiologicalProcess-part000.csv",
+        "BiologicalProcess-part001.csv.gz",
+        "GeneToBiologicalProcess-part000.csv",
+        "GeneToBiologicalProcess-part001.csv.gz",
+        "GeneToBiologicalProcess-part010.csv",
+    ]
+
+
+def test_ids_are_stripped_and_read_once(export):
+    adapter = PandasAdapter(path=str(export), read_workers=2)
+    adapter.load()
+
+    assert isinstance(adapter.nodes["id"].dtype, pd.CategoricalDtype)
+    assert isinstance(adapter.edges["Gene"].dtype, pd.CategoricalDtype)
+    assert adapter.nodes["id"].tolist() == [
+        "DNA repair",
+        "apoptosis",
+        "cell cycle",
+    ]
+    assert list(
+        zip(adapter.edges["Gene"], adapter.edges["BiologicalProcess"])
+    ) == [
+        ("FANCA", "DNA repair"),
+        ("TP53", "apoptosis"),
+        ("BRCA1", "DNA repair"),
+        ("TP53", "cell cycle"),
+    ]
+
+
+def test_nodes_and_edges_are_emitted_once(export):
+    adapter = PandasAdapter(path=str(export), read_workers=2)
+
+    nodes = list(adapter.get_nodes())
+    edges = list(adapter.get_edges())
+
+    assert [(node_id, label) for node_id, label, _ in nodes] == [
+        ("DNA repair", "biological_process"),
+        ("apoptosis", "biological_process"),
+        ("cell cycle", "biological_process"),
+    ]
+    assert nodes[0][2] == {"name": "DNA repair"}
+    assert sorted(
+        (source, target, label) for _, source, target, label, _ in edges
+    ) == [
+        ("BRCA1", "DNA repair", "gene_to_process"),
+        ("FANCA", "DNA repair", "gene_to_process"),
+        ("TP53", "apoptosis", "gene_to_process"),
+        ("TP53", "cell cycle", "gene_to_process"),
+    ]
+    assert len({edge_id for edge_id, *_ in edges}) == len(edges)
+
+
+def test_missing_export_fails_on_reading(tmp_path):
+    adapter = PandasAdapter(path=str(tmp_path))
+
+    with pytest.raises(FileNotFoundError):
+        adapter.load()
@@ -0,0 +1,73 @@
+import json
+import os
+from decider_genetics.cli import main
+from decider_genetics.parts import open_part, part_files
+
+
+def _build(config: str, directory, *options) -> None:
+    main(
+        [
+            "--adapters",
+            "variants",
+            "copy_numbers",
+            "clinical",
+            "--config",
+            config,
+            "--output-dir",
+            str(directory),
+            "--seed",
+            "0",
+            "--no-cache",
+            "--workers",
+            "1",
+            *options,
+        ]
+    )
+
+
+def _rows(directory, label: str) -> list:
+    rows = []
+    for part in part_files(str(directory), label):
+        with open_part(part) as f:
+            rows.extend(f)
+    return sorted(rows)
+
+
+def test_sharded_build_counts_patients_of_all_shards(
+    biocypher_config, tmp_path
+):
+    single, sharded = tmp_path / "single", tmp_path / "sharded"
+    _build(biocypher_config, single)
+    _build(biocypher_config, sharded, "--shards", "2")
+
+    # genes have patients in both shards, whose counts are added up
+    assert _rows(sharded, "Gene") == _rows(single, "Gene")
+    assert _rows(sharded, "Patient") == _rows(single, "Patient")
+    assert not os.path.exists(sharded / "shards")
+
+
+def test_sharded_build_reports_the_edges_of_a_single_build(
+    biocypher_config, tmp_path
+):
+    reports = {}
+    for name, options in [("single", []), ("sharded", ["--shards", "2"])]:
+        report = tmp_path / f"{name}.json"
+        _build(
+            biocypher_config,
+            tmp_path / name,
+            "--gene-report",
+            str(report),
+            *options,
+        )
+        with open(report, encoding="utf-8") as f:
+            reports[name] = {
+                adapter: {
+                    label: (counts["edges"], counts["unresolved"])
+                    for label, counts in labels.items()
+                }
+                for adapter, labels in json.load(f)["adapters"].items()
+            }
+
+    # variants of several patients are in both shards
+    assert reports["sharded"] == reports["single"]
+    assert reports["single"]["variants"]["variant_in_gene"] == (254, 24)
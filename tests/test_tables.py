@@ -0,0 +1,52 @@
+import threading
+import time
+import pytest
+from decider_genetics.tables import expand_paths, map_tables
+
+
+def test_patterns_expand_to_sorted_tables_read_once(tmp_path):
+    for name in ["batch-2.tsv", "batch-10.tsv", "batch-1.tsv", "other.tsv"]:
+        (tmp_path / name).touch()
+
+    paths = expand_paths(
+        [str(tmp_path / "batch-*.tsv"), str(tmp_path / "batch-1.tsv")]
+    )
+
+    assert paths == [
+        str(tmp_path / name)
+        for name in ["batch-1.tsv", "batch-10.tsv", "batch-2.tsv"]
+    ]
+
+
+def test_patterns_without_matches_are_an_error(tmp_path):
+    with pytest.raises(FileNotFoundError, match="No input matches"):
+        expand_paths(str(tmp_path / "batch-*.tsv"))
+
+
+def test_tables_are_yielded_in_order_of_their_paths():
+    def read(path):
+        # the first tables take longest to read
+        time.sleep(0.01 * (5 - path))
+        return path
+
+    assert list(map_tables(read, list(range(5)), workers=3)) == list(range(5))
+
+
+def test_tables_are_read_at_most_workers_ahead():
+    lock = threading.Lock()
+    read = []
+
+    def record(path):
+        with lock:
+            read.append(path)
+        return path
+
+    tables = map_tables(record, list(range(10)), workers=2)
+    first = next(tables)
+    # give the pool time to read more tables than it may
+    time.sleep(0.05)
+
+    assert first == 0
+    with lock:
+        assert sorted(read) == [0, 1, 2]
+    assert list(tables) == list(range(1, 10))